@@ -6,22 +6,34 @@ from dotenv import load_dotenv
 from routes.todo_routes import todo_bp
 from routes.health_routes import health_bp
 from routes.user_routes import user_bp
-from migrate import create_tables
+from migrate import run_migrations
+from database import init_app as init_database, is_postgres, sqlite_path
+from metrics import init_app as init_metrics
+from compression import init_app as init_compression
+from serialization import FastJSONProvider
 
 load_dotenv()
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.url_map.strict_slashes = False
 CORS(app)
 
 PORT = int(os.environ.get('PORT', 5000))
 
-create_tables()
+run_migrations()
+init_database(app)
+init_metrics(app)
+init_compression(app)
 
 app.register_blueprint(todo_bp)
 app.register_blueprint(health_bp)
 app.register_blueprint(user_bp)
 
+@app.errorhandler(401)
+def unauthorized(error):
+    return jsonify({'error': error.description}), 401, {'WWW-Authenticate': 'Bearer'}
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Route not found'}), 404
@@ -31,7 +43,11 @@ def internal_error(error):
     return jsonify({'error': 'Something went wrong!'}), 500
 
 if __name__ == '__main__':
+    # Spawned hashing processes would re-import this script (and re-run its
+    # setup), so the development server derives password hashes inline
+    from services.passwords import password_hasher
+    password_hasher.workers = 0
     print(f"Todo backend started on port {PORT}")
-    print(f"Database initialized: todo_app.db")
+    print(f"Database initialized: {'PostgreSQL' if is_postgres() else sqlite_path()}")
     app.run(host='0.0.0.0', port=PORT, debug=True)
     
\ No newline at end of file
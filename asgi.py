@@ -0,0 +1,201 @@
+"""
+ASGI entry point with an asyncio-native request path.
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+
+(or `uvicorn asgi:app` for a single process during development).
+
+Requests are matched against the Flask app's url_map. Endpoints with an
+async view in routes.async_routes run on the event loop inside a Flask
+request context (same parsing, CORS headers and error handlers as the WSGI
+path) and talk to the database through async_database. Everything else
+(batch writes, streamed lists, cache stats, OPTIONS preflights) is handed to
+the WSGI app on a thread pool.
+"""
+
+import asyncio
+import io
+import os
+import sys
+from a2wsgi import WSGIMiddleware
+from werkzeug.exceptions import HTTPException
+
+from app import app as flask_app
+from async_database import async_pool, close_replica_pools, request_scope
+from routes.async_routes import ASYNC_VIEWS
+from services.auth import require_shared_secret, token_service
+
+# Threads serving the WSGI fallback per process
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 10))
+
+wsgi_fallback = WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)
+
+
+def _uvicorn_workers() -> int:
+    """Worker count of a `uvicorn --workers N` run; the spawned workers inherit its argv"""
+    if 'uvicorn' not in os.path.basename(os.path.dirname(sys.argv[0])) + os.path.basename(sys.argv[0]):
+        return 1
+    args = sys.argv[1:]
+    for index, arg in enumerate(args):
+        if arg == '--workers' and index + 1 < len(args):
+            return int(args[index + 1])
+        if arg.startswith('--workers='):
+            return int(arg.partition('=')[2])
+    return int(os.environ.get('WEB_CONCURRENCY', 1))
+
+
+# gunicorn checks its own worker count in gunicorn.conf.py
+require_shared_secret(_uvicorn_workers())
+
+
+def _build_environ(scope, body: bytes) -> dict:
+    """Translate an ASGI HTTP scope and its buffered body into a WSGI environ"""
+    script_name = scope.get('root_path', '').encode('utf8').decode('latin1')
+    path_info = scope['path'].encode('utf8').decode('latin1')
+    if script_name and path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope['query_string'].decode('latin1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port or 0),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], remote_port = scope['client']
+        environ['REMOTE_PORT'] = str(remote_port)
+
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin1')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive) -> bytes:
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body.extend(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return bytes(body)
+
+
+def _replay(body: bytes, receive):
+    """A receive callable that yields the already-read body before the real stream"""
+    pending = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def replay():
+        if pending:
+            return pending.pop()
+        return await receive()
+    return replay
+
+
+def _resolve(environ):
+    """Return (view, unless, view_args) when the endpoint has an async view"""
+    if environ['REQUEST_METHOD'] in ('OPTIONS', 'HEAD'):
+        return None
+    try:
+        endpoint, view_args = flask_app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        # 404/405/redirects get Flask's own handling
+        return None
+    entry = ASYNC_VIEWS.get(endpoint)
+    if entry is None:
+        return None
+    return entry[0], entry[1], view_args
+
+
+async def _dispatch(view, unless, view_args, environ):
+    """Run an async view through Flask's request/response processing
+
+    Returns None when the view's predicate sends the request to the WSGI app.
+    """
+    ctx = flask_app.request_context(environ)
+    ctx.push()
+    error = None
+    try:
+        if unless is not None and unless():
+            return None
+        try:
+            try:
+                rv = flask_app.preprocess_request()
+                if rv is None:
+                    async with request_scope():
+                        rv = await view(**view_args)
+            except Exception as e:
+                # abort() and other HTTP errors go to the app's error handlers
+                rv = flask_app.handle_user_exception(e)
+            response = flask_app.make_response(rv)
+            # after_request hooks include compression; keep it off the event
+            # loop. to_thread copies the context, so the request is still bound.
+            return await asyncio.to_thread(flask_app.process_response, response)
+        except Exception as e:
+            error = e
+            return flask_app.handle_exception(e)
+    finally:
+        ctx.pop(error)
+
+
+async def _send_response(send, response):
+    headers = [(name.lower().encode('latin1'), value.encode('latin1'))
+               for name, value in response.headers.to_wsgi_list()]
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': response.get_data()})
+    response.close()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await async_pool.open()
+            except Exception as e:
+                print(f"⚠️ Could not pre-warm async database pool: {e}")
+            # Otherwise the first token verified on the event loop would block
+            # it on the revocation query
+            await asyncio.to_thread(token_service.ensure_revocations)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_pool.close()
+            await close_replica_pools()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return await wsgi_fallback(scope, receive, send)
+
+    body = await _read_body(receive)
+    environ = _build_environ(scope, body)
+    resolved = _resolve(environ)
+    if resolved is not None:
+        response = await _dispatch(*resolved, environ)
+        if response is not None:
+            return await _send_response(send, response)
+    return await wsgi_fallback(scope, _replay(body, receive), send)
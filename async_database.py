@@ -0,0 +1,396 @@
+import asyncio
+import contextvars
+import datetime
+import os
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Sequence
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from database import (
+    DATABASE_URL, DB_POOL_MAX_SIZE, DB_POOL_MIN_SIZE, DB_POOL_TIMEOUT, DB_SLOW_QUERY_EXPLAIN, PoolTimeout,
+    explainable, is_postgres, query_profiler, replicas, sqlite_path, sqlite_pragmas
+)
+from metrics import record_pool_wait, record_query, record_read_route
+from queries import DB_SERVER_PREPARE, QUERIES
+
+# asyncpg keeps an LRU of prepared statements per connection; it is switched
+# off behind a transaction-mode pooler, like DB_SERVER_PREPARE for psycopg2
+ASYNC_STATEMENT_CACHE_SIZE = int(os.getenv('DB_ASYNC_STATEMENT_CACHE_SIZE', 256))
+
+# Connections shared by every service call of the current request (see request_scope)
+_request_connections: contextvars.ContextVar = contextvars.ContextVar('async_db_conns', default=None)
+
+
+def _asyncpg_dsn(url: str) -> str:
+    """Drop libpq-only options asyncpg would forward as server settings"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k != 'channel_binding']
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _encode_timestamp(value) -> str:
+    return value if isinstance(value, str) else value.isoformat()
+
+
+def _decode_timestamp(value: str) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(value)
+
+
+class AsyncConnection:
+    """DB-API-like wrapper over an asyncpg or aiosqlite connection
+
+    Statements are looked up in the query registry by name. Like psycopg2, a
+    transaction is opened implicitly by the first statement and ends with
+    commit() or rollback().
+    """
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._transaction = None
+
+    @property
+    def raw(self):
+        return self._raw
+
+    async def fetchall(self, name: str, params: Sequence = ()) -> List[tuple]:
+        query = QUERIES[name]
+        if is_postgres():
+            await self._begin()
+            return await self._profiled(name, query.numbered_sql, params,
+                                        lambda: self._raw.fetch(query.numbered_sql, *params))
+        return await self._profiled(name, query.sqlite_sql, params,
+                                    lambda: self._sqlite(query.sqlite_sql, params, 'fetchall'))
+
+    async def fetchone(self, name: str, params: Sequence = ()) -> Optional[tuple]:
+        query = QUERIES[name]
+        if is_postgres():
+            await self._begin()
+            return await self._profiled(name, query.numbered_sql, params,
+                                        lambda: self._raw.fetchrow(query.numbered_sql, *params))
+        return await self._profiled(name, query.sqlite_sql, params,
+                                    lambda: self._sqlite(query.sqlite_sql, params, 'fetchone'))
+
+    async def execute(self, name: str, params: Sequence = ()) -> int:
+        """Run a statement and return the number of affected rows"""
+        query = QUERIES[name]
+        if is_postgres():
+            await self._begin()
+            status = await self._profiled(name, query.numbered_sql, params,
+                                          lambda: self._raw.execute(query.numbered_sql, *params))
+            # Command tags look like 'DELETE 3' or 'INSERT 0 1'
+            count = status.rsplit(' ', 1)[-1]
+            return int(count) if count.isdigit() else -1
+        return await self._profiled(name, query.sqlite_sql, params,
+                                    lambda: self._sqlite(query.sqlite_sql, params, 'rowcount'))
+
+    async def _sqlite(self, sql: str, params: Sequence, result: str):
+        async with self._raw.execute(sql, tuple(params)) as cursor:
+            if result == 'rowcount':
+                return cursor.rowcount
+            return await getattr(cursor, result)()
+
+    async def _profiled(self, name: str, sql: str, params: Sequence, operation: Callable[[], Awaitable]):
+        """Await a statement, feeding the metrics and the query profiler"""
+        started = time.perf_counter()
+        try:
+            result = await operation()
+        except Exception as e:
+            elapsed = time.perf_counter() - started
+            record_query(name, elapsed)
+            query_profiler.record(sql, elapsed, e)
+            raise
+        elapsed = time.perf_counter() - started
+        record_query(name, elapsed)
+        if query_profiler.record(sql, elapsed):
+            query_profiler.log_slow(sql, params, elapsed, await self._explain(sql, params))
+        return result
+
+    async def _explain(self, sql: str, params: Sequence) -> Optional[List[str]]:
+        if not DB_SLOW_QUERY_EXPLAIN or not explainable(sql):
+            return None
+        try:
+            if is_postgres():
+                # Nested transaction = savepoint, so a failed EXPLAIN leaves ours intact
+                async with self._raw.transaction():
+                    rows = await self._raw.fetch(f"EXPLAIN {sql}", *params)
+                return [row[0] for row in rows]
+            async with self._raw.execute(f"EXPLAIN QUERY PLAN {sql}", tuple(params)) as cursor:
+                return [row[-1] for row in await cursor.fetchall()]
+        except Exception as e:
+            return [f"(plan unavailable: {e})"]
+
+    async def commit(self):
+        if is_postgres():
+            if self._transaction is not None:
+                transaction, self._transaction = self._transaction, None
+                await transaction.commit()
+        else:
+            await self._raw.commit()
+
+    async def rollback(self):
+        if is_postgres():
+            if self._transaction is not None:
+                transaction, self._transaction = self._transaction, None
+                await transaction.rollback()
+        else:
+            await self._raw.rollback()
+
+    async def _begin(self):
+        if self._transaction is None:
+            self._transaction = self._raw.transaction()
+            await self._transaction.start()
+
+
+class AsyncConnectionPool:
+    """Bounded pool of async connections: asyncpg's pool on PostgreSQL, a queue of aiosqlite connections on SQLite"""
+
+    def __init__(self, min_size: int = DB_POOL_MIN_SIZE, max_size: int = DB_POOL_MAX_SIZE,
+                 timeout: float = DB_POOL_TIMEOUT, url: str = DATABASE_URL, readonly: bool = False):
+        self.url = url
+        self.readonly = readonly
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self._pg_pool = None
+        self._idle: Optional[asyncio.LifoQueue] = None
+        self._size = 0
+        self._opening: Optional[asyncio.Lock] = None
+
+    async def open(self):
+        """Create the pool on the running event loop and pre-open min_size connections"""
+        if is_postgres(self.url):
+            if self._pg_pool is None:
+                import asyncpg
+                self._pg_pool = await asyncpg.create_pool(
+                    _asyncpg_dsn(self.url),
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    statement_cache_size=ASYNC_STATEMENT_CACHE_SIZE if DB_SERVER_PREPARE else 0,
+                    init=self._init_postgres,
+                    server_settings={'default_transaction_read_only': 'on'} if self.readonly else None,
+                )
+            return
+        if self._idle is None:
+            self._idle = asyncio.LifoQueue()
+            self._opening = asyncio.Lock()
+        while self._size < self.min_size:
+            self._size += 1
+            try:
+                self._idle.put_nowait(await self._connect_sqlite())
+            except Exception:
+                self._size -= 1
+                raise
+
+    def stats(self) -> dict:
+        if self._pg_pool is not None:
+            return {'size': self._pg_pool.get_size(), 'idle': self._pg_pool.get_idle_size(),
+                    'maxSize': self.max_size}
+        idle = self._idle.qsize() if self._idle is not None else 0
+        return {'size': self._size, 'idle': idle, 'maxSize': self.max_size}
+
+    async def close(self):
+        """Close every connection"""
+        if self._pg_pool is not None:
+            pg_pool, self._pg_pool = self._pg_pool, None
+            await pg_pool.close()
+        if self._idle is not None:
+            while not self._idle.empty():
+                await self._idle.get_nowait().close()
+                self._size -= 1
+            self._idle = None
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[AsyncConnection]:
+        """Check out a connection; any open transaction is rolled back on release"""
+        if self._pg_pool is None and self._idle is None:
+            await self.open()
+        started = time.monotonic()
+        if self._pg_pool is not None:
+            async with self._pg_pool.acquire(timeout=self.timeout) as raw:
+                record_pool_wait('async', time.monotonic() - started)
+                conn = AsyncConnection(raw)
+                try:
+                    yield conn
+                finally:
+                    await conn.rollback()
+            return
+
+        raw = await self._get_sqlite()
+        record_pool_wait('async', time.monotonic() - started)
+        conn = AsyncConnection(raw)
+        try:
+            yield conn
+        finally:
+            try:
+                await conn.rollback()
+                self._idle.put_nowait(raw)
+            except Exception:
+                self._size -= 1
+                await raw.close()
+
+    async def _get_sqlite(self):
+        try:
+            return self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        async with self._opening:
+            if self._size < self.max_size:
+                self._size += 1
+                try:
+                    return await self._connect_sqlite()
+                except Exception:
+                    self._size -= 1
+                    raise
+        try:
+            return await asyncio.wait_for(self._idle.get(), self.timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f"No database connection available after {self.timeout}s")
+
+    async def _connect_sqlite(self):
+        import aiosqlite
+        raw = await aiosqlite.connect(sqlite_path(self.url))
+        for pragma in sqlite_pragmas():
+            await raw.execute(pragma)
+        if self.readonly:
+            await raw.execute("PRAGMA query_only = ON")
+        return raw
+
+    @staticmethod
+    async def _init_postgres(raw):
+        # Accept the ISO strings the services already produce for timestamp parameters
+        await raw.set_type_codec('timestamp', schema='pg_catalog', format='text',
+                                 encoder=_encode_timestamp, decoder=_decode_timestamp)
+
+
+async_pool = AsyncConnectionPool()
+# One async pool per read replica of database.replicas, in the same order
+async_replica_pools = [AsyncConnectionPool(url=url, readonly=True) for url in replicas.urls]
+
+
+async def close_replica_pools():
+    for replica_pool in async_replica_pools:
+        await replica_pool.close()
+
+
+def _replica_in_use(index: int) -> int:
+    stats = async_replica_pools[index].stats()
+    return stats['size'] - stats['idle']
+
+
+class _RequestConnections:
+    """Connections held by one request, checked out on first use and kept until it ends"""
+
+    def __init__(self):
+        self._held = {}
+
+    def get(self, pool: AsyncConnectionPool) -> Optional[AsyncConnection]:
+        held = self._held.get(pool)
+        return held[1] if held else None
+
+    async def checkout(self, pool: AsyncConnectionPool) -> AsyncConnection:
+        conn = self.get(pool)
+        if conn is None:
+            manager = pool.acquire()
+            conn = await manager.__aenter__()
+            self._held[pool] = (manager, conn)
+        return conn
+
+    async def release(self, pool: AsyncConnectionPool, exc_info=(None, None, None)):
+        held = self._held.pop(pool, None)
+        if held:
+            await held[0].__aexit__(*exc_info)
+
+    async def release_all(self, exc_info=(None, None, None)):
+        for pool in list(self._held):
+            await self.release(pool, exc_info)
+
+
+@asynccontextmanager
+async def get_async_connection() -> AsyncIterator[AsyncConnection]:
+    """Get a pooled async connection
+
+    Inside request_scope() the request's connection is shared by every call;
+    elsewhere a connection is checked out for the duration of the block.
+    """
+    held = _request_connections.get()
+    if held is not None:
+        conn = await held.checkout(async_pool)
+        try:
+            yield conn
+        except Exception:
+            await conn.rollback()
+            raise
+        return
+    async with async_pool.acquire() as conn:
+        yield conn
+
+
+async def release_async_request_connection():
+    """Give the request's primary connection back before waiting on slow work
+
+    A later call in the request checks out a new one.
+    """
+    held = _request_connections.get()
+    if held is not None:
+        await held.release(async_pool)
+
+
+async def _checkout_replica(held: Optional[_RequestConnections], stack: AsyncExitStack) -> Optional[AsyncConnection]:
+    """A connection from the first replica that answers, or None"""
+    for index in replicas.candidates(_replica_in_use):
+        replica_pool = async_replica_pools[index]
+        try:
+            if held is not None:
+                return await held.checkout(replica_pool)
+            return await stack.enter_async_context(replica_pool.acquire())
+        except (PoolTimeout, asyncio.TimeoutError):
+            # Busy rather than broken: try the next one
+            continue
+        except Exception as e:
+            replicas.mark_down(index, e)
+    return None
+
+
+@asynccontextmanager
+async def get_async_read_connection(owner: Optional[str] = None) -> AsyncIterator[AsyncConnection]:
+    """Async counterpart of database.get_read_connection for owner's todos ('' or None for guests)
+
+    Follows the same ReplicaSet and rules: an owner inside the read-your-writes
+    window, or a request that already holds a primary connection, reads from
+    the primary, and so does everything when no replica answers. Inside
+    request_scope() the replica connection is kept for the rest of the request.
+    """
+    async with AsyncExitStack() as stack:
+        conn = None
+        held = _request_connections.get()
+        if (replicas.enabled and not replicas.is_sticky(owner or '')
+                and (held is None or held.get(async_pool) is None)):
+            if held is not None:
+                conn = next(filter(None, map(held.get, async_replica_pools)), None)
+            if conn is None:
+                conn = await _checkout_replica(held, stack)
+        record_read_route('primary' if conn is None else 'replica')
+        if conn is None:
+            conn = await stack.enter_async_context(get_async_connection())
+        yield conn
+
+
+@asynccontextmanager
+async def request_scope() -> AsyncIterator[None]:
+    """Share connections across every service call made while handling a request
+
+    Connections are checked out when a call first needs one, so a request
+    answered from the cache or a replica never holds a primary connection.
+    """
+    held = _RequestConnections()
+    token = _request_connections.set(held)
+    try:
+        yield
+    except BaseException as e:
+        await held.release_all((type(e), e, e.__traceback__))
+        raise
+    else:
+        await held.release_all()
+    finally:
+        _request_connections.reset(token)
@@ -0,0 +1,109 @@
+"""
+Compare how the sync (gthread workers) and async (uvicorn workers running
+asgi.py) servers scale with the number of concurrent clients.
+
+    python benchmarks/async_concurrency.py --concurrency 1,8,32,128 --duration 10
+
+Both servers are started with gunicorn.conf.py against the DATABASE_URL of
+the environment, with the same number of worker processes. Each level runs
+a closed loop of clients reading a seeded user's todos, with the todo cache
+disabled so every request reaches the database. The gap widens with
+database round-trip time, so run it against the real PostgreSQL host rather
+than local SQLite.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+from server import SERVERS, login_headers, start_server, stop_server
+
+
+def _seed(base_url: str, todos: int) -> dict:
+    """Register a throwaway user owning `todos` todos and return the headers acting as them"""
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    response = httpx.post(f'{base_url}/api/user/register',
+                          json={'email': email, 'password': 'benchmark', 'name': 'Benchmark'})
+    response.raise_for_status()
+    headers = login_headers(base_url, email, 'benchmark')
+    if todos:
+        httpx.post(f'{base_url}/api/todos/batch', headers=headers,
+                   json=[{'text': f'todo {i}'} for i in range(todos)]).raise_for_status()
+    return headers
+
+
+async def _run_level(base_url: str, path: str, headers: dict, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers,
+                                 limits=limits, timeout=30) as client:
+        stop_at = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50': quantiles[49] * 1000,
+        'p99': quantiles[98] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,8,32,128',
+                        help='comma-separated numbers of concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per level')
+    parser.add_argument('--workers', type=int, default=2, help='server worker processes')
+    parser.add_argument('--todos', type=int, default=50, help='todos seeded for the benchmark user')
+    parser.add_argument('--path', default='/api/todos', help='GET endpoint to drive')
+    parser.add_argument('--port', type=int, default=5101)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    results = {}
+    for offset, kind in enumerate(SERVERS):
+        port = args.port + offset
+        base_url = f'http://127.0.0.1:{port}'
+        process = start_server(kind, port, args.workers, env={'TODO_CACHE_TTL': '0'})
+        try:
+            headers = _seed(base_url, args.todos)
+            results[kind] = [asyncio.run(_run_level(base_url, args.path, headers, level, args.duration))
+                             for level in levels]
+        finally:
+            stop_server(process)
+
+    print(f"{'server':<7} {'clients':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for kind, rows in results.items():
+        for row in rows:
+            print(f"{kind:<7} {row['concurrency']:>7} {row['rps']:>9.1f} {row['p50']:>8.2f} "
+                  f"{row['p99']:>8.2f} {row['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Measure POST /api/todos throughput with and without group commit.
+
+    python benchmarks/group_commit.py --concurrency 64 --duration 10
+
+The sync server is started twice with gunicorn.conf.py against the
+DATABASE_URL of the environment, once with TODO_GROUP_COMMIT=false and once
+with it on, and a closed loop of clients creates todos for a set of seeded
+users. Without a DATABASE_URL each run gets a fresh SQLite file in a
+temporary directory.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from server import login_headers, start_server, stop_server
+
+
+def _seed_users(base_url: str, count: int) -> list:
+    users = []
+    for _ in range(count):
+        email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+        response = httpx.post(f'{base_url}/api/user/register', timeout=30,
+                              json={'email': email, 'password': 'benchmark', 'name': 'Benchmark'})
+        response.raise_for_status()
+        users.append(login_headers(base_url, email, 'benchmark'))
+    return users
+
+
+async def _drive(base_url: str, users: list, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        stop_at = time.perf_counter() + duration
+
+        async def worker(index: int):
+            nonlocal errors
+            headers = users[index % len(users)]
+            sequence = 0
+            while time.perf_counter() < stop_at:
+                sequence += 1
+                started = time.perf_counter()
+                try:
+                    response = await client.post('/api/todos', headers=headers,
+                                                 json={'text': f'todo {index}-{sequence}'})
+                    if response.status_code != 201:
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        'inserts': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50': quantiles[49] * 1000,
+        'p99': quantiles[98] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=64, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per run')
+    parser.add_argument('--workers', type=int, default=2, help='server worker processes')
+    parser.add_argument('--threads', type=int, default=16, help='threads per server worker')
+    parser.add_argument('--users', type=int, default=16, help='users the inserts are spread over')
+    parser.add_argument('--max-batch', type=int, default=128, help='TODO_GROUP_COMMIT_MAX_BATCH')
+    parser.add_argument('--max-wait-ms', type=float, default=2, help='TODO_GROUP_COMMIT_MAX_WAIT_MS')
+    parser.add_argument('--port', type=int, default=5111)
+    args = parser.parse_args()
+
+    results = {}
+    for offset, mode in enumerate(('off', 'on')):
+        port = args.port + offset
+        base_url = f'http://127.0.0.1:{port}'
+        env = {
+            'TODO_GROUP_COMMIT': 'true' if mode == 'on' else 'false',
+            'TODO_GROUP_COMMIT_MAX_BATCH': str(args.max_batch),
+            'TODO_GROUP_COMMIT_MAX_WAIT_MS': str(args.max_wait_ms),
+            'GUNICORN_THREADS': str(args.threads),
+            'DB_POOL_MAX_SIZE': str(args.threads + 2),
+        }
+        with tempfile.TemporaryDirectory() as workdir:
+            if not os.environ.get('DATABASE_URL'):
+                env['DATABASE_URL'] = 'sqlite:///todo_app.db'
+            process = start_server('sync', port, args.workers, cwd=workdir, env=env)
+            try:
+                users = _seed_users(base_url, args.users)
+                results[mode] = asyncio.run(_drive(base_url, users, args.concurrency, args.duration))
+            finally:
+                stop_server(process)
+
+    print(f"{'group commit':<13} {'inserts/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode, row in results.items():
+        print(f"{mode:<13} {row['rps']:>10.1f} {row['p50']:>8.2f} {row['p99']:>8.2f} {row['errors']:>7}")
+    if results['off']['rps']:
+        print(f"speedup: {results['on']['rps'] / results['off']['rps']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,429 @@
+"""
+Load-test every todo and user route against a seeded local SQLite database.
+
+    python benchmarks/routes_benchmark.py --users 20 --todos-per-user 200 \\
+        --concurrency 16 --requests 500 --output results.json
+
+    python benchmarks/routes_benchmark.py --baseline baseline.json --threshold 15
+
+The server runs under gunicorn in a temporary directory, so the
+repository's todo_app.db is never touched. Endpoints are driven one after
+another by a closed loop of --concurrency clients until --requests
+responses have been timed; reads run before the writes that reshape the
+data. Destructive endpoints work on scratch todos and users seeded for them,
+so every request hits a real row.
+
+With --baseline, each endpoint is compared with the stored run and the
+script exits with status 1 when its latency (--metric) is higher, or its
+throughput lower, by more than --threshold percent, or when it failed
+requests the baseline did not.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from server import ROOT, SERVERS, start_server, stop_server
+
+PASSWORD = 'benchmark'
+BATCH_LIMIT = 1000  # TodoController.MAX_BATCH_SIZE
+BULK_SIZE = 10
+COLORS = ['#ff6b6b', '#4ecdc4', '#ffe66d', None]
+
+
+class Dataset:
+    """Users and todos seeded through the API, plus helpers to seed scratch data"""
+
+    def __init__(self, client: httpx.Client):
+        self.client = client
+        self.users: List[Dict] = []  # {'id', 'email', 'headers', 'todo_ids'}
+
+    def register(self, prefix: str = 'bench') -> Dict:
+        email = f"{prefix}-{uuid.uuid4().hex[:16]}@example.com"
+        response = self.client.post('/api/user/register',
+                                    json={'email': email, 'password': PASSWORD, 'name': 'Benchmark'})
+        response.raise_for_status()
+        user = {'id': response.json()['data']['id'], 'email': email, 'todo_ids': []}
+        # One session per user, shared by all of its requests
+        user['headers'] = {'Authorization': f"Bearer {self.login(user)}"}
+        return user
+
+    def login(self, user: Dict) -> str:
+        response = self.client.post('/api/user/login', json={'email': user['email'], 'password': PASSWORD})
+        response.raise_for_status()
+        return response.json()['data']['token']
+
+    def create_todos(self, user: Dict, count: int) -> List[str]:
+        ids = []
+        while len(ids) < count:
+            size = min(BATCH_LIMIT, count - len(ids))
+            response = self.client.post('/api/todos/batch', headers=user['headers'],
+                                        json=[{'text': f"todo {len(ids) + i}", 'color': random.choice(COLORS)}
+                                              for i in range(size)])
+            response.raise_for_status()
+            ids.extend(todo['id'] for todo in response.json())
+        user['todo_ids'].extend(ids)
+        return ids
+
+    def seed(self, users: int, todos_per_user: int):
+        for _ in range(users):
+            user = self.register()
+            self.create_todos(user, todos_per_user)
+            self.users.append(user)
+
+    def random_user(self) -> Dict:
+        return random.choice(self.users)
+
+    def random_todo(self) -> tuple:
+        user = self.random_user()
+        return user, random.choice(user['todo_ids'])
+
+
+def _headers(user: Dict) -> Dict[str, str]:
+    return user['headers']
+
+
+def _read(path: str) -> Callable:
+    def build(data: Dataset, count: int) -> List[tuple]:
+        return [('GET', path, _headers(data.random_user()), None) for _ in range(count)]
+    return build
+
+
+def _read_todo(data: Dataset, count: int) -> List[tuple]:
+    requests = []
+    for _ in range(count):
+        user, todo_id = data.random_todo()
+        requests.append(('GET', f'/api/todos/{todo_id}', _headers(user), None))
+    return requests
+
+
+def _search(data: Dataset, count: int) -> List[tuple]:
+    requests = []
+    for _ in range(count):
+        user = data.random_user()
+        # Seeded texts are "todo <n>", so the number narrows the match to a few rows
+        number = random.randrange(max(1, len(user['todo_ids'])))
+        requests.append(('GET', f'/api/todos/search?q=todo+{number}', _headers(user), None))
+    return requests
+
+
+def _guest(method: str, path: str) -> Callable:
+    def build(data: Dataset, count: int) -> List[tuple]:
+        return [(method, path, {}, None) for _ in range(count)]
+    return build
+
+
+def _create_todo(data: Dataset, count: int) -> List[tuple]:
+    return [('POST', '/api/todos', _headers(data.random_user()), {'text': 'benchmark todo'})
+            for _ in range(count)]
+
+
+def _create_batch(data: Dataset, count: int) -> List[tuple]:
+    return [('POST', '/api/todos/batch', _headers(data.random_user()),
+             [{'text': f'batch todo {i}'} for i in range(BULK_SIZE)])
+            for _ in range(count)]
+
+
+def _update_todo(data: Dataset, count: int) -> List[tuple]:
+    requests = []
+    for _ in range(count):
+        user, todo_id = data.random_todo()
+        requests.append(('PUT', f'/api/todos/{todo_id}', _headers(user), {'text': 'updated todo'}))
+    return requests
+
+
+def _toggle_todo(data: Dataset, count: int) -> List[tuple]:
+    requests = []
+    for _ in range(count):
+        user, todo_id = data.random_todo()
+        requests.append(('PATCH', f'/api/todos/{todo_id}/toggle', _headers(user), None))
+    return requests
+
+
+def _update_batch(data: Dataset, count: int) -> List[tuple]:
+    requests = []
+    for _ in range(count):
+        user = data.random_user()
+        ids = random.sample(user['todo_ids'], min(BULK_SIZE, len(user['todo_ids'])))
+        requests.append(('PATCH', '/api/todos/batch', _headers(user), {'ids': ids, 'op': 'toggle'}))
+    return requests
+
+
+def _delete_todo(data: Dataset, count: int) -> List[tuple]:
+    user = data.register('scratch')
+    ids = data.create_todos(user, count)
+    return [('DELETE', f'/api/todos/{todo_id}', _headers(user), None) for todo_id in ids]
+
+
+def _delete_batch(data: Dataset, count: int) -> List[tuple]:
+    user = data.register('scratch')
+    ids = data.create_todos(user, count * BULK_SIZE)
+    return [('DELETE', '/api/todos/batch', _headers(user), {'ids': ids[i:i + BULK_SIZE]})
+            for i in range(0, len(ids), BULK_SIZE)]
+
+
+def _delete_all(scratch_todos: int) -> Callable:
+    def build(data: Dataset, count: int) -> List[tuple]:
+        requests = []
+        for _ in range(count):
+            user = data.register('scratch')
+            data.create_todos(user, scratch_todos)
+            requests.append(('DELETE', '/api/todos', _headers(user), None))
+        return requests
+    return build
+
+
+def _register(data: Dataset, count: int) -> List[tuple]:
+    return [('POST', '/api/user/register', {},
+             {'email': f"signup-{uuid.uuid4().hex[:16]}@example.com", 'password': PASSWORD, 'name': 'Benchmark'})
+            for _ in range(count)]
+
+
+def _login(data: Dataset, count: int) -> List[tuple]:
+    return [('POST', '/api/user/login', {}, {'email': data.random_user()['email'], 'password': PASSWORD})
+            for _ in range(count)]
+
+
+def _logout(data: Dataset, count: int) -> List[tuple]:
+    # Logout revokes the token, so every request needs a session of its own
+    return [('POST', '/api/user/logout', {'Authorization': f"Bearer {data.login(data.random_user())}"}, None)
+            for _ in range(count)]
+
+
+def scenarios(scratch_todos: int) -> Dict[str, Callable[[Dataset, int], List[tuple]]]:
+    """Endpoint name -> builder of its request list, reads first"""
+    return {
+        'GET /api/todos': _read('/api/todos'),
+        'GET /api/todos?limit=50': _read('/api/todos?limit=50'),
+        'GET /api/todos/completed': _read('/api/todos/completed'),
+        'GET /api/todos?color': _read('/api/todos?color=%234ecdc4'),
+        'GET /api/todos?completed&sort': _read('/api/todos?completed=false&sort=updated'),
+        'GET /api/todos?sort&limit=50': _read('/api/todos?sort=updated&order=asc&limit=50'),
+        'GET /api/todos/<id>': _read_todo,
+        'GET /api/todos/search': _search,
+        'GET /api/todos/counts': _read('/api/todos/counts'),
+        'GET /api/todos/guest-count': _guest('GET', '/api/todos/guest-count'),
+        'GET /api/user/guest-todo-count': _guest('GET', '/api/user/guest-todo-count'),
+        'POST /api/user/login': _login,
+        'POST /api/user/logout': _logout,
+        'POST /api/user/register': _register,
+        'POST /api/todos': _create_todo,
+        'POST /api/todos/batch': _create_batch,
+        'PUT /api/todos/<id>': _update_todo,
+        'PATCH /api/todos/<id>/toggle': _toggle_todo,
+        'PATCH /api/todos/batch': _update_batch,
+        'DELETE /api/todos/<id>': _delete_todo,
+        'DELETE /api/todos/batch': _delete_batch,
+        'DELETE /api/todos': _delete_all(scratch_todos),
+    }
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def _drive(base_url: str, requests: List[tuple], concurrency: int, warmup: int) -> Dict:
+    """Send the requests with a closed loop of `concurrency` clients and summarize the timed ones"""
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def send(request) -> Optional[float]:
+            method, path, headers, body = request
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=headers, json=body)
+            except httpx.HTTPError:
+                return None
+            elapsed = time.perf_counter() - started
+            return elapsed if response.status_code < 400 else None
+
+        pending = iter(requests[:warmup])
+
+        async def warm():
+            for request in pending:
+                await send(request)
+
+        await asyncio.gather(*(warm() for _ in range(concurrency)))
+
+        timed = iter(requests[warmup:])
+
+        async def worker():
+            nonlocal errors
+            for request in timed:
+                elapsed = await send(request)
+                if elapsed is None:
+                    errors += 1
+                else:
+                    latencies.append(elapsed)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput': round((len(latencies) + errors) / wall, 2) if wall else 0.0,
+        'mean': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        'p50': round(_percentile(latencies, 50) * 1000, 3),
+        'p95': round(_percentile(latencies, 95) * 1000, 3),
+        'p99': round(_percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def compare(results: Dict, baseline: Dict, metric: str, threshold: float) -> List[str]:
+    """Print a comparison table and return the endpoints that regressed"""
+    regressions = []
+    print(f"\n{'endpoint':<32} {metric + ' ms':>10} {'base':>10} {'delta':>8} "
+          f"{'req/s':>9} {'base':>9} {'delta':>8}  status")
+    for name, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            print(f"{name:<32} {current[metric]:>10.2f} {'-':>10} {'-':>8} {current['throughput']:>9.1f} "
+                  f"{'-':>9} {'-':>8}  new")
+            continue
+        latency_delta = _change(current[metric], previous[metric])
+        throughput_delta = _change(current['throughput'], previous['throughput'])
+        failed = (latency_delta > threshold or throughput_delta < -threshold
+                  or current['errors'] > previous['errors'])
+        if failed:
+            regressions.append(name)
+        print(f"{name:<32} {current[metric]:>10.2f} {previous[metric]:>10.2f} {latency_delta:>+7.1f}% "
+              f"{current['throughput']:>9.1f} {previous['throughput']:>9.1f} {throughput_delta:>+7.1f}%  "
+              f"{'REGRESSED' if failed else 'ok'}")
+    return regressions
+
+
+def _change(current: float, previous: float) -> float:
+    if not previous:
+        return 0.0
+    return (current - previous) / previous * 100
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args, base_url: str) -> Dict:
+    random.seed(args.seed)
+    selected = scenarios(args.scratch_todos)
+    if args.only:
+        wanted = [name.strip() for name in args.only.split(',')]
+        unknown = [name for name in wanted if name not in selected]
+        if unknown:
+            raise SystemExit(f"Unknown endpoints: {', '.join(unknown)}")
+        selected = {name: selected[name] for name in wanted}
+
+    with httpx.Client(base_url=base_url, timeout=120) as client:
+        data = Dataset(client)
+        started = time.perf_counter()
+        data.seed(args.users, args.todos_per_user)
+        print(f"🌱 Seeded {args.users} users x {args.todos_per_user} todos "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        endpoints = {}
+        for name, build in selected.items():
+            requests = build(data, args.requests + args.warmup)
+            endpoints[name] = asyncio.run(_drive(base_url, requests, args.concurrency, args.warmup))
+            row = endpoints[name]
+            print(f"{name:<32} {row['throughput']:>9.1f} req/s  p50 {row['p50']:>8.2f}  "
+                  f"p95 {row['p95']:>8.2f}  p99 {row['p99']:>8.2f} ms  errors {row['errors']}")
+
+    return {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'commit': _git_commit(),
+            'server': args.server if not args.url else args.url,
+            'workers': args.workers,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'users': args.users,
+            'todos_per_user': args.todos_per_user,
+            'cache': not args.no_cache,
+            'python': platform.python_version(),
+        },
+        'endpoints': endpoints,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10, help='users to seed')
+    parser.add_argument('--todos-per-user', type=int, default=100, help='todos seeded per user')
+    parser.add_argument('--scratch-todos', type=int, default=10,
+                        help='todos owned by each scratch user emptied by DELETE /api/todos')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients per endpoint')
+    parser.add_argument('--requests', type=int, default=300, help='timed requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed requests per endpoint')
+    parser.add_argument('--only', help='comma-separated endpoint names to run (default: all)')
+    parser.add_argument('--server', choices=sorted(SERVERS), default='sync', help='app to start')
+    parser.add_argument('--workers', type=int, default=2, help='server worker processes')
+    parser.add_argument('--port', type=int, default=5201)
+    parser.add_argument('--url', help='drive an already running server instead of starting one')
+    parser.add_argument('--no-cache', action='store_true', help='disable the todo read cache')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for picking users and todos')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--metric', choices=('p50', 'p95', 'p99', 'mean'), default='p95',
+                        help='latency figure compared with the baseline')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='allowed regression against the baseline, in percent')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.url:
+        results = run(args, args.url.rstrip('/'))
+    else:
+        with tempfile.TemporaryDirectory(prefix='todo-bench-') as workdir:
+            env = {'DATABASE_URL': 'sqlite:///todo_app.db'}
+            if args.no_cache:
+                env['TODO_CACHE_TTL'] = '0'
+            process = start_server(args.server, args.port, args.workers, cwd=workdir, env=env)
+            try:
+                results = run(args, f'http://127.0.0.1:{args.port}')
+            finally:
+                stop_server(process)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.metric, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} endpoint(s) regressed by more than {args.threshold}%")
+            sys.exit(1)
+        print(f"\n✅ No endpoint regressed by more than {args.threshold}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Measure how long a list response of todos takes to build.
+
+    python benchmarks/serialization.py --rows 1000
+
+Rows are synthetic and never touch the database. Each mode turns the same
+fetched tuples into a Flask response body:
+
+    dicts    one dict per row, encoded by Flask's DefaultJSONProvider
+             (the path before rows were kept as Todo tuples)
+    json     Todo rows encoded by FastJSONProvider with the standard library
+    orjson   the same with orjson, when it is installed
+
+Every mode must produce the same bytes; the run fails otherwise.
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from serialization import FastJSONProvider, orjson, todo_rows
+
+
+def _rows(count: int, timestamps: str) -> list:
+    now = datetime.datetime(2026, 1, 1, 12, 0, 0, 123456)
+    rows = []
+    for index in range(count):
+        stamp = now + datetime.timedelta(seconds=index)
+        if timestamps == 'text':
+            stamp = stamp.isoformat()
+        rows.append((str(uuid.uuid4()), 'user-1', f'Todo number {index}: buy milk, call Sam',
+                     'blue' if index % 3 else None, index % 2, stamp, stamp))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000, help='todos per response')
+    parser.add_argument('--number', type=int, default=200, help='responses per measurement')
+    parser.add_argument('--timestamps', choices=('text', 'datetime'), default='text',
+                        help='text as SQLite returns them, datetime as PostgreSQL does')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast_json = FastJSONProvider(app)
+    fast_json.use_orjson = False
+    rows = _rows(args.rows, args.timestamps)
+
+    def to_dict(todo: tuple) -> dict:
+        return {'id': todo[0], 'user_id': todo[1], 'text': todo[2], 'color': todo[3],
+                'completed': bool(todo[4]), 'createdAt': todo[5], 'updatedAt': todo[6]}
+
+    modes = {
+        'dicts': lambda: default.response([to_dict(row) for row in rows]).get_data(),
+        'json': lambda: fast_json.response(todo_rows(rows)).get_data(),
+    }
+    if orjson is not None:
+        fast_orjson = FastJSONProvider(app)
+        fast_orjson.use_orjson = True
+        modes['orjson'] = lambda: fast_orjson.response(todo_rows(rows)).get_data()
+
+    with app.app_context():
+        expected = modes['dicts']()
+        for mode, build in modes.items():
+            if build() != expected:
+                raise SystemExit(f"{mode} output differs from DefaultJSONProvider")
+
+        print(f"{args.rows} rows, {args.timestamps} timestamps, {len(expected)} bytes per response")
+        print(f"{'mode':<8} {'ms/response':>12} {'speedup':>8}")
+        baseline = None
+        for mode, build in modes.items():
+            seconds = min(timeit.repeat(build, number=args.number, repeat=5)) / args.number
+            baseline = baseline or seconds
+            print(f"{mode:<8} {seconds * 1000:>12.3f} {baseline / seconds:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Start the API under gunicorn for the benchmark scripts."""
+
+import os
+import secrets
+import subprocess
+import sys
+import time
+from typing import Dict, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# kind -> (worker class, app) run under the production gunicorn config
+SERVERS = {
+    'sync': ('gthread', 'app:app'),
+    'async': ('uvicorn.workers.UvicornWorker', 'asgi:app'),
+}
+
+
+def start_server(kind: str, port: int, workers: int, cwd: str = ROOT,
+                 env: Optional[Dict[str, str]] = None, timeout: float = 30) -> subprocess.Popen:
+    """Start gunicorn with the given worker class and wait until /api/health answers
+
+    The app is imported from the repository root; cwd decides where a SQLite
+    database file is created.
+    """
+    worker_class, target = SERVERS[kind]
+    server_env = dict(os.environ, GUNICORN_ACCESS_LOG='/dev/null', GUNICORN_WORKER_CLASS=worker_class)
+    # Every worker must verify the tokens the others issue
+    server_env.setdefault('AUTH_TOKEN_SECRET', secrets.token_hex(32))
+    server_env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, server_env.get('PYTHONPATH')]))
+    server_env.update(env or {})
+    command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+               '--bind', f'127.0.0.1:{port}', '--workers', str(workers), target]
+    process = subprocess.Popen(command, cwd=cwd, env=server_env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{kind} server exited with status {process.returncode}")
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/api/health', timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"{kind} server did not start on port {port}")
+
+
+def login_headers(base_url: str, email: str, password: str) -> Dict[str, str]:
+    """Log a seeded user in and return the headers that act as them
+
+    The benchmarks authenticate like real clients, so every request pays for
+    verifying its bearer token.
+    """
+    response = httpx.post(f'{base_url}/api/user/login', timeout=30,
+                          json={'email': email, 'password': password})
+    response.raise_for_status()
+    return {'Authorization': f"Bearer {response.json()['data']['token']}"}
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
@@ -0,0 +1,127 @@
+"""
+Compare the SQLite production profile against SQLite's defaults.
+
+    python benchmarks/sqlite_profile.py --writers 4 --readers 12 --duration 10
+
+Each profile runs in its own process on a fresh database file, since the
+settings are read when the database module is imported:
+
+    default     DB_SQLITE_PROFILE=default: rollback journal, synchronous=FULL,
+                no mmap, connections from the bounded pool
+    production  WAL, synchronous=NORMAL, mmap, larger page cache, busy
+                timeout, one reusable connection per thread
+
+Writer threads create todos while reader threads fetch the first page of a
+user's todos with the todo cache disabled, all through TodoService as a
+request would. Under the rollback journal every commit waits for readers to
+drain and pays several fsyncs, which shows up in write throughput and p99.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ('default', 'production')
+
+
+def _summary(latencies: list, elapsed: float) -> dict:
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        'ops': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50': quantiles[49] * 1000,
+        'p99': quantiles[98] * 1000,
+    }
+
+
+def run_workload(writers: int, readers: int, duration: float, todos: int) -> dict:
+    """Drive TodoService from threads in this process and return per-operation stats"""
+    sys.path.insert(0, ROOT)
+    from migrate import run_migrations
+    from services.todo_service import todo_service
+    from services.user_service import UserService
+
+    run_migrations()
+    _, _, user = UserService().register_user('bench@example.com', 'benchmark', 'Benchmark')
+    user_id = user['id']
+    todo_service.create_todos([{'text': f'todo {i}'} for i in range(todos)], user_id)
+
+    latencies = {'write': [], 'read': []}
+    errors = []
+    stop_at = time.perf_counter() + duration
+
+    def loop(kind: str, operation):
+        samples = latencies[kind]
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                operation()
+            except Exception as e:
+                errors.append(f"{kind}: {e}")
+                continue
+            samples.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=loop, args=('write', lambda: todo_service.create_todo('benchmark', user_id)))
+               for _ in range(writers)]
+    threads += [threading.Thread(target=loop, args=('read', lambda: todo_service.get_todos_page(user_id, limit=50)))
+                for _ in range(readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'write': _summary(latencies['write'], elapsed),
+        'read': _summary(latencies['read'], elapsed),
+        'errors': len(errors),
+        'firstError': errors[0] if errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4, help='threads creating todos')
+    parser.add_argument('--readers', type=int, default=12, help='threads reading the first page of todos')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per profile')
+    parser.add_argument('--todos', type=int, default=200, help='todos seeded before the run')
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        # Child process: the environment already selects the profile
+        print(json.dumps(run_workload(args.writers, args.readers, args.duration, args.todos)))
+        return
+
+    results = {}
+    for profile in PROFILES:
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.join(workdir, "bench.db")}',
+                       DB_SQLITE_PROFILE=profile, TODO_CACHE_TTL='0', DB_SLOW_QUERY_MS='1000000',
+                       DB_POOL_MAX_SIZE=str(args.writers + args.readers), TODO_GROUP_COMMIT='false',
+                       PASSWORD_HASH_WORKERS='0')
+            command = [sys.executable, os.path.abspath(__file__), '--profile', profile,
+                       '--writers', str(args.writers), '--readers', str(args.readers),
+                       '--duration', str(args.duration), '--todos', str(args.todos)]
+            output = subprocess.run(command, env=env, cwd=workdir, capture_output=True, text=True, check=True)
+            results[profile] = json.loads(output.stdout.strip().splitlines()[-1])
+
+    print(f"{'profile':<11} {'op':<6} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for profile, result in results.items():
+        for op in ('write', 'read'):
+            row = result[op]
+            print(f"{profile:<11} {op:<6} {row['rps']:>9.1f} {row['p50']:>8.2f} {row['p99']:>8.2f}")
+        if result['errors']:
+            print(f"{profile:<11} {result['errors']} errors, first: {result['firstError']}")
+
+
+if __name__ == '__main__':
+    main()
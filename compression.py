@@ -0,0 +1,240 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+Runs as an after_request hook, once the body has been serialized. gzip is
+always available; brotli (``br``) and zstd are offered when the brotli and
+zstandard packages are installed. Bodies under COMPRESSION_MIN_SIZE go out
+as they are. Streamed responses are compressed chunk by chunk, and compressed
+bodies of responses with an ETag are kept in a small LRU cache keyed by
+encoding and a digest of the body, so repeated reads of an unchanged list
+are not compressed again.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from flask import request
+
+from metrics import record_compression
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Encodings offered, in order of preference when the client rates several equally
+COMPRESSION_ENCODINGS = [name.strip() for name in os.getenv('COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(',')
+                         if name.strip()]
+# Smaller bodies are not worth the CPU or the extra header
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3))
+COMPRESSION_MIMETYPES = {mimetype.strip() for mimetype in os.getenv(
+    'COMPRESSION_MIMETYPES', 'application/json,application/x-ndjson,text/plain').split(',') if mimetype.strip()}
+# Streamed responses are flushed to the client at least every this many input bytes
+COMPRESSION_STREAM_FLUSH_BYTES = int(os.getenv('COMPRESSION_STREAM_FLUSH_BYTES', 64 * 1024))
+# Memory for compressed bodies of responses with an ETag; 0 disables the cache
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv('COMPRESSION_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+
+class _GzipStream:
+    def __init__(self):
+        # wbits=31 writes the gzip header and trailer; the header's mtime is 0
+        self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def _available_streams() -> Dict[str, Callable]:
+    streams = {'gzip': _GzipStream}
+    if brotli is not None:
+        streams['br'] = _BrotliStream
+    if zstandard is not None:
+        streams['zstd'] = _ZstdStream
+    return streams
+
+
+_STREAMS = _available_streams()
+ENCODINGS = [name for name in COMPRESSION_ENCODINGS if name in _STREAMS]
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress a whole body with one of ENCODINGS"""
+    stream = _STREAMS[encoding]()
+    return stream.compress(data) + stream.finish()
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by encoding and body digest, bounded by their total size
+
+    The key is the content itself, not the ETag: a weak ETag, or one shared by
+    two representations, would otherwise serve one body's bytes for another.
+    Hashing is far cheaper than compressing, and a changed body gets a new
+    key, so entries never need invalidating; stale ones fall out of the LRU.
+    """
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (encoding, raw body digest) -> compressed body
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compress(self, encoding: str, data: bytes) -> bytes:
+        key = (encoding, hashlib.blake2b(data, digest_size=16).digest())
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+
+        body = compress(data, encoding)
+        if len(body) <= self.max_bytes:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = body
+                    self._bytes += len(body)
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return body
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+compressed_cache = CompressedBodyCache()
+
+
+def _negotiate() -> Optional[str]:
+    """Pick the encoding the client rates highest, ties going to the server's order"""
+    if not ENCODINGS:
+        return None
+    return request.accept_encodings.best_match(ENCODINGS, default=None)
+
+
+def _compressible(response) -> bool:
+    return (200 <= response.status_code < 300 and response.status_code not in (204, 206)
+            and not response.direct_passthrough
+            and 'Content-Encoding' not in response.headers
+            and response.mimetype in COMPRESSION_MIMETYPES)
+
+
+def _compress_stream(chunks: Iterable, encoding: str) -> Iterator[bytes]:
+    """Compress a streamed body as it is produced, flushing at least every COMPRESSION_STREAM_FLUSH_BYTES"""
+    stream = _STREAMS[encoding]()
+    raw_bytes = compressed_bytes = pending = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            raw_bytes += len(chunk)
+            pending += len(chunk)
+            out = stream.compress(chunk)
+            if pending >= COMPRESSION_STREAM_FLUSH_BYTES:
+                out += stream.flush()
+                pending = 0
+            if out:
+                compressed_bytes += len(out)
+                yield out
+        out = stream.finish()
+        compressed_bytes += len(out)
+        yield out
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+        record_compression(encoding, raw_bytes, compressed_bytes)
+
+
+def _after_request(response):
+    if not _compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _negotiate()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_SIZE:
+            return response
+        started = time.perf_counter()
+        # Only bodies with an ETag are expected to be sent again unchanged
+        if response.get_etag()[0] and compressed_cache.max_bytes > 0:
+            body = compressed_cache.get_or_compress(encoding, data)
+        else:
+            body = compress(data, encoding)
+        record_compression(encoding, len(data), len(body), time.perf_counter() - started)
+        response.set_data(body)
+
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # A strong ETag promises identical bytes, which the encodings are not
+        response.set_etag(f"{etag}-{encoding}")
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """Compress the app's responses for clients that accept it"""
+    app.after_request(_after_request)
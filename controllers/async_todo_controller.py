@@ -0,0 +1,192 @@
+from flask import Response, make_response, request, jsonify
+from typing import Any, Awaitable, Callable, Dict, Optional
+from controllers.todo_controller import TodoController
+from services.async_todo_service import async_todo_service
+from services.pagination import parse_limit
+
+class AsyncTodoController:
+    """Async counterparts of the TodoController handlers used by the ASGI app
+
+    Handlers run inside a Flask request context, so request parsing,
+    validation and response shapes are the same as on the WSGI path.
+    """
+
+    @staticmethod
+    async def _conditional(user_id: Optional[str], build: Callable[[], Awaitable[Any]]) -> Response:
+        """Async version of TodoController._conditional"""
+        version, modified_at = await async_todo_service.get_version(user_id)
+        etag, last_modified, not_modified = TodoController._validators(user_id, version, modified_at)
+        if not_modified:
+            return TodoController._with_validators(Response(status=304), etag, last_modified)
+        response = make_response(await build())
+        if response.status_code != 200:
+            return response
+        return TodoController._with_validators(response, etag, last_modified)
+
+    @staticmethod
+    async def _get_page(user_id: Optional[str], completed_only: bool) -> tuple[Dict[str, Any], int]:
+        """Respond with one keyset page and the cursor for the next one"""
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            todos, next_cursor = await async_todo_service.get_todos_page(
+                user_id, limit, request.args.get('cursor') or None, completed_only
+            )
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
+        return jsonify({'todos': todos, 'next_cursor': next_cursor}), 200
+
+    @staticmethod
+    async def get_all_todos(user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """GET /api/todos - Retrieve all todos"""
+        async def build():
+            if TodoController._wants_page():
+                return await AsyncTodoController._get_page(user_id, completed_only=False)
+            todos = await async_todo_service.get_all_todos(user_id)
+            return jsonify(todos), 200
+
+        try:
+            return await AsyncTodoController._conditional(user_id, build)
+        except Exception as error:
+            return jsonify({'error': 'Failed to fetch todos'}), 500
+
+    @staticmethod
+    async def get_completed_todos(user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """GET /api/todos/completed - Retrieve all completed todos"""
+        async def build():
+            if TodoController._wants_page():
+                return await AsyncTodoController._get_page(user_id, completed_only=True)
+            completed_todos = await async_todo_service.get_completed_todos(user_id)
+            return jsonify(completed_todos), 200
+
+        try:
+            return await AsyncTodoController._conditional(user_id, build)
+        except Exception as e:
+            return jsonify({"error": "Failed to fetch completed todos"}), 500
+
+    @staticmethod
+    async def get_todo(todo_id: str, user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """GET /api/todos/:id - Retrieve a single todo by ID"""
+        async def build():
+            todo = await async_todo_service.get_todo_by_id(todo_id, user_id)
+            if not todo:
+                return jsonify({'error': 'Todo not found'}), 404
+            return jsonify(todo), 200
+
+        try:
+            return await AsyncTodoController._conditional(user_id, build)
+        except Exception as error:
+            return jsonify({'error': 'Failed to fetch todo'}), 500
+
+    @staticmethod
+    async def create_todo(user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """POST /api/todos - Create a new todo"""
+        try:
+            data = request.get_json()
+            if not data:
+                return jsonify({'error': 'Request body is required'}), 400
+
+            text = data.get('text')
+            color = data.get('color')
+
+            if not text or not text.strip():
+                return jsonify({'error': 'Text is required'}), 400
+
+            new_todo = await async_todo_service.create_todo(text, user_id, color)
+            return jsonify(new_todo), 201
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
+        except Exception as error:
+            print("Error in create_todo:", error)
+            return jsonify({'error': f'Failed to create todo: {error}'}), 500
+
+    @staticmethod
+    async def update_todo(todo_id: str, user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """PUT /api/todos/:id - Update an existing todo"""
+        try:
+            data = request.get_json()
+            if not data:
+                return jsonify({'error': 'Request body is required'}), 400
+
+            text = data.get('text')
+            completed = data.get('completed')
+            color = data.get('color')
+
+            updated_todo = await async_todo_service.update_todo(todo_id, text, completed, color, user_id)
+            if not updated_todo:
+                return jsonify({'error': 'Todo not found'}), 404
+
+            return jsonify(updated_todo), 200
+        except Exception as error:
+            return jsonify({'error': 'Failed to update todo'}), 500
+
+    @staticmethod
+    async def toggle_todo(todo_id: str, user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """PATCH /api/todos/:id/toggle - Toggle todo completion status"""
+        try:
+            updated_todo = await async_todo_service.toggle_todo(todo_id, user_id)
+            if not updated_todo:
+                return jsonify({'error': 'Todo not found'}), 404
+
+            return jsonify(updated_todo), 200
+        except Exception as error:
+            return jsonify({'error': 'Failed to toggle todo'}), 500
+
+    @staticmethod
+    async def delete_todo(todo_id: str, user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """DELETE /api/todos/:id - Delete a specific todo"""
+        try:
+            deleted_todo = await async_todo_service.delete_todo(todo_id, user_id)
+            if not deleted_todo:
+                return jsonify({'error': 'Todo not found'}), 404
+
+            return jsonify({
+                'message': 'Todo deleted successfully',
+                'deletedTodo': deleted_todo
+            }), 200
+        except Exception as error:
+            return jsonify({'error': 'Failed to delete todo'}), 500
+
+    @staticmethod
+    async def delete_all_todos(user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """DELETE /api/todos - Delete all todos"""
+        try:
+            deleted_count = await async_todo_service.delete_all_todos(user_id)
+            return jsonify({
+                'message': 'All todos deleted successfully',
+                'deletedCount': deleted_count
+            }), 200
+        except Exception as error:
+            return jsonify({'error': 'Failed to delete all todos'}), 500
+
+    @staticmethod
+    async def health_check() -> tuple[Dict[str, Any], int]:
+        """GET /api/health - Health check endpoint"""
+        from datetime import datetime
+        return jsonify({
+            'status': 'OK',
+            'message': 'Todo API is running',
+            'timestamp': datetime.now().isoformat(),
+            'todoCount': await async_todo_service.get_todo_count()
+        }), 200
+
+    @staticmethod
+    async def get_todo_counts(user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """GET /api/todos/counts - Total, completed and active todo counts"""
+        try:
+            return jsonify(await async_todo_service.get_todo_counts(user_id)), 200
+        except Exception as e:
+            return jsonify({"error": "Failed to get todo counts"}), 500
+
+    @staticmethod
+    async def get_guest_todo_count() -> tuple[Dict[str, Any], int]:
+        """GET /api/todos/guest-count - Get guest todo count"""
+        try:
+            count = await async_todo_service.get_guest_todo_count()
+            remaining = max(0, 3 - count)
+            return jsonify({
+                'count': count,
+                'remaining': remaining,
+                'limit': 3
+            }), 200
+        except Exception as e:
+            return jsonify({"error": "Failed to get guest todo count"}), 500
@@ -1,26 +1,157 @@
-from flask import request, jsonify
-from typing import Dict, Any, Optional
+import hashlib
+from datetime import datetime, timedelta, timezone
+from flask import Response, current_app, make_response, request, jsonify, stream_with_context
+from typing import Callable, Dict, Any, Optional
+from database import query_profiler
+from metrics import registry
+from services.auth import AUTH_ALLOW_USER_ID_HEADER
 from services.todo_service import todo_service
+from services.cache import todo_cache
+from services.list_options import ListOptions, has_list_options, parse_list_options
+from services.pagination import parse_limit
+
+MAX_BATCH_SIZE = 1000
+BATCH_OPERATIONS = ('toggle', 'complete', 'uncomplete', 'update')
+QUERY_STATS_ORDERS = {'total': 'totalMs', 'mean': 'meanMs', 'max': 'maxMs'}
 
 class TodoController:
     
+    @staticmethod
+    def _stream_format() -> Optional[str]:
+        """Return 'ndjson' or 'json' when the client asked for a streamed list"""
+        flag = request.args.get('stream', '').lower()
+        if flag == 'ndjson':
+            return 'ndjson'
+        if flag in ('1', 'true', 'json'):
+            return 'json'
+        if 'application/x-ndjson' in request.headers.get('Accept', ''):
+            return 'ndjson'
+        return None
+
+    @staticmethod
+    def _stream_todos(user_id: Optional[str], options: ListOptions, fmt: str) -> Response:
+        """Stream the list row by row as NDJSON or as a single JSON array"""
+        provider = current_app.json
+        todos = todo_service.iter_todos(user_id, options)
+
+        def generate_ndjson():
+            for todo in todos:
+                yield provider.dumps(todo, separators=(',', ':')) + '\n'
+
+        def generate_array():
+            yield '['
+            for index, todo in enumerate(todos):
+                yield (',' if index else '') + provider.dumps(todo, separators=(',', ':'))
+            yield ']\n'
+
+        if fmt == 'ndjson':
+            return Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+        return Response(stream_with_context(generate_array()), mimetype='application/json')
+
+    @staticmethod
+    def _conditional(user_id: Optional[str], build: Callable[[], Any]) -> Response:
+        """Serve a read with ETag/Last-Modified taken from the owner's change version
+
+        A matching If-None-Match (or, without one, If-Modified-Since) is
+        answered with 304 before the todos table is queried.
+        """
+        version, modified_at = todo_service.get_version(user_id)
+        etag, last_modified, not_modified = TodoController._validators(user_id, version, modified_at)
+        if not_modified:
+            return TodoController._with_validators(Response(status=304), etag, last_modified)
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+        return TodoController._with_validators(response, etag, last_modified)
+
+    @staticmethod
+    def _validators(user_id: Optional[str], version: int, modified_at) -> tuple[str, Any, bool]:
+        """Compute the (etag, last_modified, not_modified) of the current request's read"""
+        variant = '\n'.join([user_id or '', request.full_path, TodoController._stream_format() or ''])
+        etag = f"{version}-{hashlib.sha1(variant.encode()).hexdigest()[:16]}"
+        last_modified = settled = None
+        if modified_at is not None:
+            modified_at = modified_at.astimezone(timezone.utc)
+            last_modified = modified_at.replace(microsecond=0)
+            # Last-Modified has whole seconds, so a later write within the same
+            # second would look unchanged; only trust it once that second is over
+            settled = datetime.now(timezone.utc) - modified_at >= timedelta(seconds=1)
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        elif request.if_modified_since and last_modified and settled:
+            not_modified = last_modified <= request.if_modified_since
+        else:
+            not_modified = False
+        return etag, last_modified, not_modified
+
+    @staticmethod
+    def _with_validators(response: Response, etag: str, last_modified) -> Response:
+        response.set_etag(etag, weak=True)
+        if last_modified:
+            response.last_modified = last_modified
+        # The owner comes from the bearer token (or the legacy header while it is accepted)
+        response.vary.update(('Authorization', 'Accept'))
+        if AUTH_ALLOW_USER_ID_HEADER:
+            response.vary.add('X-User-ID')
+        return response
+
+    @staticmethod
+    def _wants_page() -> bool:
+        """Paginate only when the client asks, so plain list calls keep their shape"""
+        return 'limit' in request.args or 'cursor' in request.args
+
+    @staticmethod
+    def _wants_sync() -> bool:
+        """Requests the async views leave to the WSGI app: streamed, filtered or sorted lists"""
+        return bool(TodoController._stream_format()) or has_list_options(request.args)
+
+    @staticmethod
+    def _get_page(user_id: Optional[str], options: ListOptions) -> tuple[Dict[str, Any], int]:
+        """Respond with one keyset page and the cursor for the next one"""
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            todos, next_cursor = todo_service.get_todos_page(
+                user_id, limit, request.args.get('cursor') or None, options
+            )
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
+        return jsonify({'todos': todos, 'next_cursor': next_cursor}), 200
+
+    @staticmethod
+    def _list(user_id: Optional[str], **overrides: Any) -> tuple[Dict[str, Any], int]:
+        """Respond with the list filtered and sorted by the query arguments"""
+        try:
+            options = parse_list_options(request.args, **overrides)
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
+        fmt = TodoController._stream_format()
+        if fmt:
+            return TodoController._stream_todos(user_id, options, fmt), 200
+        if TodoController._wants_page():
+            return TodoController._get_page(user_id, options)
+        todos = todo_service.get_all_todos(user_id, options)
+        return jsonify(todos), 200
+
     @staticmethod
     def get_all_todos(user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
-        """GET /api/todos - Retrieve all todos"""
+        """GET /api/todos - Retrieve todos, optionally filtered and sorted"""
         try:
-            todos = todo_service.get_all_todos(user_id)
-            return jsonify(todos), 200
+            return TodoController._conditional(user_id, lambda: TodoController._list(user_id))
         except Exception as error:
             return jsonify({'error': 'Failed to fetch todos'}), 500
     
     @staticmethod
     def get_todo(todo_id: str, user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
         """GET /api/todos/:id - Retrieve a single todo by ID"""
-        try:
+        def build():
             todo = todo_service.get_todo_by_id(todo_id, user_id)
             if not todo:
                 return jsonify({'error': 'Todo not found'}), 404
             return jsonify(todo), 200
+
+        try:
+            return TodoController._conditional(user_id, build)
         except Exception as error:
             return jsonify({'error': 'Failed to fetch todo'}), 500
     
@@ -46,6 +177,106 @@ class TodoController:
             print("Error in create_todo:", error)
             return jsonify({'error': f'Failed to create todo: {error}'}), 500
     
+    @staticmethod
+    def create_todos_batch(user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """POST /api/todos/batch - Create many todos in one transaction"""
+        try:
+            data = request.get_json(silent=True)
+            items = data.get('todos') if isinstance(data, dict) else data
+            if not isinstance(items, list) or not items:
+                return jsonify({'error': 'A non-empty array of todos is required'}), 400
+            if len(items) > MAX_BATCH_SIZE:
+                return jsonify({'error': f'A batch can contain at most {MAX_BATCH_SIZE} todos'}), 400
+
+            # Validate every item before touching the database
+            errors = []
+            for index, item in enumerate(items):
+                if not isinstance(item, dict):
+                    errors.append({'index': index, 'error': 'Todo must be an object'})
+                    continue
+                text = item.get('text')
+                color = item.get('color')
+                if not isinstance(text, str) or not text.strip():
+                    errors.append({'index': index, 'error': 'Text is required'})
+                elif color is not None and not isinstance(color, str):
+                    errors.append({'index': index, 'error': 'Color must be a string'})
+            if errors:
+                return jsonify({'error': 'Invalid todos', 'details': errors}), 400
+
+            created = todo_service.create_todos(items, user_id)
+            return jsonify(created), 201
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
+        except Exception as error:
+            print("Error in create_todos_batch:", error)
+            return jsonify({'error': f'Failed to create todos: {error}'}), 500
+
+    @staticmethod
+    def _get_batch_ids(data: Any) -> list:
+        """Validate the ids of a bulk request, dropping duplicates but keeping order"""
+        ids = data.get('ids') if isinstance(data, dict) else None
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, str) for i in ids):
+            raise ValueError('A non-empty array of todo ids is required')
+        if len(ids) > MAX_BATCH_SIZE:
+            raise ValueError(f'A batch can contain at most {MAX_BATCH_SIZE} ids')
+        return list(dict.fromkeys(ids))
+
+    @staticmethod
+    def _batch_results(ids: list, todos: Dict[str, Dict], status: str) -> list:
+        """Per-id outcome of a bulk request in the order the ids were sent"""
+        return [
+            {'id': todo_id, 'status': status, 'todo': todos[todo_id]} if todo_id in todos
+            else {'id': todo_id, 'status': 'not_found'}
+            for todo_id in ids
+        ]
+
+    @staticmethod
+    def update_todos_batch(user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """PATCH /api/todos/batch - Toggle, complete, reopen or update many todos"""
+        try:
+            data = request.get_json(silent=True)
+            ids = TodoController._get_batch_ids(data)
+
+            operation = data.get('op')
+            if operation not in BATCH_OPERATIONS:
+                return jsonify({'error': f"op must be one of: {', '.join(BATCH_OPERATIONS)}"}), 400
+
+            text = data.get('text')
+            completed = data.get('completed')
+            color = data.get('color')
+            if operation == 'update':
+                if text is None and completed is None and color is None:
+                    return jsonify({'error': 'update requires text, completed or color'}), 400
+                if text is not None and (not isinstance(text, str) or not text.strip()):
+                    return jsonify({'error': 'Text must be a non-empty string'}), 400
+                if completed is not None and not isinstance(completed, bool):
+                    return jsonify({'error': 'completed must be a boolean'}), 400
+
+            todos = todo_service.bulk_mutate_todos(ids, operation, user_id, text, completed, color)
+            return jsonify({
+                'results': TodoController._batch_results(ids, todos, 'updated'),
+                'updatedCount': len(todos)
+            }), 200
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
+        except Exception as error:
+            return jsonify({'error': 'Failed to update todos'}), 500
+
+    @staticmethod
+    def delete_todos_batch(user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """DELETE /api/todos/batch - Delete many todos"""
+        try:
+            ids = TodoController._get_batch_ids(request.get_json(silent=True))
+            todos = todo_service.bulk_delete_todos(ids, user_id)
+            return jsonify({
+                'results': TodoController._batch_results(ids, todos, 'deleted'),
+                'deletedCount': len(todos)
+            }), 200
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
+        except Exception as error:
+            return jsonify({'error': 'Failed to delete todos'}), 500
+
     @staticmethod
     def update_todo(todo_id: str, user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
         """PUT /api/todos/:id - Update an existing todo"""
@@ -114,16 +345,71 @@ class TodoController:
             'message': 'Todo API is running',
             'timestamp': datetime.now().isoformat(),
             'todoCount': todo_service.get_todo_count()
-        }), 200 
+        }), 200
+
+    @staticmethod
+    def cache_stats() -> tuple[Dict[str, Any], int]:
+        """GET /api/cache/stats - Todo cache counters for sizing"""
+        return jsonify(todo_cache.stats()), 200
+
+    @staticmethod
+    def query_stats() -> tuple[Dict[str, Any], int]:
+        """GET /api/db/queries - Slowest normalized statements seen by this process"""
+        order = request.args.get('order', 'total')
+        if order not in QUERY_STATS_ORDERS:
+            return jsonify({'error': f"order must be one of: {', '.join(QUERY_STATS_ORDERS)}"}), 400
+        try:
+            limit = int(request.args.get('limit', 20))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        return jsonify({
+            'slowQueryMs': query_profiler.slow_ms,
+            'queries': query_profiler.top(max(1, limit), QUERY_STATS_ORDERS[order])
+        }), 200
+
+    @staticmethod
+    def metrics() -> Response:
+        """GET /api/metrics - Request, query, pool and cache metrics in Prometheus text format"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
     @staticmethod
-    def get_completed_todos() -> tuple[Dict[str, Any], int]:
-        """GET /api/todos/completed - Retrieve all completed todos"""
+    def get_completed_todos(user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """GET /api/todos/completed - Alias of GET /api/todos?completed=true"""
         try:
-            completed_todos = todo_service.get_completed_todos()
-            return jsonify(completed_todos), 200
+            return TodoController._conditional(user_id, lambda: TodoController._list(user_id, completed=True))
         except Exception as e:
             return jsonify({"error": "Failed to fetch completed todos"}), 500
 
+    @staticmethod
+    def search_todos(user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """GET /api/todos/search?q= - Full-text search of todo text, best match first"""
+        query = request.args.get('q', '')
+        if not query.strip():
+            return jsonify({'error': 'q is required'}), 400
+
+        def build():
+            try:
+                limit = parse_limit(request.args.get('limit'))
+                todos, next_cursor = todo_service.search_todos(
+                    query, user_id, limit, request.args.get('cursor') or None
+                )
+            except ValueError as error:
+                return jsonify({'error': str(error)}), 400
+            return jsonify({'todos': todos, 'next_cursor': next_cursor}), 200
+
+        try:
+            return TodoController._conditional(user_id, build)
+        except Exception as e:
+            return jsonify({"error": "Failed to search todos"}), 500
+
+    @staticmethod
+    def get_todo_counts(user_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+        """GET /api/todos/counts - Total, completed and active todo counts"""
+        try:
+            return jsonify(todo_service.get_todo_counts(user_id)), 200
+        except Exception as e:
+            return jsonify({"error": "Failed to get todo counts"}), 500
+
     @staticmethod
     def get_guest_todo_count() -> tuple[Dict[str, Any], int]:
         """GET /api/todos/guest-count - Get guest todo count"""
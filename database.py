@@ -1,22 +1,799 @@
+import itertools
 import os
+import queue
+import re
 import sqlite3
+import threading
+import time
+import weakref
+from typing import Callable, Dict, List, Optional
 import psycopg2
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from flask import g, has_app_context
 from dotenv import load_dotenv
+from metrics import record_pool_wait, record_read_route
 
 load_dotenv()
 
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///todo_app.db')
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Pool sizing, overridable from the environment
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTHCHECK_INTERVAL', 30))
 
-def get_db_connection():
-    """Get a database connection (PostgreSQL for Neon, SQLite for local)"""
-    if DATABASE_URL.startswith('postgresql://'):
+# Statements slower than this are logged with their parameter shape and plan
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 100))
+DB_SLOW_QUERY_EXPLAIN = os.getenv('DB_SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+# Distinct normalized statements kept in the profiling table
+DB_QUERY_STATS_SIZE = int(os.getenv('DB_QUERY_STATS_SIZE', 500))
+
+# SQLite tuning for single-node deployments. DB_SQLITE_PROFILE=default leaves
+# SQLite's own settings (rollback journal, synchronous=FULL, no mmap) and uses
+# the bounded pool instead of per-thread connections.
+DB_SQLITE_PROFILE = os.getenv('DB_SQLITE_PROFILE', 'production').lower()
+DB_SQLITE_JOURNAL_MODE = os.getenv('DB_SQLITE_JOURNAL_MODE', 'WAL').upper()
+DB_SQLITE_SYNCHRONOUS = os.getenv('DB_SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+DB_SQLITE_MMAP_SIZE = int(os.getenv('DB_SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+# Pages when positive, KiB when negative (SQLite's convention)
+DB_SQLITE_CACHE_SIZE = int(os.getenv('DB_SQLITE_CACHE_SIZE', -64 * 1024))
+DB_SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('DB_SQLITE_BUSY_TIMEOUT_MS', 5000))
+DB_SQLITE_THREAD_LOCAL = os.getenv('DB_SQLITE_THREAD_LOCAL', 'true').lower() in ('1', 'true', 'yes')
+
+# Read replicas for read-only service methods: comma-separated URLs on the
+# same backend as DATABASE_URL
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+# 'round_robin', or 'least_loaded' for the replica with the fewest checked-out connections
+DB_REPLICA_STRATEGY = os.getenv('DB_REPLICA_STRATEGY', 'round_robin').lower()
+# After an owner writes, its reads stay on the primary this long; cover the replica lag
+DB_REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+# A replica that cannot be reached is skipped for this long
+DB_REPLICA_RETRY_SECONDS = float(os.getenv('DB_REPLICA_RETRY_SECONDS', 30))
+
+_SQLITE_JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+_SQLITE_SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+def is_postgres(url: str = DATABASE_URL) -> bool:
+    """Whether DATABASE_URL (or the given URL) points at PostgreSQL"""
+    return url.startswith('postgresql://')
+
+
+def sqlite_path(url: str = DATABASE_URL) -> str:
+    """Database file of a SQLite URL
+
+    sqlite:///todo_app.db is relative to the working directory and
+    sqlite:////var/lib/todo/todo.db is absolute.
+    """
+    path = url.split('://', 1)[1] if '://' in url else url
+    path = path.split('?', 1)[0]
+    return (path[1:] if path.startswith('/') else path) or ':memory:'
+
+
+def sqlite_pragmas() -> List[str]:
+    """PRAGMAs run on every new SQLite connection under the configured profile"""
+    if DB_SQLITE_PROFILE == 'default':
+        return []
+    if DB_SQLITE_JOURNAL_MODE not in _SQLITE_JOURNAL_MODES:
+        raise ValueError(f"DB_SQLITE_JOURNAL_MODE must be one of {', '.join(_SQLITE_JOURNAL_MODES)}")
+    if DB_SQLITE_SYNCHRONOUS not in _SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f"DB_SQLITE_SYNCHRONOUS must be one of {', '.join(_SQLITE_SYNCHRONOUS_MODES)}")
+    return [
+        f"PRAGMA busy_timeout = {DB_SQLITE_BUSY_TIMEOUT_MS}",
+        # Persistent in the file; readers no longer block the writer and vice versa
+        f"PRAGMA journal_mode = {DB_SQLITE_JOURNAL_MODE}",
+        # NORMAL only syncs at WAL checkpoints: a power loss can drop the last
+        # commits but never corrupts the database
+        f"PRAGMA synchronous = {DB_SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size = {DB_SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size = {DB_SQLITE_CACHE_SIZE}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+
+
+def _connect(url: str = DATABASE_URL, readonly: bool = False):
+    """Open a raw database connection (PostgreSQL for Neon, SQLite for local)"""
+    if is_postgres(url):
         # Use PostgreSQL for Neon
-        return psycopg2.connect(DATABASE_URL)
+        raw = psycopg2.connect(url)
+        if readonly:
+            raw.set_session(readonly=True)
+        return raw
     else:
-        # Use SQLite for local development
-        return sqlite3.connect('todo_app.db')
\ No newline at end of file
+        # Use SQLite for local development and single-node deployments.
+        # Connections may be released from another thread than the one that
+        # opened them, so the same-thread check has to be disabled.
+        raw = sqlite3.connect(sqlite_path(url), check_same_thread=False)
+        for pragma in sqlite_pragmas():
+            raw.execute(pragma)
+        if readonly:
+            raw.execute("PRAGMA query_only = ON")
+        return raw
+
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'(?<![\w$])-?\d+(?:\.\d+)?\b')
+_VALUE_LITERAL = re.compile(r'(?<!IS )(?<!NOT )\b(?:NULL|true|false)\b', re.IGNORECASE)
+_VALUES_ROWS = re.compile(r'(VALUES \([^()]*\))(?:\s*,\s*\([^()]*\))+', re.IGNORECASE)
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'EXECUTE')
+
+
+def normalize_sql(sql) -> str:
+    """Collapse whitespace, literals and multi-row VALUES so equivalent statements group together"""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _WHITESPACE.sub(' ', sql).strip().replace('%s', '?')
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _VALUE_LITERAL.sub('?', sql)
+    return _VALUES_ROWS.sub(r'\1, ...', sql)
+
+
+def params_shape(params) -> str:
+    """Describe parameters by type and size without logging their values"""
+    if params is None:
+        return '()'
+
+    def describe(value) -> str:
+        if isinstance(value, (str, bytes, list, tuple)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+
+    if isinstance(params, dict):
+        return '{' + ', '.join(f"{key}: {describe(value)}" for key, value in params.items()) + '}'
+    return '(' + ', '.join(describe(value) for value in params) + ')'
+
+
+def explainable(sql) -> bool:
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    return sql.lstrip().split(' ', 1)[0].upper() in _EXPLAINABLE
+
+
+class QueryProfiler:
+    """Per-statement timings grouped by normalized SQL, plus the slow query log
+
+    record() is called for every statement; the caller fetches a plan only
+    when it reports the statement as slow, then hands it to log_slow().
+    """
+
+    def __init__(self, slow_ms: float = DB_SLOW_QUERY_MS, max_entries: int = DB_QUERY_STATS_SIZE):
+        self.slow_ms = slow_ms
+        self.max_entries = max_entries
+        self._stats: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql, seconds: float, error: Optional[Exception] = None) -> bool:
+        """Add one execution to the table and return whether it was slow"""
+        key = normalize_sql(sql)
+        elapsed_ms = seconds * 1000
+        slow = error is None and elapsed_ms >= self.slow_ms
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_entries:
+                    # Forget the statement that has cost the least so far
+                    del self._stats[min(self._stats, key=lambda k: self._stats[k]['totalMs'])]
+                entry = self._stats[key] = {
+                    'query': key, 'calls': 0, 'errors': 0, 'slowCalls': 0, 'totalMs': 0.0, 'maxMs': 0.0
+                }
+            entry['calls'] += 1
+            entry['totalMs'] += elapsed_ms
+            entry['maxMs'] = max(entry['maxMs'], elapsed_ms)
+            if error is not None:
+                entry['errors'] += 1
+            if slow:
+                entry['slowCalls'] += 1
+        if error is not None:
+            print(f"❌ Query failed after {elapsed_ms:.1f} ms: {error} -- {key}")
+        return slow
+
+    def log_slow(self, sql, params, seconds: float, plan: Optional[List[str]] = None):
+        print(f"🐢 Slow query ({seconds * 1000:.1f} ms, params {params_shape(params)}): {normalize_sql(sql)}")
+        for line in plan or ():
+            print(f"    {line}")
+
+    def top(self, limit: int = 20, order_by: str = 'totalMs') -> List[dict]:
+        """The most expensive statements, ordered by totalMs, meanMs or maxMs"""
+        with self._lock:
+            rows = [dict(entry, meanMs=entry['totalMs'] / entry['calls']) for entry in self._stats.values()]
+        rows.sort(key=lambda row: row[order_by], reverse=True)
+        for row in rows[:limit]:
+            for key in ('totalMs', 'maxMs', 'meanMs'):
+                row[key] = round(row[key], 3)
+        return rows[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+query_profiler = QueryProfiler()
+
+
+def _explain(raw, sql, params) -> Optional[List[str]]:
+    """Fetch the plan of a statement on its own connection without disturbing the transaction"""
+    if not DB_SLOW_QUERY_EXPLAIN or not explainable(sql):
+        return None
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    cursor = raw.cursor()
+    try:
+        if is_postgres():
+            # A failed EXPLAIN must not abort the caller's transaction
+            cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(f"EXPLAIN {sql}", params)
+                plan = [row[0] for row in cursor.fetchall()]
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                raise
+            return plan
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params or ())
+        return [row[-1] for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"(plan unavailable: {e})"]
+    finally:
+        cursor.close()
+
+
+class ProfiledCursor:
+    """Cursor wrapper that times every statement and feeds the query profiler"""
+
+    def __init__(self, cursor, raw):
+        self._cursor = cursor
+        self._raw = raw
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            if params is None:
+                result = self._cursor.execute(sql)
+            else:
+                result = self._cursor.execute(sql, params)
+        except Exception as e:
+            query_profiler.record(sql, time.perf_counter() - started, e)
+            raise
+        elapsed = time.perf_counter() - started
+        if query_profiler.record(sql, elapsed):
+            # Server-side cursors hold an open portal; leave them alone
+            plan = None if getattr(self._cursor, 'name', None) else _explain(self._raw, sql, params)
+            query_profiler.log_slow(sql, params, elapsed, plan)
+        return result
+
+    def executemany(self, sql, seq_of_params):
+        started = time.perf_counter()
+        try:
+            result = self._cursor.executemany(sql, seq_of_params)
+        except Exception as e:
+            query_profiler.record(sql, time.perf_counter() - started, e)
+            raise
+        elapsed = time.perf_counter() - started
+        if query_profiler.record(sql, elapsed):
+            query_profiler.log_slow(sql, None, elapsed)
+        return result
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class PooledConnection:
+    """Proxy around a raw connection that hands it back to the pool on close()
+
+    Request-scoped connections ignore close() so that every service call made
+    while handling a request shares one connection; they are released by the
+    app-context teardown instead.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', raw, request_scoped: bool = False):
+        self._pool = pool
+        self._raw = raw
+        self._request_scoped = request_scoped
+
+    @property
+    def raw(self):
+        return self._raw
+
+    @property
+    def prepared_statements(self) -> set:
+        """Names of server-side prepared statements on this session"""
+        return self._pool.prepared_statements(self._raw)
+
+    def cursor(self, *args, **kwargs):
+        return ProfiledCursor(self._raw.cursor(*args, **kwargs), self._raw)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        if not self._request_scoped:
+            self.release()
+
+    def release(self):
+        """Return the underlying connection to the pool"""
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.put(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._raw is not None:
+            try:
+                self._raw.rollback()
+            except Exception:
+                pass
+        self.close()
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of raw DB-API connections"""
+
+    def __init__(self, min_size: int = DB_POOL_MIN_SIZE, max_size: int = DB_POOL_MAX_SIZE,
+                 timeout: float = DB_POOL_TIMEOUT,
+                 healthcheck_interval: float = DB_POOL_HEALTHCHECK_INTERVAL,
+                 url: str = DATABASE_URL, readonly: bool = False):
+        self.url = url
+        self.readonly = readonly
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._last_used = {}
+        self._prepared = {}
+        self._pid = os.getpid()
+        # Connections inherited across fork(); kept referenced so they are
+        # never finalized in the child, which would close the parent's session
+        self._inherited = []
+
+    def warm(self):
+        """Pre-open min_size connections so the first requests skip the handshake"""
+        opened = []
+        while self._size < self.min_size:
+            with self._lock:
+                if self._size >= self.min_size:
+                    break
+                self._size += 1
+            try:
+                opened.append(self._connect())
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+        for raw in opened:
+            self.put(raw)
+
+    def get(self) -> PooledConnection:
+        """Check out a healthy connection, opening one if the pool is not full"""
+        if self._pid != os.getpid():
+            self.reset_after_fork()
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            try:
+                raw = self._idle.get_nowait()
+            except queue.Empty:
+                raw = self._open_or_wait(deadline)
+            if self._is_healthy(raw):
+                record_pool_wait('sync', time.monotonic() - started)
+                return PooledConnection(self, raw)
+            self._discard(raw)
+
+    def put(self, raw):
+        """Return a connection, discarding it if it cannot be reset"""
+        if self._pid != os.getpid():
+            # Checked out before a fork; it belongs to the parent
+            self._inherited.append(raw)
+            return
+        try:
+            raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        self._last_used[id(raw)] = time.monotonic()
+        self._idle.put(raw)
+
+    def reset_after_fork(self):
+        """Forget connections opened by the parent process without closing them"""
+        while True:
+            try:
+                self._inherited.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        self._lock = threading.Lock()
+        self._size = 0
+        self._last_used = {}
+        self._prepared = {}
+        self._pid = os.getpid()
+
+    def prepared_statements(self, raw) -> set:
+        return self._prepared.setdefault(id(raw), set())
+
+    def stats(self) -> dict:
+        return {'size': self._size, 'idle': self._idle.qsize(), 'maxSize': self.max_size}
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                raw = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(raw)
+
+    def _open_or_wait(self, deadline: float):
+        with self._lock:
+            can_open = self._size < self.max_size
+            if can_open:
+                self._size += 1
+        if can_open:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise PoolTimeout(f"No database connection available after {self.timeout}s")
+        try:
+            return self._idle.get(timeout=remaining)
+        except queue.Empty:
+            raise PoolTimeout(f"No database connection available after {self.timeout}s")
+
+    def _connect(self):
+        raw = _connect(self.url, self.readonly)
+        self._last_used[id(raw)] = time.monotonic()
+        return raw
+
+    def _is_healthy(self, raw) -> bool:
+        if getattr(raw, 'closed', 0):
+            return False
+        idle_for = time.monotonic() - self._last_used.get(id(raw), 0)
+        if idle_for < self.healthcheck_interval:
+            return True
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, raw):
+        self._last_used.pop(id(raw), None)
+        self._prepared.pop(id(raw), None)
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+
+
+class ThreadLocalPool:
+    """One reusable SQLite connection per thread
+
+    SQLite has no server-side connection limit, and a connection is only cheap
+    once it has read the schema and warmed its page cache, so each thread keeps
+    the connection it last released and gets it back on the next request.
+    A thread that needs a second connection while holding its own (a nested
+    call outside a request) opens an extra one, which is closed on release.
+    Connections of threads that exit are closed with them.
+    """
+
+    def __init__(self, url: str = DATABASE_URL, readonly: bool = False):
+        self.url = url
+        self.readonly = readonly
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open: Dict[int, object] = {}
+        self._slots: Dict[int, tuple] = {}  # id(slot) -> (slot, finalizer)
+        self._idle = 0
+        self._pid = os.getpid()
+        self._inherited = []
+
+    def warm(self):
+        """Nothing to pre-open: connections belong to the threads that use them"""
+
+    def get(self) -> PooledConnection:
+        if self._pid != os.getpid():
+            self.reset_after_fork()
+        started = time.monotonic()
+        raw = self._take(self._slot())
+        if raw is None:
+            raw = _connect(self.url, self.readonly)
+            with self._lock:
+                self._open[id(raw)] = raw
+        record_pool_wait('sync', time.monotonic() - started)
+        return PooledConnection(self, raw)
+
+    def put(self, raw):
+        """Keep the connection for this thread, closing it if the thread already has one"""
+        if self._pid != os.getpid():
+            # Checked out before a fork; it belongs to the parent
+            self._inherited.append(raw)
+            return
+        try:
+            raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        slot = self._slot()
+        with self._lock:
+            parked = slot[0] is None
+            if parked:
+                slot[0] = raw
+                self._idle += 1
+        if not parked:
+            self._discard(raw)
+
+    def reset_after_fork(self):
+        """Forget the parent's connections without closing them"""
+        for _, finalizer in self._slots.values():
+            finalizer.detach()
+        self._inherited.extend(self._open.values())
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open = {}
+        self._slots = {}
+        self._idle = 0
+        self._pid = os.getpid()
+
+    def prepared_statements(self, raw) -> set:
+        return set()
+
+    def stats(self) -> dict:
+        # Bounded by the number of threads rather than a configured size
+        return {'size': len(self._open), 'idle': self._idle, 'maxSize': None}
+
+    def close_all(self):
+        """Close every idle connection, in whichever thread it is parked"""
+        for slot, _ in list(self._slots.values()):
+            self._close_slot(slot)
+
+    def _slot(self) -> list:
+        slot = getattr(self._local, 'slot', None)
+        if slot is None:
+            slot = self._local.slot = [None]
+            # The holder is dropped with the thread's locals when the thread exits
+            self._local.holder = holder = _SlotHolder()
+            finalizer = weakref.finalize(holder, self._forget_slot, slot)
+            with self._lock:
+                self._slots[id(slot)] = (slot, finalizer)
+        return slot
+
+    def _take(self, slot: list):
+        with self._lock:
+            raw, slot[0] = slot[0], None
+            if raw is not None:
+                self._idle -= 1
+        return raw
+
+    def _close_slot(self, slot: list):
+        raw = self._take(slot)
+        if raw is not None:
+            self._discard(raw)
+
+    def _forget_slot(self, slot: list):
+        self._close_slot(slot)
+        with self._lock:
+            self._slots.pop(id(slot), None)
+
+    def _discard(self, raw):
+        with self._lock:
+            self._open.pop(id(raw), None)
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+class _SlotHolder:
+    """Weak-referenceable marker whose collection signals that its thread has exited"""
+
+
+def _make_pool(url: str = DATABASE_URL, readonly: bool = False):
+    """Per-thread connections for tuned SQLite, the bounded pool otherwise"""
+    if not is_postgres(url) and DB_SQLITE_PROFILE != 'default' and DB_SQLITE_THREAD_LOCAL:
+        return ThreadLocalPool(url, readonly)
+    return ConnectionPool(url=url, readonly=readonly)
+
+
+class ReplicaSet:
+    """Read replicas and the read-your-writes window
+
+    Writes note their owner; that owner's reads stay on the primary for
+    sticky_seconds so a client sees its own changes before replication
+    catches up. The window is tracked per process: with several workers a
+    follow-up read that lands on another worker may still see the replica's
+    state, so keep the todo cache TTL and the window above the usual lag.
+    """
+
+    STRATEGIES = ('round_robin', 'least_loaded')
+
+    def __init__(self, urls: List[str], strategy: str = DB_REPLICA_STRATEGY,
+                 sticky_seconds: float = DB_REPLICA_STICKY_SECONDS,
+                 retry_seconds: float = DB_REPLICA_RETRY_SECONDS):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"DB_REPLICA_STRATEGY must be one of {', '.join(self.STRATEGIES)}")
+        if any(is_postgres(url) != is_postgres() for url in urls):
+            raise ValueError("DATABASE_REPLICA_URLS must use the same database backend as DATABASE_URL")
+        self.urls = list(urls)
+        self.pools = [_make_pool(url, readonly=True) for url in urls]
+        self.strategy = strategy
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self._down_until = [0.0] * len(self.pools)
+        self._turn = itertools.count()
+        self._recent_writes: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.pools)
+
+    def note_write(self, owner: str):
+        """Keep the owner's reads on the primary for the next sticky_seconds"""
+        if not self.pools or self.sticky_seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._recent_writes[owner] = now + self.sticky_seconds
+            if len(self._recent_writes) > 10000:
+                self._recent_writes = {key: until for key, until in self._recent_writes.items() if until > now}
+
+    def is_sticky(self, owner: str) -> bool:
+        until = self._recent_writes.get(owner)
+        return until is not None and until > time.monotonic()
+
+    def get(self) -> Optional[PooledConnection]:
+        """Check out a connection from the next replica, or None if none is reachable"""
+        for index in self.candidates(self._in_use):
+            try:
+                return self.pools[index].get()
+            except PoolTimeout:
+                # Busy rather than broken: try the next one
+                continue
+            except Exception as e:
+                self.mark_down(index, e)
+        return None
+
+    def mark_down(self, index: int, error: Exception):
+        """Skip a replica that failed to connect for the next retry_seconds"""
+        self._down_until[index] = time.monotonic() + self.retry_seconds
+        print(f"⚠️ Read replica {index} unavailable, skipping it for {self.retry_seconds:g}s: {error}")
+
+    def stats(self) -> List[dict]:
+        return [pool.stats() for pool in self.pools]
+
+    def reset_after_fork(self):
+        for pool in self.pools:
+            pool.reset_after_fork()
+
+    def close_all(self):
+        for pool in self.pools:
+            pool.close_all()
+
+    def candidates(self, in_use: Callable[[int], int]) -> List[int]:
+        """Indexes of the reachable replicas in the order to try them
+
+        in_use(index) reports how busy a replica's pool is, for least_loaded;
+        the async pools pass their own.
+        """
+        now = time.monotonic()
+        up = [index for index, until in enumerate(self._down_until) if until <= now]
+        if not up:
+            return []
+        start = next(self._turn) % len(up)
+        ordered = up[start:] + up[:start]
+        if self.strategy == 'least_loaded':
+            # Stable sort: ties keep the round-robin order
+            ordered.sort(key=in_use)
+        return ordered
+
+    def _in_use(self, index: int) -> int:
+        stats = self.pools[index].stats()
+        return stats['size'] - stats['idle']
+
+
+pool = _make_pool()
+replicas = ReplicaSet(DATABASE_REPLICA_URLS)
+
+
+def get_db_connection() -> PooledConnection:
+    """Get a pooled database connection
+
+    Inside a Flask request the same connection is returned for every call and
+    released when the request ends; elsewhere close() hands it back to the pool.
+    """
+    if has_app_context():
+        conn = g.get('db_conn')
+        if conn is None:
+            conn = pool.get()
+            conn._request_scoped = True
+            g.db_conn = conn
+        return conn
+    return pool.get()
+
+
+def get_read_connection(owner: Optional[str] = None) -> PooledConnection:
+    """Get a connection for read-only queries about owner's todos ('' or None for guests)
+
+    Uses a read replica when DATABASE_REPLICA_URLS is set, unless the owner
+    wrote within the read-your-writes window or the request already holds a
+    primary connection. Falls back to the primary when no replica answers.
+    """
+    if not replicas.enabled or replicas.is_sticky(owner or ''):
+        record_read_route('primary')
+        return get_db_connection()
+    if has_app_context():
+        conn = g.get('db_conn')
+        if conn is not None:
+            record_read_route('primary')
+            return conn
+        conn = g.get('db_read_conn')
+        if conn is None:
+            conn = replicas.get()
+            if conn is None:
+                record_read_route('primary')
+                return get_db_connection()
+            conn._request_scoped = True
+            g.db_read_conn = conn
+        record_read_route('replica')
+        return conn
+    conn = replicas.get()
+    record_read_route('primary' if conn is None else 'replica')
+    return conn if conn is not None else pool.get()
+
+
+def release_request_connection(exception=None):
+    """Teardown hook: give the request's connections back to their pools
+
+    Also called mid-request before blocking on work that needs a pooled
+    connection of its own; a later call in the request checks out a new one.
+    """
+    if not has_app_context():
+        return
+    for key in ('db_conn', 'db_read_conn'):
+        conn = g.pop(key, None)
+        if conn is not None:
+            conn.release()
+
+
+def init_app(app):
+    """Wire request-scoped connections into the app and pre-warm the pool"""
+    app.teardown_appcontext(release_request_connection)
+    try:
+        pool.warm()
+    except Exception as e:
+        print(f"⚠️ Could not pre-warm database pool: {e}")
@@ -0,0 +1,68 @@
+"""
+Gunicorn settings for production.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+or, for the asyncio request path (see asgi.py):
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+
+Pre-fork model: the master forks WEB_CONCURRENCY workers, each loading the
+app and serving GUNICORN_THREADS threads. Every worker runs the migrations on
+startup; they take a lock (pg_advisory_xact_lock / BEGIN IMMEDIATE), so the
+first applies them and the rest find the schema up to date. SIGHUP starts
+new workers on the code now on disk and retires the old ones gracefully;
+SIGTERM stops accepting new connections and lets in-flight requests drain for
+GUNICORN_GRACEFUL_TIMEOUT seconds.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# Only used by the gthread worker
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically to bound memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Check settings every worker must share, against the effective worker count"""
+    from services.auth import require_shared_secret
+    require_shared_secret(server.cfg.workers)
+
+
+def post_fork(server, worker):
+    """Give every worker pools of its own
+
+    on_starting imported the database module in the master; the app warms
+    the pool once the worker has loaded it.
+    """
+    from database import pool, replicas
+    pool.reset_after_fork()
+    replicas.reset_after_fork()
+
+
+def worker_exit(server, worker):
+    """Flush queued inserts, then close pooled connections and stop the hashing processes"""
+    from database import pool, replicas
+    from services.passwords import password_hasher
+    from services.todo_service import todo_writer
+    if todo_writer is not None:
+        todo_writer.stop()
+    pool.close_all()
+    replicas.close_all()
+    password_hasher.shutdown()
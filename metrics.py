@@ -0,0 +1,349 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+Recording is a dict lookup plus a bisect under a per-metric lock, cheap
+enough to leave on. Values are per process: with several gunicorn workers
+each scrape of /api/metrics reports the worker that served it, so scrape
+every worker (or aggregate with sum by ()) rather than the load balancer.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from flask import g, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+# Number of statements run by the current request; a one-element list so
+# the query hook can bump it without setting the variable again
+_request_queries: contextvars.ContextVar = contextvars.ContextVar('request_queries', default=None)
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> Iterable[str]:
+        return []
+
+
+class Counter(Metric):
+    """Monotonic counter; label values are passed positionally"""
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    kind = 'gauge'
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[tuple, list] = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def _samples(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._values.items()]
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrics recorded as they happen plus callbacks sampled at scrape time"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def collector(self, collect: Callable[[], Iterable[Metric]]):
+        """Register a callback returning freshly built metrics on every scrape"""
+        self._collectors.append(collect)
+        return collect
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                for metric in collect():
+                    lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f"# collector {getattr(collect, '__name__', collect)} failed: {_escape(e)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling a request, by route',
+    ('method', 'route', 'status'))
+REQUESTS_IN_FLIGHT = registry.gauge(
+    'http_requests_in_flight', 'Requests currently being handled')
+REQUESTS_IN_FLIGHT.set(value=0)
+REQUEST_QUERIES = registry.histogram(
+    'http_request_db_queries', 'Database statements run per request, by route',
+    ('method', 'route'), buckets=QUERY_COUNT_BUCKETS)
+QUERY_DURATION = registry.histogram(
+    'db_query_duration_seconds', 'Time spent executing a registered statement', ('query',))
+POOL_WAIT = registry.histogram(
+    'db_pool_wait_seconds', 'Time spent waiting to check out a pooled connection', ('pool',))
+PASSWORD_HASH_DURATION = registry.histogram(
+    'password_hash_duration_seconds', 'Time from queueing a password hash to its result, by KDF', ('kdf',))
+READ_ROUTES = registry.counter(
+    'db_read_connections_total', 'Connections handed to read-only queries, by primary or replica', ('target',))
+GROUP_COMMIT_ROWS = registry.histogram(
+    'group_commit_batch_rows', 'Rows committed per group-commit transaction, by writer', ('writer',),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+GROUP_COMMIT_DURATION = registry.histogram(
+    'group_commit_duration_seconds', 'Time spent writing and committing one group-commit batch', ('writer',))
+PASSWORD_HASH_REJECTIONS = registry.counter(
+    'password_hash_rejections_total', 'Password hashes turned away because the hashing queue was full')
+COMPRESSION_BYTES = registry.counter(
+    'http_response_compression_bytes_total', 'Response body bytes before and after compression, by encoding',
+    ('encoding', 'stage'))
+COMPRESSION_DURATION = registry.histogram(
+    'http_response_compression_seconds', 'Time spent compressing (or fetching from cache) a whole response body',
+    ('encoding',))
+
+
+def record_query(name: str, seconds: float):
+    """Record one execution of a registered statement"""
+    QUERY_DURATION.observe(seconds, name)
+    queries = _request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+
+
+def record_pool_wait(pool: str, seconds: float):
+    POOL_WAIT.observe(seconds, pool)
+
+
+def record_read_route(target: str):
+    READ_ROUTES.inc(target)
+
+
+def record_group_commit(writer: str, rows: int, seconds: float):
+    GROUP_COMMIT_ROWS.observe(rows, writer)
+    GROUP_COMMIT_DURATION.observe(seconds, writer)
+
+
+def record_password_hash(kdf: str, seconds: float):
+    PASSWORD_HASH_DURATION.observe(seconds, kdf)
+
+
+def record_password_hash_rejected():
+    PASSWORD_HASH_REJECTIONS.inc()
+
+
+def record_compression(encoding: str, raw_bytes: int, compressed_bytes: int, seconds: Optional[float] = None):
+    """Record one compressed response; streamed ones have no duration"""
+    COMPRESSION_BYTES.inc(encoding, 'raw', amount=raw_bytes)
+    COMPRESSION_BYTES.inc(encoding, 'compressed', amount=compressed_bytes)
+    if seconds is not None:
+        COMPRESSION_DURATION.observe(seconds, encoding)
+
+
+def _route() -> str:
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_queries = [0]
+    g.metrics_token = _request_queries.set(g.metrics_queries)
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _after_request(response):
+    started = g.get('metrics_started')
+    if started is not None:
+        REQUEST_DURATION.observe(time.perf_counter() - started, request.method, _route(), response.status_code)
+    return response
+
+
+def _teardown_request(exception=None):
+    token = g.pop('metrics_token', None)
+    if token is None:
+        return
+    REQUESTS_IN_FLIGHT.dec()
+    REQUEST_QUERIES.observe(g.metrics_queries[0], request.method, _route())
+    try:
+        _request_queries.reset(token)
+    except ValueError:
+        # Torn down from a different context than the one that started it
+        _request_queries.set(None)
+
+
+def init_app(app):
+    """Time every request of the app and count the statements it runs"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+
+@registry.collector
+def _cache_metrics() -> List[Metric]:
+    from services.cache import todo_cache
+    stats = todo_cache.stats()
+    collected = []
+    for key, name, help_text in (
+        ('hits', 'todo_cache_hits_total', 'Todo cache lookups served from memory'),
+        ('misses', 'todo_cache_misses_total', 'Todo cache lookups that went to the database'),
+        ('evictions', 'todo_cache_evictions_total', 'Entries evicted to stay within the memory budget'),
+        ('expirations', 'todo_cache_expirations_total', 'Entries dropped after their TTL'),
+        ('invalidations', 'todo_cache_invalidations_total', 'Entries dropped by writes'),
+    ):
+        counter = Counter(name, help_text)
+        counter.inc(amount=stats[key])
+        collected.append(counter)
+    for key, name, help_text in (
+        ('hitRate', 'todo_cache_hit_ratio', 'Share of todo cache lookups that were hits'),
+        ('entries', 'todo_cache_entries', 'Entries currently cached'),
+        ('bytes', 'todo_cache_bytes', 'Estimated memory held by cached entries'),
+    ):
+        gauge = Gauge(name, help_text)
+        gauge.set(value=stats[key])
+        collected.append(gauge)
+    return collected
+
+
+@registry.collector
+def _pool_metrics() -> List[Metric]:
+    from database import pool, replicas
+    from async_database import async_pool
+    connections = Gauge('db_pool_connections', 'Open pooled connections by state', ('pool', 'state'))
+    max_connections = Gauge('db_pool_max_connections', 'Upper bound of the pool size', ('pool',))
+    pools = [('sync', pool.stats()), ('async', async_pool.stats())]
+    pools += [(f'replica{index}', stats) for index, stats in enumerate(replicas.stats())]
+    for name, stats in pools:
+        connections.set(name, 'idle', value=stats['idle'])
+        connections.set(name, 'in_use', value=stats['size'] - stats['idle'])
+        if stats['maxSize'] is not None:
+            max_connections.set(name, value=stats['maxSize'])
+    return [connections, max_connections]
+
+
+@registry.collector
+def _auth_metrics() -> List[Metric]:
+    from services.auth import token_service
+    stats = token_service.stats()
+    collected = []
+    for key, name, help_text in (
+        ('hits', 'auth_token_cache_hits_total', 'Token verifications served from the verified-token cache'),
+        ('misses', 'auth_token_cache_misses_total', 'Token verifications that checked the signature'),
+        ('rejections', 'auth_token_rejections_total', 'Tokens rejected as invalid, expired or revoked'),
+    ):
+        counter = Counter(name, help_text)
+        counter.inc(amount=stats[key])
+        collected.append(counter)
+    for key, name, help_text in (
+        ('entries', 'auth_token_cache_entries', 'Verified tokens currently cached'),
+        ('revoked', 'auth_revoked_tokens', 'Unexpired revoked tokens known to this process'),
+    ):
+        gauge = Gauge(name, help_text)
+        gauge.set(value=stats[key])
+        collected.append(gauge)
+    return collected
+
+
+@registry.collector
+def _compression_metrics() -> List[Metric]:
+    from compression import compressed_cache
+    stats = compressed_cache.stats()
+    hits = Counter('compression_cache_hits_total', 'Compressed bodies served from the cache')
+    hits.inc(amount=stats['hits'])
+    misses = Counter('compression_cache_misses_total', 'Bodies compressed because the cache had no copy')
+    misses.inc(amount=stats['misses'])
+    size = Gauge('compression_cache_bytes', 'Memory held by cached compressed bodies')
+    size.set(value=stats['bytes'])
+    return [hits, misses, size]
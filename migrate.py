@@ -1,81 +1,179 @@
-import os
-import sqlite3
-import psycopg2
-from database import get_db_connection, DATABASE_URL
-from schema import TODOS_TABLE_SCHEMA, USERS_TABLE_SCHEMA
-
-def create_tables():
-    if DATABASE_URL.startswith('postgresql://'):
-        # Use PostgreSQL for Neon
-        print("🗄️ Using PostgreSQL database (Neon)")
-        try:
-            conn = get_db_connection()
+import datetime
+from database import get_db_connection, is_postgres
+from schema import (
+    REVOKED_TOKENS_EXPIRES_INDEX,
+    REVOKED_TOKENS_TABLE_SCHEMA,
+    SCHEMA_MIGRATIONS_TABLE_SCHEMA,
+    TODO_COUNTERS_BACKFILL,
+    TODO_COUNTERS_POSTGRES_FUNCTION,
+    TODO_COUNTERS_POSTGRES_TRIGGERS,
+    TODO_COUNTERS_RESET,
+    TODO_COUNTERS_SQLITE_TRIGGERS,
+    TODO_COUNTERS_TABLE_SCHEMA,
+    TODOS_BTREE_GIN_EXTENSION,
+    TODOS_FTS_OWNER_SQLITE_TABLE,
+    TODOS_FTS_OWNER_SQLITE_TRIGGERS,
+    TODOS_FTS_SQLITE_CONTENT_VIEW,
+    TODOS_FTS_SQLITE_DROP,
+    TODOS_FTS_SQLITE_REBUILD,
+    TODOS_FTS_SQLITE_TABLE,
+    TODOS_FTS_SQLITE_TRIGGERS,
+    TODOS_SEARCH_VECTOR_COLUMN,
+    TODOS_SEARCH_VECTOR_INDEX,
+    TODOS_SEARCH_VECTOR_INDEX_DROP,
+    TODOS_TABLE_SCHEMA,
+    TODOS_USER_COLOR_CREATED_INDEX,
+    TODOS_USER_COLOR_UPDATED_INDEX,
+    TODOS_USER_COMPLETED_CREATED_INDEX,
+    TODOS_USER_COMPLETED_UPDATED_INDEX,
+    TODOS_USER_CREATED_INDEX,
+    TODOS_USER_SEARCH_VECTOR_INDEX,
+    TODOS_USER_UPDATED_INDEX,
+    TODO_VERSIONS_TABLE_SCHEMA,
+    USERS_TABLE_SCHEMA,
+)
+
+# Ordered list of (version, description, statements). Statements are either a
+# list shared by both backends or a dict keyed by 'postgresql' / 'sqlite'.
+# Every statement must be safe to re-run against a database created before
+# the schema_migrations table existed.
+MIGRATIONS = [
+    (1, 'Create users and todos tables', [
+        # Users first, then todos due to foreign key
+        USERS_TABLE_SCHEMA,
+        TODOS_TABLE_SCHEMA,
+    ]),
+    (2, 'Index todos for per-user listing', [
+        TODOS_USER_CREATED_INDEX,
+        TODOS_USER_COMPLETED_CREATED_INDEX,
+    ]),
+    (3, 'Track per-owner todo versions', [
+        TODO_VERSIONS_TABLE_SCHEMA,
+    ]),
+    # Triggers go in before the backfill so no write can slip between them
+    (4, 'Maintain todo counters', {
+        'postgresql': [
+            TODO_COUNTERS_TABLE_SCHEMA,
+            TODO_COUNTERS_POSTGRES_FUNCTION,
+            *TODO_COUNTERS_POSTGRES_TRIGGERS,
+            TODO_COUNTERS_RESET,
+            *TODO_COUNTERS_BACKFILL,
+        ],
+        'sqlite': [
+            TODO_COUNTERS_TABLE_SCHEMA,
+            *TODO_COUNTERS_SQLITE_TRIGGERS,
+            TODO_COUNTERS_RESET,
+            *TODO_COUNTERS_BACKFILL,
+        ],
+    }),
+    (5, 'Track revoked session tokens', [
+        REVOKED_TOKENS_TABLE_SCHEMA,
+        REVOKED_TOKENS_EXPIRES_INDEX,
+    ]),
+    (6, 'Index todo text for search', {
+        'postgresql': [
+            TODOS_SEARCH_VECTOR_COLUMN,
+            TODOS_SEARCH_VECTOR_INDEX,
+        ],
+        'sqlite': [
+            TODOS_FTS_SQLITE_TABLE,
+            *TODOS_FTS_SQLITE_TRIGGERS,
+            TODOS_FTS_SQLITE_REBUILD,
+        ],
+    }),
+    (7, 'Index todos for filtered and sorted listing', [
+        TODOS_USER_COLOR_CREATED_INDEX,
+        TODOS_USER_UPDATED_INDEX,
+        TODOS_USER_COMPLETED_UPDATED_INDEX,
+        TODOS_USER_COLOR_UPDATED_INDEX,
+    ]),
+    (8, 'Index the owner with todo text for search', {
+        'postgresql': [
+            TODOS_BTREE_GIN_EXTENSION,
+            TODOS_USER_SEARCH_VECTOR_INDEX,
+            TODOS_SEARCH_VECTOR_INDEX_DROP,
+        ],
+        'sqlite': [
+            *TODOS_FTS_SQLITE_DROP,
+            TODOS_FTS_SQLITE_CONTENT_VIEW,
+            TODOS_FTS_OWNER_SQLITE_TABLE,
+            *TODOS_FTS_OWNER_SQLITE_TRIGGERS,
+            TODOS_FTS_SQLITE_REBUILD,
+        ],
+    }),
+]
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent workers migrate once
+MIGRATION_LOCK_ID = 74201
+
+
+def _statements_for_dialect(statements) -> list:
+    if isinstance(statements, dict):
+        return statements.get('postgresql' if is_postgres() else 'sqlite', [])
+    return statements
+
+
+def _current_version(cursor) -> int:
+    cursor.execute("SELECT MAX(version) FROM schema_migrations")
+    row = cursor.fetchone()
+    return row[0] or 0
+
+
+def _begin(cursor):
+    """Start a migration transaction holding the schema lock"""
+    if is_postgres():
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+    else:
+        cursor.execute("BEGIN IMMEDIATE")
+
+
+def run_migrations() -> int:
+    """Apply pending migrations and return the resulting schema version"""
+    print(f"🗄️ Using {'PostgreSQL database (Neon)' if is_postgres() else 'SQLite database (local)'}")
+    placeholder = '%s' if is_postgres() else '?'
+
+    try:
+        with get_db_connection() as conn:
             cursor = conn.cursor()
-            
-            # Create tables in order (users first, then todos due to foreign key)
-            cursor.execute(USERS_TABLE_SCHEMA)
-            cursor.execute(TODOS_TABLE_SCHEMA)
+            cursor.execute(SCHEMA_MIGRATIONS_TABLE_SCHEMA)
             conn.commit()
-            
-            # Verify the tables were created correctly
-            cursor.execute("""
-                SELECT column_name, data_type 
-                FROM information_schema.columns 
-                WHERE table_name = 'todos' 
-                ORDER BY ordinal_position
-            """)
-            columns = cursor.fetchall()
-            print("📋 Todos table columns:")
-            for col in columns:
-                print(f"  - {col[0]} ({col[1]})")
-            
-            cursor.execute("""
-                SELECT column_name, data_type 
-                FROM information_schema.columns 
-                WHERE table_name = 'users' 
-                ORDER BY ordinal_position
-            """)
-            columns = cursor.fetchall()
-            print("📋 Users table columns:")
-            for col in columns:
-                print(f"  - {col[0]} ({col[1]})")
-            
-            conn.close()
-            print("✅ PostgreSQL tables created successfully!")
-            
-        except Exception as e:
-            print(f"❌ Error creating PostgreSQL tables: {e}")
+
+            # Fast path: a single indexed read when nothing is pending
+            version = _current_version(cursor)
+            latest = MIGRATIONS[-1][0]
+            if version >= latest:
+                conn.rollback()
+                print(f"✅ Database schema up to date (version {version})")
+                return version
+
+            for target, description, statements in MIGRATIONS:
+                _begin(cursor)
+                # Re-check under the lock in case another worker got here first
+                if _current_version(cursor) >= target:
+                    conn.rollback()
+                    continue
+
+                for statement in _statements_for_dialect(statements):
+                    cursor.execute(statement)
+                cursor.execute(
+                    f"INSERT INTO schema_migrations (version, description, applied_at) "
+                    f"VALUES ({placeholder}, {placeholder}, {placeholder})",
+                    (target, description, datetime.datetime.now().isoformat())
+                )
+                conn.commit()
+                print(f"⬆️ Applied migration {target}: {description}")
+
+            version = _current_version(cursor)
+            conn.rollback()
+            print(f"✅ Database schema up to date (version {version})")
+            return version
+
+    except Exception as e:
+        print(f"❌ Error running migrations: {e}")
+        if is_postgres():
             print("💡 Make sure your DATABASE_URL is correct in .env file")
-            
-    else:
-        # Use SQLite for local development
-        print("🗄️ Using SQLite database (local)")
-        db_file = 'todo_app.db'
-        if os.path.exists(db_file):
-            os.remove(db_file)
-            print(f"🗑️ Removed existing database: {db_file}")
-        
-        with sqlite3.connect(db_file) as conn:
-            # Create tables in order (users first, then todos due to foreign key)
-            conn.execute(USERS_TABLE_SCHEMA)
-            conn.execute(TODOS_TABLE_SCHEMA)
-            conn.commit()
-            
-            # Verify the tables were created correctly
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA table_info(todos)")
-            columns = cursor.fetchall()
-            print("📋 Todos table columns:")
-            for col in columns:
-                print(f"  - {col[1]} ({col[2]})")
-            
-            cursor.execute("PRAGMA table_info(users)")
-            columns = cursor.fetchall()
-            print("📋 Users table columns:")
-            for col in columns:
-                print(f"  - {col[1]} ({col[2]})")
-        
-        print("✅ SQLite tables created successfully!")
+        return 0
+
 
 if __name__ == "__main__":
-    create_tables()
\ No newline at end of file
+    run_migrations()
@@ -0,0 +1,425 @@
+"""
+Named SQL statements compiled once per dialect.
+
+Statements are written with ``?`` placeholders and compiled at import time
+into the SQLite form, the psycopg2 ``%s`` form, and a server-side prepared
+statement (``PREPARE``/``EXECUTE``) for PostgreSQL. Services refer to them by
+name through ``execute()`` so no SQL is re-built or re-planned per call.
+"""
+
+import json
+import os
+import re
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+from psycopg2.extras import execute_values
+from database import DATABASE_URL, is_postgres
+from metrics import record_query
+
+TODO_FIELDS = "id, user_id, text, color, completed, created_at, updated_at"
+
+
+def _server_prepare_enabled() -> bool:
+    """SQL-level PREPARE needs a session-pinned connection, which transaction
+    poolers such as PgBouncer (Neon's ``-pooler`` endpoints) do not give."""
+    setting = os.getenv('DB_SERVER_PREPARE', 'auto').lower()
+    if setting == 'auto':
+        return '-pooler.' not in DATABASE_URL
+    return setting in ('1', 'true', 'yes', 'on')
+
+
+DB_SERVER_PREPARE = _server_prepare_enabled()
+
+
+class Query:
+    """A named statement compiled for every supported dialect"""
+
+    def __init__(self, name: str, sql: Union[str, Dict[str, str]], prepare: bool = True):
+        # Statements that differ between backends are given as a dict keyed by
+        # 'postgresql' and 'sqlite'; both must take the same parameters.
+        if isinstance(sql, dict):
+            postgres_source, sqlite_source = sql['postgresql'], sql['sqlite']
+        else:
+            postgres_source = sqlite_source = sql
+        self.name = name
+        self.sql = ' '.join(postgres_source.split())
+        self.param_count = self.sql.count('?')
+        self.prepare = prepare
+
+        self.sqlite_sql = ' '.join(sqlite_source.split())
+        self.postgres_sql = self.sql.replace('%', '%%').replace('?', '%s')
+
+        # Server-side prepared form: PREPARE uses $n, EXECUTE passes the
+        # values through psycopg2's own parameter quoting.
+        self.statement_name = 'q_' + name.replace('.', '_')
+        numbered = self.sql
+        for index in range(1, self.param_count + 1):
+            numbered = numbered.replace('?', f'${index}', 1)
+        # $n form, also used as-is by asyncpg
+        self.numbered_sql = numbered
+        self.prepare_sql = f"PREPARE {self.statement_name} AS {numbered}"
+        if self.param_count:
+            args = ', '.join(['%s'] * self.param_count)
+            self.execute_sql = f"EXECUTE {self.statement_name} ({args})"
+        else:
+            self.execute_sql = f"EXECUTE {self.statement_name}"
+
+        # Multi-row form for INSERT ... VALUES (?, ...): psycopg2's
+        # execute_values expands a single VALUES %s into one statement.
+        values = re.search(r"VALUES\s*(\(\s*%s(?:\s*,\s*%s)*\s*\))", self.postgres_sql)
+        if values:
+            self.values_sql = self.postgres_sql[:values.start(1)] + '%s' + self.postgres_sql[values.end(1):]
+            self.values_template = values.group(1)
+        else:
+            self.values_sql = None
+            self.values_template = None
+
+
+QUERIES: Dict[str, Query] = {}
+
+
+def register(name: str, sql: Union[str, Dict[str, str]], prepare: bool = True) -> Query:
+    """Compile a statement and add it to the registry"""
+    query = Query(name, sql, prepare)
+    QUERIES[name] = query
+    return query
+
+
+def id_list(ids: List[str]):
+    """Adapt a list of ids for the IN_IDS placeholder of the current backend"""
+    return list(ids) if is_postgres() else json.dumps(list(ids))
+
+
+def search_owner(user_id: Optional[str]) -> str:
+    """The owner token of todos_fts: the hex of the user id, or 'guest'"""
+    return user_id.encode().hex() if user_id else 'guest'
+
+
+def search_match(terms: List[str], user_id: Optional[str] = None) -> str:
+    """Build the match parameter of todos.search_* for the current backend
+
+    Every term matches as a word prefix and all terms must match. Terms are
+    expected to be letters and digits only. On SQLite the match is also
+    narrowed to the owner's todos in the index itself.
+    """
+    if is_postgres():
+        return ' & '.join(f'{term}:*' for term in terms)
+    words = ' '.join(f'"{term}"*' for term in terms)
+    return f'owner : {search_owner(user_id)} AND text : ({words})'
+
+
+def execute(conn, name: str, params: Sequence = ()):
+    """Run a registered statement on conn and return the cursor"""
+    query = QUERIES[name]
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    try:
+        if not is_postgres():
+            cursor.execute(query.sqlite_sql, params)
+        elif DB_SERVER_PREPARE and query.prepare:
+            prepared = conn.prepared_statements
+            if query.name not in prepared:
+                cursor.execute(query.prepare_sql)
+                prepared.add(query.name)
+            cursor.execute(query.execute_sql, params)
+        else:
+            cursor.execute(query.postgres_sql, params)
+    finally:
+        record_query(name, time.perf_counter() - started)
+    return cursor
+
+
+def execute_many(conn, name: str, seq_of_params: Iterable[Sequence], page_size: int = 500):
+    """Run a registered statement for many parameter rows in as few round trips as possible
+
+    INSERT ... VALUES statements go out as multi-row VALUES on PostgreSQL;
+    SQLite runs executemany on its single prepared statement.
+    """
+    query = QUERIES[name]
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    try:
+        if not is_postgres():
+            cursor.executemany(query.sqlite_sql, seq_of_params)
+        elif query.values_sql:
+            execute_values(cursor, query.values_sql, seq_of_params,
+                           template=query.values_template, page_size=page_size)
+        else:
+            cursor.executemany(query.postgres_sql, seq_of_params)
+    finally:
+        record_query(name, time.perf_counter() - started)
+    return cursor
+
+
+def stream(conn, name: str, params: Sequence = (), chunk_size: int = 500) -> Iterator[tuple]:
+    """Yield the rows of a registered statement, holding at most chunk_size in memory
+
+    PostgreSQL uses a named (server-side) cursor, which cannot wrap EXECUTE, so
+    the plain statement is sent. Both backends step through the result with
+    fetchmany, which on the named cursor fetches one chunk per round trip.
+    """
+    query = QUERIES[name]
+    started = time.perf_counter()
+    if is_postgres():
+        cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cursor.execute(query.postgres_sql, params)
+    else:
+        cursor = conn.cursor()
+        cursor.execute(query.sqlite_sql, params)
+    # Time spent in the database, not in the consumer between chunks
+    elapsed = time.perf_counter() - started
+    try:
+        while True:
+            started = time.perf_counter()
+            rows = cursor.fetchmany(chunk_size)
+            elapsed += time.perf_counter() - started
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+        record_query(name, elapsed)
+
+
+# Todos
+register('todos.list_by_user', f"""
+    SELECT {TODO_FIELDS} FROM todos WHERE user_id = ?
+    ORDER BY created_at DESC, id DESC
+""")
+register('todos.list_guest', f"""
+    SELECT {TODO_FIELDS} FROM todos WHERE user_id IS NULL
+    ORDER BY created_at DESC, id DESC
+""")
+register('todos.list_completed_by_user', f"""
+    SELECT {TODO_FIELDS} FROM todos WHERE user_id = ? AND completed = ?
+    ORDER BY created_at DESC, id DESC
+""")
+register('todos.list_completed_guest', f"""
+    SELECT {TODO_FIELDS} FROM todos WHERE user_id IS NULL AND completed = ?
+    ORDER BY created_at DESC, id DESC
+""")
+
+# Keyset pages: newest first, continuing strictly after the (created_at, id)
+# of the previous page's last row so every page is an index range scan.
+register('todos.page_by_user', f"""
+    SELECT {TODO_FIELDS} FROM todos WHERE user_id = ?
+    ORDER BY created_at DESC, id DESC LIMIT ?
+""")
+register('todos.page_by_user_after', f"""
+    SELECT {TODO_FIELDS} FROM todos WHERE user_id = ? AND (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC LIMIT ?
+""")
+register('todos.page_guest', f"""
+    SELECT {TODO_FIELDS} FROM todos WHERE user_id IS NULL
+    ORDER BY created_at DESC, id DESC LIMIT ?
+""")
+register('todos.page_guest_after', f"""
+    SELECT {TODO_FIELDS} FROM todos WHERE user_id IS NULL AND (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC LIMIT ?
+""")
+register('todos.page_completed_by_user', f"""
+    SELECT {TODO_FIELDS} FROM todos WHERE user_id = ? AND completed = ?
+    ORDER BY created_at DESC, id DESC LIMIT ?
+""")
+register('todos.page_completed_by_user_after', f"""
+    SELECT {TODO_FIELDS} FROM todos
+    WHERE user_id = ? AND completed = ? AND (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC LIMIT ?
+""")
+register('todos.page_completed_guest', f"""
+    SELECT {TODO_FIELDS} FROM todos WHERE user_id IS NULL AND completed = ?
+    ORDER BY created_at DESC, id DESC LIMIT ?
+""")
+register('todos.page_completed_guest_after', f"""
+    SELECT {TODO_FIELDS} FROM todos
+    WHERE user_id IS NULL AND completed = ? AND (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC LIMIT ?
+""")
+
+# Filtered and sorted lists, one statement per whitelisted shape, registered
+# on first use. Equality filters come first so each shape reads one of the
+# (user_id, [completed | color,] created_at | updated_at, id) indexes in the
+# order requested. A range on the column that is not sorted on only filters:
+# on SQLite it is written as +column so the planner cannot pick its index
+# and sort the result instead.
+_LIST_CONDITIONS = {
+    'completed': ('completed', '='),
+    'color': ('color', '='),
+    'created_after': ('created_at', '>'),
+    'created_before': ('created_at', '<'),
+    'updated_after': ('updated_at', '>'),
+    'updated_before': ('updated_at', '<'),
+}
+_LIST_SORT_COLUMNS = {'created': 'created_at', 'updated': 'updated_at'}
+# Short forms for statement names, which PostgreSQL cuts at 63 characters
+_LIST_NAME_CODES = {
+    'completed': 'done', 'color': 'color',
+    'created_after': 'ca', 'created_before': 'cb', 'updated_after': 'ua', 'updated_before': 'ub',
+}
+
+
+def list_statement(owned: bool, filters: Sequence[str], sort: str = 'created', descending: bool = True,
+                   after: bool = False, paged: bool = False) -> str:
+    """Name of the list statement for a shape, registering it on first use
+
+    Parameters bind in order: user_id (when owned), the filter values in the
+    order given, the (sort column, id) of the previous page's last row when
+    after, and the limit when paged. Filters are given in _LIST_CONDITIONS order.
+    """
+    kind = 'page' if paged else 'list'
+    owner = 'by_user' if owned else 'guest'
+    if set(filters) <= {'completed'} and sort == 'created' and descending:
+        # The statements registered above
+        return f"todos.{kind}{'_completed' if filters else ''}_{owner}{'_after' if after else ''}"
+
+    name = f"todos.{kind}_{owner}"
+    if filters:
+        name += '.' + '_'.join(_LIST_NAME_CODES[field] for field in filters)
+    name += f".{sort}_{'desc' if descending else 'asc'}{'.after' if after else ''}"
+    if name in QUERIES:
+        return name
+
+    sort_column = _LIST_SORT_COLUMNS[sort]
+    statements = {}
+    for dialect in ('postgresql', 'sqlite'):
+        conditions = ['user_id = ?' if owned else 'user_id IS NULL']
+        for field in filters:
+            column, operator = _LIST_CONDITIONS[field]
+            if operator != '=' and column != sort_column and dialect == 'sqlite':
+                column = '+' + column
+            conditions.append(f"{column} {operator} ?")
+        if after:
+            conditions.append(f"({sort_column}, id) {'<' if descending else '>'} (?, ?)")
+        direction = 'DESC' if descending else 'ASC'
+        statements[dialect] = (f"SELECT {TODO_FIELDS} FROM todos WHERE {' AND '.join(conditions)} "
+                               f"ORDER BY {sort_column} {direction}, id {direction}"
+                               f"{' LIMIT ?' if paged else ''}")
+    register(name, statements)
+    return name
+
+
+# Full-text search, best match first, then newest. The first parameter is
+# the match expression from search_match(), which on SQLite already filters
+# on the owner. SQLite joins the FTS5 index back to todos by rowid, CROSS JOIN
+# keeping the planner from walking the owner's todos and probing the index per
+# row, and ranks on the text column only; PostgreSQL matches the
+# (user_id, search_vector) GIN index.
+_SEARCH_FIELDS = ', '.join(f't.{field}' for field in TODO_FIELDS.split(', '))
+_SEARCH = {
+    'postgresql': f"""
+        SELECT {_SEARCH_FIELDS} FROM todos t, to_tsquery('simple', ?) tsq
+        WHERE t.search_vector @@ tsq AND {{owner}}
+        ORDER BY ts_rank(t.search_vector, tsq) DESC, t.created_at DESC, t.id DESC
+        LIMIT ? OFFSET ?
+    """,
+    'sqlite': f"""
+        SELECT {_SEARCH_FIELDS} FROM todos_fts CROSS JOIN todos t ON t.rowid = todos_fts.rowid
+        WHERE todos_fts MATCH ? AND {{owner}}
+        ORDER BY bm25(todos_fts, 1.0, 0.0), t.created_at DESC, t.id DESC
+        LIMIT ? OFFSET ?
+    """,
+}
+register('todos.search_by_user', {
+    dialect: statement.format(owner='t.user_id = ?') for dialect, statement in _SEARCH.items()
+})
+register('todos.search_guest', {
+    dialect: statement.format(owner='t.user_id IS NULL') for dialect, statement in _SEARCH.items()
+})
+
+register('todos.get_by_user', f"""
+    SELECT {TODO_FIELDS} FROM todos WHERE id = ? AND user_id = ?
+""")
+register('todos.get_guest', f"""
+    SELECT {TODO_FIELDS} FROM todos WHERE id = ? AND user_id IS NULL
+""")
+register('todos.insert', """
+    INSERT INTO todos (id, user_id, text, color, completed, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+""")
+register('todos.delete_all_by_user', "DELETE FROM todos WHERE user_id = ?")
+register('todos.delete_all_guest', "DELETE FROM todos WHERE user_id IS NULL")
+
+# Mutations scoped to the owner are registered twice, as <name>_by_user
+# (user_id = ?) and <name>_guest (user_id IS NULL). Each is one atomic
+# statement whose RETURNING row replaces the old SELECT / UPDATE / re-SELECT.
+#
+# Bulk variants take the id list as a single parameter built with id_list():
+# an array for PostgreSQL, a JSON array expanded by json_each for SQLite, so
+# each statement stays static whatever the number of ids.
+IN_IDS = {
+    'postgresql': "id = ANY(?)",
+    'sqlite': "id IN (SELECT value FROM json_each(?))",
+}
+
+
+def _register_owned(name: str, statement: str):
+    """Register the per-user and guest variants of an owner-scoped statement"""
+    for suffix, owner in (('by_user', 'user_id = ?'), ('guest', 'user_id IS NULL')):
+        register(f'{name}_{suffix}', {
+            dialect: statement.format(owner=owner, ids=ids) for dialect, ids in IN_IDS.items()
+        })
+
+
+_register_owned('todos.toggle', f"""
+    UPDATE todos SET completed = NOT completed, updated_at = ?
+    WHERE id = ? AND {{owner}} RETURNING {TODO_FIELDS}
+""")
+_register_owned('todos.update', f"""
+    UPDATE todos SET text = COALESCE(?, text), completed = COALESCE(?, completed),
+        color = COALESCE(?, color), updated_at = ?
+    WHERE id = ? AND {{owner}} RETURNING {TODO_FIELDS}
+""")
+_register_owned('todos.delete', f"""
+    DELETE FROM todos WHERE id = ? AND {{owner}} RETURNING {TODO_FIELDS}
+""")
+_register_owned('todos.bulk_toggle', f"""
+    UPDATE todos SET completed = NOT completed, updated_at = ?
+    WHERE {{owner}} AND {{ids}} RETURNING {TODO_FIELDS}
+""")
+_register_owned('todos.bulk_update', f"""
+    UPDATE todos SET text = COALESCE(?, text), completed = COALESCE(?, completed),
+        color = COALESCE(?, color), updated_at = ?
+    WHERE {{owner}} AND {{ids}} RETURNING {TODO_FIELDS}
+""")
+_register_owned('todos.bulk_delete', f"""
+    DELETE FROM todos WHERE {{owner}} AND {{ids}} RETURNING {TODO_FIELDS}
+""")
+
+# Per-owner change versions ('' is the guest owner)
+register('todo_versions.get', "SELECT version, updated_at FROM todo_versions WHERE owner = ?")
+register('todo_versions.bump', """
+    INSERT INTO todo_versions (owner, version, updated_at) VALUES (?, 1, ?)
+    ON CONFLICT (owner) DO UPDATE
+    SET version = todo_versions.version + 1, updated_at = excluded.updated_at
+""")
+
+# Trigger-maintained counters: 'user:<id>', 'guest', and global shards 'all:N'
+register('todo_counters.get', "SELECT total, completed FROM todo_counters WHERE scope = ?")
+register('todo_counters.get_global', """
+    SELECT COALESCE(SUM(total), 0), COALESCE(SUM(completed), 0)
+    FROM todo_counters WHERE scope >= 'all:' AND scope < 'all;'
+""")
+
+# Users
+register('users.find_id_by_email', "SELECT id FROM users WHERE email = ?")
+register('users.insert', """
+    INSERT INTO users (id, email, password, name, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+""")
+register('users.get_by_email', """
+    SELECT id, email, password, name, created_at, updated_at
+    FROM users WHERE email = ?
+""")
+register('users.update_password', "UPDATE users SET password = ? WHERE id = ?")
+register('users.get_by_id', """
+    SELECT id, email, name, created_at, updated_at FROM users WHERE id = ?
+""")
+
+# Revoked session tokens, mirrored in memory by services.auth
+register('revoked_tokens.insert', """
+    INSERT INTO revoked_tokens (jti, user_id, expires_at, revoked_at) VALUES (?, ?, ?, ?)
+    ON CONFLICT (jti) DO NOTHING
+""")
+register('revoked_tokens.list_active', "SELECT jti, expires_at FROM revoked_tokens WHERE expires_at > ?")
+register('revoked_tokens.prune', "DELETE FROM revoked_tokens WHERE expires_at <= ?")
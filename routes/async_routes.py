@@ -0,0 +1,133 @@
+"""
+Async views for the ASGI app, keyed by the Flask endpoint they replace.
+
+URL matching still goes through the Flask app's url_map, so every route
+keeps the path, methods and strict-slash rules of its blueprint; endpoints
+without an async view here are served by the WSGI app.
+"""
+
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from flask import jsonify
+from controllers.async_todo_controller import AsyncTodoController
+from controllers.todo_controller import TodoController
+from routes.todo_routes import get_user_id_from_request
+from routes.user_routes import (LOGIN_FIELDS, REGISTER_FIELDS, busy_response, guest_count_response, read_fields,
+                                 result_response)
+from services.async_user_service import AsyncUserService
+from services.passwords import PasswordHashingBusy
+
+# endpoint -> (view, predicate telling when the request must go to the WSGI app instead)
+ASYNC_VIEWS: Dict[str, Tuple[Callable[..., Awaitable], Optional[Callable[[], bool]]]] = {}
+user_service = AsyncUserService()
+
+
+def async_view(endpoint: str, unless: Optional[Callable[[], bool]] = None):
+    """Register an async view for a Flask endpoint"""
+    def decorator(view):
+        ASYNC_VIEWS[endpoint] = (view, unless)
+        return view
+    return decorator
+
+
+# Streamed, filtered and sorted lists are served by the WSGI app
+@async_view('todos.get_completed_todos', unless=TodoController._wants_sync)
+async def get_completed_todos():
+    """GET /api/todos/completed - Get all completed todos"""
+    user_id = get_user_id_from_request()
+    return await AsyncTodoController.get_completed_todos(user_id)
+
+@async_view('todos.toggle_todo')
+async def toggle_todo(todo_id):
+    """PATCH /api/todos/:id/toggle - Toggle todo completion"""
+    user_id = get_user_id_from_request()
+    return await AsyncTodoController.toggle_todo(todo_id, user_id)
+
+@async_view('todos.get_todo')
+async def get_todo(todo_id):
+    """GET /api/todos/:id - Get a specific todo"""
+    user_id = get_user_id_from_request()
+    return await AsyncTodoController.get_todo(todo_id, user_id)
+
+@async_view('todos.update_todo')
+async def update_todo(todo_id):
+    """PUT /api/todos/:id - Update a todo"""
+    user_id = get_user_id_from_request()
+    return await AsyncTodoController.update_todo(todo_id, user_id)
+
+@async_view('todos.delete_todo')
+async def delete_todo(todo_id):
+    """DELETE /api/todos/:id - Delete a specific todo"""
+    user_id = get_user_id_from_request()
+    return await AsyncTodoController.delete_todo(todo_id, user_id)
+
+@async_view('todos.get_all_todos', unless=TodoController._wants_sync)
+async def get_all_todos():
+    """GET /api/todos - Get all todos"""
+    user_id = get_user_id_from_request()
+    return await AsyncTodoController.get_all_todos(user_id)
+
+@async_view('todos.create_todo')
+async def create_todo():
+    """POST /api/todos - Create a new todo"""
+    user_id = get_user_id_from_request()
+    return await AsyncTodoController.create_todo(user_id)
+
+@async_view('todos.get_todo_counts')
+async def get_todo_counts():
+    """GET /api/todos/counts - Get total/completed/active counts"""
+    user_id = get_user_id_from_request()
+    return await AsyncTodoController.get_todo_counts(user_id)
+
+@async_view('todos.get_guest_todo_count')
+async def get_guest_todo_count():
+    """GET /api/todos/guest-count - Get guest todo count"""
+    return await AsyncTodoController.get_guest_todo_count()
+
+@async_view('todos.delete_all_todos')
+async def delete_all_todos():
+    """DELETE /api/todos - Delete all todos"""
+    user_id = get_user_id_from_request()
+    return await AsyncTodoController.delete_all_todos(user_id)
+
+@async_view('health.health_check')
+async def health_check():
+    """GET /api/health - Health check endpoint"""
+    return await AsyncTodoController.health_check()
+
+@async_view('user.register')
+async def register():
+    """Register a new user"""
+    try:
+        values, error = read_fields(REGISTER_FIELDS)
+        if error:
+            return error
+
+        return result_response(await user_service.register_user(*values), 201, 400)
+
+    except PasswordHashingBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': f'Registration failed: {str(e)}'}), 500
+
+@async_view('user.login')
+async def login():
+    """Login user"""
+    try:
+        values, error = read_fields(LOGIN_FIELDS)
+        if error:
+            return error
+
+        return result_response(await user_service.login_user(*values), 200, 401)
+
+    except PasswordHashingBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': f'Login failed: {str(e)}'}), 500
+
+@async_view('user.get_guest_todo_count')
+async def get_guest_todo_count_for_user():
+    """Get count of guest todos"""
+    try:
+        return guest_count_response(await user_service.get_guest_todo_count())
+    except Exception as e:
+        return jsonify({'error': f'Failed to get guest todo count: {str(e)}'}), 500
@@ -1,9 +1,54 @@
-from flask import Blueprint
+import hmac
+import os
+from flask import Blueprint, abort, request
 from controllers.todo_controller import TodoController
 
 health_bp = Blueprint('health', __name__, url_prefix='/api')
 
+# Metrics, statement and cache statistics show query text and traffic, so they
+# are only served in development (APP_ENV=development) unless
+# DIAGNOSTICS_ENABLED says otherwise. With DIAGNOSTICS_TOKEN set, a request
+# sending it as Authorization: Bearer is served either way, e.g. a scraper.
+DIAGNOSTICS_ENABLED = os.getenv(
+    'DIAGNOSTICS_ENABLED', 'true' if os.getenv('APP_ENV') == 'development' else 'false'
+).lower() in ('1', 'true', 'yes')
+DIAGNOSTICS_TOKEN = os.getenv('DIAGNOSTICS_TOKEN', '')
+
+DIAGNOSTIC_ENDPOINTS = ('health.metrics', 'health.query_stats', 'health.cache_stats')
+
+
+def diagnostics_allowed() -> bool:
+    """Whether the current request may read the diagnostic endpoints"""
+    if DIAGNOSTICS_ENABLED:
+        return True
+    if not DIAGNOSTICS_TOKEN:
+        return False
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip().encode(), DIAGNOSTICS_TOKEN.encode())
+
+
+@health_bp.before_request
+def guard_diagnostics():
+    # Answer as if the route did not exist rather than advertise it
+    if request.endpoint in DIAGNOSTIC_ENDPOINTS and not diagnostics_allowed():
+        abort(404)
+
 @health_bp.route('/health', methods=['GET'])
 def health_check():
     """GET /api/health - Health check endpoint"""
-    return TodoController.health_check() 
\ No newline at end of file
+    return TodoController.health_check()
+
+@health_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """GET /api/metrics - Prometheus metrics"""
+    return TodoController.metrics()
+
+@health_bp.route('/db/queries', methods=['GET'])
+def query_stats():
+    """GET /api/db/queries - Top statements by total, mean or max time"""
+    return TodoController.query_stats()
+
+@health_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """GET /api/cache/stats - Todo cache hit/miss/eviction counters"""
+    return TodoController.cache_stats()
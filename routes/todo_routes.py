@@ -1,24 +1,58 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, abort
 from controllers.todo_controller import TodoController
+from services.auth import AUTH_ALLOW_USER_ID_HEADER, token_service
 
 todo_bp = Blueprint('todos', __name__, url_prefix='/api/todos')
 
 def get_user_id_from_request():
-    """Extract user_id from request headers or query params"""
-    # Check for user_id in headers (for authenticated requests)
-    user_id = request.headers.get('X-User-ID')
-    if user_id:
+    """Extract user_id from the bearer token; requests without credentials are guests"""
+    # Signed session token issued at login, verified without a database query.
+    # A token that fails verification is refused rather than downgraded to a
+    # guest, or a revoked session would act on the shared guest todos.
+    authorization = request.headers.get('Authorization')
+    if authorization:
+        scheme, _, token = authorization.partition(' ')
+        if scheme.lower() != 'bearer' or not token.strip():
+            abort(401, description='Authorization must be a Bearer token')
+        user_id = token_service.verify(token.strip())
+        if user_id is None:
+            abort(401, description='Invalid or expired token')
         return user_id
+
+    # Unauthenticated user id header, only while AUTH_ALLOW_USER_ID_HEADER
+    # is turned on to migrate older clients
+    if AUTH_ALLOW_USER_ID_HEADER:
+        user_id = request.headers.get('X-User-ID')
+        if user_id:
+            return user_id
     
     # For guest users, return None
     return None
 
 @todo_bp.route('/completed', methods=['GET'])
 def get_completed_todos():
-    """GET /api/todos/completed - Get all completed todos"""
+    """GET /api/todos/completed - Get all completed todos (same as ?completed=true)"""
     user_id = get_user_id_from_request()
     return TodoController.get_completed_todos(user_id)
 
+@todo_bp.route('/batch', methods=['POST'])
+def create_todos_batch():
+    """POST /api/todos/batch - Create many todos at once"""
+    user_id = get_user_id_from_request()
+    return TodoController.create_todos_batch(user_id)
+
+@todo_bp.route('/batch', methods=['PATCH'])
+def update_todos_batch():
+    """PATCH /api/todos/batch - Apply one operation to many todos"""
+    user_id = get_user_id_from_request()
+    return TodoController.update_todos_batch(user_id)
+
+@todo_bp.route('/batch', methods=['DELETE'])
+def delete_todos_batch():
+    """DELETE /api/todos/batch - Delete many todos"""
+    user_id = get_user_id_from_request()
+    return TodoController.delete_todos_batch(user_id)
+
 @todo_bp.route('/<todo_id>/toggle', methods=['PATCH'])
 def toggle_todo(todo_id):
     """PATCH /api/todos/:id/toggle - Toggle todo completion"""
@@ -45,7 +79,11 @@ def delete_todo(todo_id):
 
 @todo_bp.route('/', methods=['GET'])
 def get_all_todos():
-    """GET /api/todos - Get all todos"""
+    """GET /api/todos - Get all todos
+
+    Filters: completed, color, created_after, created_before, updated_after,
+    updated_before (ISO 8601). Order: sort=created|updated, order=desc|asc.
+    """
     user_id = get_user_id_from_request()
     return TodoController.get_all_todos(user_id)
 
@@ -55,6 +93,18 @@ def create_todo():
     user_id = get_user_id_from_request()
     return TodoController.create_todo(user_id)
 
+@todo_bp.route('/counts', methods=['GET'])
+def get_todo_counts():
+    """GET /api/todos/counts - Get total/completed/active counts"""
+    user_id = get_user_id_from_request()
+    return TodoController.get_todo_counts(user_id)
+
+@todo_bp.route('/search', methods=['GET'])
+def search_todos():
+    """GET /api/todos/search?q= - Search the text of todos"""
+    user_id = get_user_id_from_request()
+    return TodoController.search_todos(user_id)
+
 @todo_bp.route('/guest-count', methods=['GET'])
 def get_guest_todo_count():
     """GET /api/todos/guest-count - Get guest todo count"""
@@ -1,39 +1,77 @@
+from typing import Dict, List, Optional, Tuple
 from flask import Blueprint, request, jsonify
+from services.passwords import PasswordHashingBusy
 from services.user_service import UserService
 
 user_bp = Blueprint('user', __name__, url_prefix='/api/user')
 user_service = UserService()
 
+# Body fields of each endpoint and the error sent when one is missing; the
+# async views in routes/async_routes.py share these helpers
+REGISTER_FIELDS = (('email', 'password', 'name'), 'Email, password, and name are required')
+LOGIN_FIELDS = (('email', 'password'), 'Email and password are required')
+
+
+def read_fields(spec: Tuple[Tuple[str, ...], str]) -> Tuple[Optional[List], Optional[tuple]]:
+    """Read the required fields from the JSON body
+
+    Returns (values, None), or (None, response) when the body or a field is missing.
+    """
+    fields, missing = spec
+    data = request.get_json()
+
+    if not data:
+        return None, (jsonify({'error': 'No data provided'}), 400)
+
+    values = [data.get(field) for field in fields]
+
+    if not all(values):
+        return None, (jsonify({'error': missing}), 400)
+    return values, None
+
+
+def result_response(result: Tuple[bool, str, Optional[Dict]], status: int, failure_status: int) -> tuple:
+    """Response for the (success, message, user_data) a register or login returned"""
+    success, message, user_data = result
+
+    if success:
+        return jsonify({
+            'success': True,
+            'message': message,
+            'data': user_data
+        }), status
+    else:
+        return jsonify({
+            'success': False,
+            'error': message
+        }), failure_status
+
+
+def busy_response(error: PasswordHashingBusy) -> tuple:
+    return jsonify({'error': str(error)}), 503, {'Retry-After': '1'}
+
+
+def guest_count_response(count: int) -> tuple:
+    return jsonify({
+        'success': True,
+        'data': {
+            'count': count,
+            'remaining': max(0, 3 - count)
+        }
+    }), 200
+
 @user_bp.route('/register', methods=['POST'])
 def register():
     """Register a new user"""
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
-        email = data.get('email')
-        password = data.get('password')
-        name = data.get('name')
-        
-        if not all([email, password, name]):
-            return jsonify({'error': 'Email, password, and name are required'}), 400
-        
-        success, message, user_data = user_service.register_user(email, password, name)
-        
-        if success:
-            return jsonify({
-                'success': True,
-                'message': message,
-                'data': user_data
-            }), 201
-        else:
-            return jsonify({
-                'success': False,
-                'error': message
-            }), 400
-            
+        values, error = read_fields(REGISTER_FIELDS)
+        if error:
+            return error
+
+        return result_response(user_service.register_user(*values), 201, 400)
+
+    except PasswordHashingBusy as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'error': f'Registration failed: {str(e)}'}), 500
 
@@ -41,24 +79,32 @@ def register():
 def login():
     """Login user"""
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
-        email = data.get('email')
-        password = data.get('password')
+        values, error = read_fields(LOGIN_FIELDS)
+        if error:
+            return error
+
+        return result_response(user_service.login_user(*values), 200, 401)
+
+    except PasswordHashingBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': f'Login failed: {str(e)}'}), 500
+
+@user_bp.route('/logout', methods=['POST'])
+def logout():
+    """Revoke the session token sent as Authorization: Bearer"""
+    try:
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
         
-        if not all([email, password]):
-            return jsonify({'error': 'Email and password are required'}), 400
+        if scheme.lower() != 'bearer' or not token.strip():
+            return jsonify({'error': 'Bearer token required'}), 401
         
-        success, message, user_data = user_service.login_user(email, password)
+        success, message = user_service.logout_user(token.strip())
         
         if success:
             return jsonify({
                 'success': True,
-                'message': message,
-                'data': user_data
+                'message': message
             }), 200
         else:
             return jsonify({
@@ -67,19 +113,12 @@ def login():
             }), 401
             
     except Exception as e:
-        return jsonify({'error': f'Login failed: {str(e)}'}), 500
+        return jsonify({'error': f'Logout failed: {str(e)}'}), 500
 
 @user_bp.route('/guest-todo-count', methods=['GET'])
 def get_guest_todo_count():
     """Get count of guest todos"""
     try:
-        count = user_service.get_guest_todo_count()
-        return jsonify({
-            'success': True,
-            'data': {
-                'count': count,
-                'remaining': max(0, 3 - count)
-            }
-        }), 200
+        return guest_count_response(user_service.get_guest_todo_count())
     except Exception as e:
         return jsonify({'error': f'Failed to get guest todo count: {str(e)}'}), 500
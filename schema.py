@@ -22,6 +22,321 @@ CREATE TABLE IF NOT EXISTS todos (
 );
 """
 
+SCHEMA_MIGRATIONS_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP NOT NULL
+);
+"""
+
+# Covering indexes for the per-user listing queries
+# (WHERE user_id = ... [AND completed = ...] ORDER BY created_at DESC)
+TODOS_USER_CREATED_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_todos_user_created
+ON todos (user_id, created_at, id);
+"""
+
+TODOS_USER_COMPLETED_CREATED_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_todos_user_completed_created
+ON todos (user_id, completed, created_at, id);
+"""
+
+# Indexes for the filtered and sorted list: by color, and ordered by last
+# update, alone or after the completed / color filter
+TODOS_USER_COLOR_CREATED_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_todos_user_color_created
+ON todos (user_id, color, created_at, id);
+"""
+
+TODOS_USER_UPDATED_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_todos_user_updated
+ON todos (user_id, updated_at, id);
+"""
+
+TODOS_USER_COMPLETED_UPDATED_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_todos_user_completed_updated
+ON todos (user_id, completed, updated_at, id);
+"""
+
+TODOS_USER_COLOR_UPDATED_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_todos_user_color_updated
+ON todos (user_id, color, updated_at, id);
+"""
+
+# One row per todo owner ('' for guests), bumped by every write so list and
+# item responses can be revalidated without reading the todos table
+TODO_VERSIONS_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS todo_versions (
+    owner VARCHAR(255) PRIMARY KEY,
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
+"""
+
+# Row counts per scope: 'user:<id>', 'guest', and the global total split over
+# 'all:0' .. 'all:7' so concurrent writers do not all queue on one row.
+# Maintained by triggers on todos, so every write path updates them in the
+# same transaction.
+TODO_COUNTER_SHARDS = 8
+
+TODO_COUNTERS_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS todo_counters (
+    scope VARCHAR(255) PRIMARY KEY,
+    total BIGINT NOT NULL DEFAULT 0,
+    completed BIGINT NOT NULL DEFAULT 0
+);
+"""
+
+TODO_COUNTERS_RESET = "DELETE FROM todo_counters;"
+
+TODO_COUNTERS_BACKFILL = [
+    """
+    INSERT INTO todo_counters (scope, total, completed)
+    SELECT COALESCE('user:' || user_id, 'guest'), COUNT(*),
+           SUM(CASE WHEN completed THEN 1 ELSE 0 END)
+    FROM todos GROUP BY user_id;
+    """,
+    """
+    INSERT INTO todo_counters (scope, total, completed)
+    SELECT 'all:0', COUNT(*), COALESCE(SUM(CASE WHEN completed THEN 1 ELSE 0 END), 0)
+    FROM todos;
+    """,
+]
+
+_SQLITE_OWNER_SCOPE = "COALESCE('user:' || {row}.user_id, 'guest')"
+_SQLITE_GLOBAL_SCOPE = f"'all:' || (abs(random()) % {TODO_COUNTER_SHARDS})"
+_SQLITE_BUMP = """
+    INSERT INTO todo_counters (scope, total, completed) VALUES ({scope}, {total}, {completed})
+    ON CONFLICT (scope) DO UPDATE
+    SET total = total + excluded.total, completed = completed + excluded.completed;
+"""
+
+
+def _sqlite_bumps(row: str, total: str, completed: str) -> str:
+    return ''.join(
+        _SQLITE_BUMP.format(scope=scope, total=total, completed=completed)
+        for scope in (_SQLITE_OWNER_SCOPE.format(row=row), _SQLITE_GLOBAL_SCOPE)
+    )
+
+
+TODO_COUNTERS_SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todos_counters_insert AFTER INSERT ON todos
+    BEGIN {_sqlite_bumps('NEW', '1', 'NEW.completed')} END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todos_counters_delete AFTER DELETE ON todos
+    BEGIN {_sqlite_bumps('OLD', '-1', '-OLD.completed')} END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todos_counters_update AFTER UPDATE OF completed ON todos
+    WHEN OLD.completed IS NOT NEW.completed
+    BEGIN {_sqlite_bumps('NEW', '0', 'NEW.completed - OLD.completed')} END;
+    """,
+]
+
+# PostgreSQL uses statement-level triggers with transition tables, so a bulk
+# statement updates each counter row once rather than once per todo.
+_POSTGRES_ROW_DELTAS = {
+    'INSERT': "SELECT user_id, 1 AS total, completed::int AS completed FROM new_rows",
+    'DELETE': "SELECT user_id, -1 AS total, -(completed::int) AS completed FROM old_rows",
+    'UPDATE': """
+        SELECT n.user_id, 0 AS total, n.completed::int - o.completed::int AS completed
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n.completed IS DISTINCT FROM o.completed
+    """,
+}
+_POSTGRES_APPLY_DELTAS = """
+        INSERT INTO todo_counters AS c (scope, total, completed)
+        SELECT scope, SUM(total), SUM(completed) FROM (
+            SELECT COALESCE('user:' || user_id, 'guest') AS scope, total, completed FROM ({deltas}) d
+            UNION ALL
+            SELECT global_scope, total, completed FROM ({deltas}) d
+        ) scoped
+        GROUP BY scope
+        ON CONFLICT (scope) DO UPDATE
+        SET total = c.total + EXCLUDED.total, completed = c.completed + EXCLUDED.completed;
+"""
+
+TODO_COUNTERS_POSTGRES_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION todos_maintain_counters() RETURNS trigger AS $$
+DECLARE
+    global_scope TEXT := 'all:' || floor(random() * {TODO_COUNTER_SHARDS})::int;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {_POSTGRES_APPLY_DELTAS.format(deltas=_POSTGRES_ROW_DELTAS['INSERT'])}
+    ELSIF TG_OP = 'DELETE' THEN
+        {_POSTGRES_APPLY_DELTAS.format(deltas=_POSTGRES_ROW_DELTAS['DELETE'])}
+    ELSE
+        {_POSTGRES_APPLY_DELTAS.format(deltas=_POSTGRES_ROW_DELTAS['UPDATE'])}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TODO_COUNTERS_POSTGRES_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS todos_counters_insert ON todos;",
+    """
+    CREATE TRIGGER todos_counters_insert AFTER INSERT ON todos
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION todos_maintain_counters();
+    """,
+    "DROP TRIGGER IF EXISTS todos_counters_delete ON todos;",
+    """
+    CREATE TRIGGER todos_counters_delete AFTER DELETE ON todos
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION todos_maintain_counters();
+    """,
+    "DROP TRIGGER IF EXISTS todos_counters_update ON todos;",
+    """
+    CREATE TRIGGER todos_counters_update AFTER UPDATE ON todos
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION todos_maintain_counters();
+    """,
+]
+
+# Session tokens revoked before they expire, keyed by the token's id.
+# expires_at is the token's own expiry in epoch seconds, after which the row
+# can be dropped.
+REVOKED_TOKENS_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti VARCHAR(64) PRIMARY KEY,
+    user_id VARCHAR(255) NOT NULL,
+    expires_at BIGINT NOT NULL,
+    revoked_at TIMESTAMP NOT NULL
+);
+"""
+
+REVOKED_TOKENS_EXPIRES_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires
+ON revoked_tokens (expires_at);
+"""
+
+# Full-text index over todo text, as created by migration 6. On SQLite an
+# FTS5 table whose content is read from todos. Only the text is indexed: a
+# search walks the rows matching its words and checks the owner on todos.
+# Diacritics are kept to match the 'simple' configuration used on PostgreSQL.
+TODOS_FTS_SQLITE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(
+    text,
+    content='todos', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 0',
+    prefix='2 3'
+);
+"""
+
+# An external-content index is only as good as its triggers: every change to
+# a todo's text is mirrored into todos_fts in the same transaction
+TODOS_FTS_SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos
+    BEGIN
+        INSERT INTO todos_fts (rowid, text) VALUES (NEW.rowid, NEW.text);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos
+    BEGIN
+        INSERT INTO todos_fts (todos_fts, rowid, text) VALUES ('delete', OLD.rowid, OLD.text);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF text ON todos
+    WHEN OLD.text IS NOT NEW.text
+    BEGIN
+        INSERT INTO todos_fts (todos_fts, rowid, text) VALUES ('delete', OLD.rowid, OLD.text);
+        INSERT INTO todos_fts (rowid, text) VALUES (NEW.rowid, NEW.text);
+    END;
+    """,
+]
+
+# Re-reads every todo into the index. Also the repair after a VACUUM, which
+# may renumber the rowids todos_fts points at.
+TODOS_FTS_SQLITE_REBUILD = "INSERT INTO todos_fts (todos_fts) VALUES ('rebuild');"
+
+# On PostgreSQL a generated tsvector column, so no trigger can miss an update
+TODOS_SEARCH_VECTOR_COLUMN = """
+ALTER TABLE todos ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (to_tsvector('simple', text)) STORED;
+"""
+
+TODOS_SEARCH_VECTOR_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_todos_search_vector
+ON todos USING GIN (search_vector);
+"""
+
+# Migration 8 puts the owner into the search indexes, so a search reads the
+# entries of one owner's matching todos rather than every todo holding its
+# words. FTS5 can only filter on what it tokenizes: the owner column holds one
+# token, the hex of the user id or 'guest' (see queries.search_owner), read
+# from todos through a view so 'rebuild' still works.
+TODOS_FTS_SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS todos_fts_insert;",
+    "DROP TRIGGER IF EXISTS todos_fts_delete;",
+    "DROP TRIGGER IF EXISTS todos_fts_update;",
+    "DROP TABLE IF EXISTS todos_fts;",
+]
+
+TODOS_FTS_SQLITE_CONTENT_VIEW = """
+CREATE VIEW IF NOT EXISTS todos_fts_content AS
+SELECT rowid AS rowid, text,
+       CASE WHEN user_id IS NULL THEN 'guest' ELSE hex(user_id) END AS owner
+FROM todos;
+"""
+
+TODOS_FTS_OWNER_SQLITE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(
+    text,
+    owner,
+    content='todos_fts_content', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 0',
+    prefix='2 3'
+);
+"""
+
+_FTS_OWNER = "CASE WHEN {row}.user_id IS NULL THEN 'guest' ELSE hex({row}.user_id) END"
+
+TODOS_FTS_OWNER_SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos
+    BEGIN
+        INSERT INTO todos_fts (rowid, text, owner)
+        VALUES (NEW.rowid, NEW.text, {_FTS_OWNER.format(row='NEW')});
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos
+    BEGIN
+        INSERT INTO todos_fts (todos_fts, rowid, text, owner)
+        VALUES ('delete', OLD.rowid, OLD.text, {_FTS_OWNER.format(row='OLD')});
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF text, user_id ON todos
+    WHEN OLD.text IS NOT NEW.text OR OLD.user_id IS NOT NEW.user_id
+    BEGIN
+        INSERT INTO todos_fts (todos_fts, rowid, text, owner)
+        VALUES ('delete', OLD.rowid, OLD.text, {_FTS_OWNER.format(row='OLD')});
+        INSERT INTO todos_fts (rowid, text, owner)
+        VALUES (NEW.rowid, NEW.text, {_FTS_OWNER.format(row='NEW')});
+    END;
+    """,
+]
+
+# On PostgreSQL btree_gin lets one GIN index key the owner next to the
+# search vector; it also serves guest searches on the vector alone, so it
+# replaces idx_todos_search_vector
+TODOS_BTREE_GIN_EXTENSION = "CREATE EXTENSION IF NOT EXISTS btree_gin;"
+
+TODOS_USER_SEARCH_VECTOR_INDEX = """
+CREATE INDEX IF NOT EXISTS idx_todos_user_search_vector
+ON todos USING GIN (user_id, search_vector);
+"""
+
+TODOS_SEARCH_VECTOR_INDEX_DROP = "DROP INDEX IF EXISTS idx_todos_search_vector;"
+
 USERS_COLUMNS = [
     'id',
     'email',
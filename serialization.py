@@ -0,0 +1,139 @@
+"""
+Compact todo rows and the JSON encoding of API responses.
+
+Todos travel from the cursor to the response as ``Todo`` tuples instead of
+one dict per row. ``FastJSONProvider`` replaces Flask's DefaultJSONProvider
+and writes rows straight into the response body. Its output is byte for byte
+what DefaultJSONProvider produces for the same todos as dicts: sorted keys,
+ASCII escapes, compact separators and dates as HTTP dates.
+"""
+
+import os
+from json.encoder import encode_basestring_ascii
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 'auto' encodes lists of todos with orjson when it is installed, 'json'
+# always uses the standard library
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto').lower()
+
+_COMPACT = (',', ':')
+
+
+class Todo(tuple):
+    """A todo row: (id, user_id, text, color, completed, created_at, updated_at)
+
+    The columns are in the order of queries.TODO_FIELDS, so a fetched row
+    becomes a Todo with Todo(row), and a new Todo is the parameter tuple of
+    todos.insert. The JSON form is to_dict().
+    """
+
+    __slots__ = ()
+
+    id = property(itemgetter(0))
+    user_id = property(itemgetter(1))
+    text = property(itemgetter(2))
+    color = property(itemgetter(3))
+    completed = property(lambda self: bool(self[4]))
+    created_at = property(itemgetter(5))
+    updated_at = property(itemgetter(6))
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self[0],
+            'user_id': self[1],
+            'text': self[2],
+            'color': self[3],
+            'completed': bool(self[4]),
+            'createdAt': self[5],
+            'updatedAt': self[6]
+        }
+
+
+def todo_rows(rows: Iterable) -> List[Todo]:
+    """Wrap fetched rows (tuples, asyncpg records) as Todos"""
+    return list(map(Todo, rows))
+
+
+def _plain(obj: Any) -> Any:
+    """Replace Todos with their dicts; the standard encoder would write tuples as arrays"""
+    if isinstance(obj, Todo):
+        return obj.to_dict()
+    if isinstance(obj, (list, tuple)):
+        return [_plain(item) for item in obj]
+    if isinstance(obj, dict):
+        return {key: _plain(value) for key, value in obj.items()}
+    return obj
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider that encodes Todo rows without building dicts
+
+    The fast path covers the compact output Flask uses for responses;
+    indented debug output, non-default provider settings and values it does
+    not recognise go through the standard encoder.
+    """
+
+    use_orjson = orjson is not None and JSON_BACKEND != 'json'
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs == {'separators': _COMPACT} and self.ensure_ascii and self.sort_keys:
+            try:
+                return self._encode(obj)
+            except TypeError:
+                pass
+        return super().dumps(_plain(obj), **kwargs)
+
+    def _encode(self, obj: Any) -> str:
+        kind = type(obj)
+        if kind is str:
+            return encode_basestring_ascii(obj)
+        if kind is Todo:
+            return self._encode_todo(obj)
+        if kind is list or kind is tuple:
+            if obj and all(type(item) is Todo for item in obj):
+                return self._encode_todos(obj)
+            return '[' + ','.join([self._encode(item) for item in obj]) + ']'
+        if kind is dict and all(type(key) is str for key in obj):
+            return '{' + ','.join([f'{encode_basestring_ascii(key)}:{self._encode(obj[key])}'
+                                   for key in sorted(obj)]) + '}'
+        return super().dumps(_plain(obj), separators=_COMPACT)
+
+    def _encode_todos(self, todos: List[Todo]) -> str:
+        if self.use_orjson:
+            # orjson only encodes its own types natively, so it gets one
+            # short-lived dict per row. It writes non-ASCII text as UTF-8 and
+            # leaves DEL unescaped; such output is redone below.
+            out = orjson.dumps([
+                {'color': todo[3], 'completed': bool(todo[4]), 'createdAt': todo[5], 'id': todo[0],
+                 'text': todo[2], 'updatedAt': todo[6], 'user_id': todo[1]}
+                for todo in todos
+            ], default=self.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+            if out.isascii() and b'\x7f' not in out:
+                return out.decode('ascii')
+        return '[' + ','.join([self._encode_todo(todo) for todo in todos]) + ']'
+
+    def _encode_todo(self, todo: Todo) -> str:
+        todo_id, user_id, text, color, completed, created_at, updated_at = todo
+        return (f'{{"color":{"null" if color is None else encode_basestring_ascii(color)},'
+                f'"completed":{"true" if completed else "false"},'
+                f'"createdAt":{self._encode_timestamp(created_at)},'
+                f'"id":{encode_basestring_ascii(todo_id)},'
+                f'"text":{encode_basestring_ascii(text)},'
+                f'"updatedAt":{self._encode_timestamp(updated_at)},'
+                f'"user_id":{"null" if user_id is None else encode_basestring_ascii(user_id)}}}')
+
+    def _encode_timestamp(self, value: Any) -> str:
+        """A timestamp column: text on SQLite, datetime on PostgreSQL"""
+        if type(value) is str:
+            return encode_basestring_ascii(value)
+        if value is None:
+            return 'null'
+        return encode_basestring_ascii(self.default(value))
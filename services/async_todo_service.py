@@ -0,0 +1,248 @@
+import asyncio
+import datetime
+from typing import Dict, List, Optional, Tuple
+from async_database import get_async_connection, get_async_read_connection
+from database import replicas
+from serialization import Todo, todo_rows
+from services.async_user_service import AsyncUserService
+from services.cache import todo_cache
+from services.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
+from services.todo_service import TodoService, todo_writer
+
+
+class AsyncTodoService(TodoService):
+    """asyncio variant of TodoService for the ASGI app
+
+    Reads and writes run the same registered statements and share the todo
+    cache, so both request paths see each other's invalidations. Batch writes
+    and streamed lists stay on the sync service.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.user_service = AsyncUserService()
+
+    async def get_all_todos(self, user_id: Optional[str] = None) -> List[Todo]:
+        """Get all todos for a user or guest todos if no user_id"""
+        try:
+            return await todo_cache.get_or_load_async(user_id, ('list', 'all'),
+                                                      lambda: self._list_todos(user_id, completed_only=False),
+                                                      (await self.get_version(user_id))[0])
+        except Exception as e:
+            return []
+
+    async def get_completed_todos(self, user_id: Optional[str] = None) -> List[Todo]:
+        """Get completed todos for a user or guest"""
+        try:
+            return await todo_cache.get_or_load_async(user_id, ('list', 'completed'),
+                                                      lambda: self._list_todos(user_id, completed_only=True),
+                                                      (await self.get_version(user_id))[0])
+        except Exception as e:
+            return []
+
+    async def _list_todos(self, user_id: Optional[str], completed_only: bool) -> List[Todo]:
+        """Query the full list of a user's (or guest) todos, newest first"""
+        async with get_async_read_connection(user_id) as conn:
+            if completed_only:
+                if user_id:
+                    todos = await conn.fetchall('todos.list_completed_by_user', (user_id, True))
+                else:
+                    todos = await conn.fetchall('todos.list_completed_guest', (True,))
+            else:
+                if user_id:
+                    todos = await conn.fetchall('todos.list_by_user', (user_id,))
+                else:
+                    todos = await conn.fetchall('todos.list_guest')
+
+            return todo_rows(todos)
+
+    async def get_todos_page(self, user_id: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                             cursor: Optional[str] = None, completed_only: bool = False) -> Tuple[List[Todo], Optional[str]]:
+        """Get one keyset page of todos, newest first, and the cursor for the next page"""
+        after = decode_cursor(cursor) if cursor else ()
+        return await todo_cache.get_or_load_async(user_id, ('page', completed_only, limit, cursor),
+                                                  lambda: self._query_page(user_id, limit, after, completed_only),
+                                                  (await self.get_version(user_id))[0])
+
+    async def _query_page(self, user_id: Optional[str], limit: int, after: tuple,
+                          completed_only: bool) -> Tuple[List[Todo], Optional[str]]:
+        """Run the keyset query for one page"""
+        name = 'todos.page_completed' if completed_only else 'todos.page'
+        name += '_by_user' if user_id else '_guest'
+        if after:
+            name += '_after'
+
+        params = []
+        if user_id:
+            params.append(user_id)
+        if completed_only:
+            params.append(True)
+        params.extend(after)
+        # Fetch one extra row to learn whether another page follows
+        params.append(limit + 1)
+
+        async with get_async_read_connection(user_id) as conn:
+            rows = await conn.fetchall(name, params)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last[5], last[0])
+
+        return todo_rows(rows), next_cursor
+
+    async def get_todo_by_id(self, todo_id: str, user_id: Optional[str] = None) -> Optional[Todo]:
+        """Get todo by ID, ensuring user can only access their own todos"""
+        try:
+            return await todo_cache.get_or_load_async(user_id, ('item', todo_id),
+                                                      lambda: self._load_todo(todo_id, user_id),
+                                                      (await self.get_version(user_id))[0])
+        except Exception as e:
+            return None
+
+    async def _load_todo(self, todo_id: str, user_id: Optional[str]) -> Optional[Todo]:
+        """Query a single todo scoped to its owner"""
+        async with get_async_read_connection(user_id) as conn:
+            if user_id:
+                todo = await conn.fetchone('todos.get_by_user', (todo_id, user_id))
+            else:
+                todo = await conn.fetchone('todos.get_guest', (todo_id,))
+
+            return Todo(todo) if todo else None
+
+    async def create_todo(self, text: str, user_id: Optional[str] = None, color: Optional[str] = None) -> Optional[Todo]:
+        """Create a new todo"""
+        if not text or not text.strip():
+            raise ValueError("Text is required")
+
+        # Check guest todo limit
+        if not user_id:
+            guest_count = await self.user_service.get_guest_todo_count()
+            if guest_count >= 3:
+                raise ValueError("Guest users can only create 3 todos. Please register to create unlimited todos.")
+
+        todo = self._new_todo(text, user_id, color)
+        if todo_writer is not None:
+            self._forget_version(user_id)
+            return await asyncio.wrap_future(todo_writer.submit(todo))
+
+        async with get_async_connection() as conn:
+            await conn.execute('todos.insert', todo)
+            await self._bump_version(conn, user_id)
+
+            await conn.commit()
+            todo_cache.invalidate(user_id, ())
+
+            return todo
+
+    async def update_todo(self, todo_id: str, text: Optional[str] = None, completed: Optional[bool] = None,
+                          color: Optional[str] = None, user_id: Optional[str] = None) -> Optional[Todo]:
+        """Update a todo"""
+        try:
+            return await self._mutate(self._owned('todos.update', user_id), self._owner_params([
+                text.strip() if text is not None else None,
+                completed,
+                color,
+                self._get_current_timestamp(),
+                todo_id
+            ], user_id), todo_id, user_id)
+        except Exception as e:
+            return None
+
+    async def toggle_todo(self, todo_id: str, user_id: Optional[str] = None) -> Optional[Todo]:
+        """Toggle todo completion status"""
+        try:
+            return await self._mutate(self._owned('todos.toggle', user_id), self._owner_params(
+                [self._get_current_timestamp(), todo_id], user_id
+            ), todo_id, user_id)
+        except Exception as e:
+            return None
+
+    async def delete_todo(self, todo_id: str, user_id: Optional[str] = None) -> Optional[Todo]:
+        """Delete a todo"""
+        try:
+            return await self._mutate(self._owned('todos.delete', user_id),
+                                      self._owner_params([todo_id], user_id), todo_id, user_id)
+        except Exception as e:
+            return None
+
+    async def _mutate(self, name: str, params: List, todo_id: str, user_id: Optional[str]) -> Optional[Todo]:
+        """Run a single-todo RETURNING statement, bumping the version if a row matched"""
+        async with get_async_connection() as conn:
+            todo = await conn.fetchone(name, params)
+            if todo:
+                await self._bump_version(conn, user_id)
+            await conn.commit()
+            todo_cache.invalidate(user_id, (todo_id,))
+
+            return Todo(todo) if todo else None
+
+    async def delete_all_todos(self, user_id: Optional[str] = None) -> int:
+        """Delete all todos for a user or guest"""
+        try:
+            async with get_async_connection() as conn:
+                if user_id:
+                    deleted_count = await conn.execute('todos.delete_all_by_user', (user_id,))
+                else:
+                    deleted_count = await conn.execute('todos.delete_all_guest')
+
+                if deleted_count:
+                    await self._bump_version(conn, user_id)
+                await conn.commit()
+                todo_cache.invalidate(user_id)
+
+                return deleted_count
+
+        except Exception as e:
+            return 0
+
+    async def get_guest_todo_count(self) -> int:
+        """Get count of guest todos"""
+        return await self.user_service.get_guest_todo_count()
+
+    async def get_todo_count(self, user_id: Optional[str] = None) -> int:
+        """Get todo count for a user or guest"""
+        return (await self.get_todo_counts(user_id))['total']
+
+    async def get_todo_counts(self, user_id: Optional[str] = None) -> Dict[str, int]:
+        """Get total/completed/active counts for a user or guest from the counters table"""
+        try:
+            async with get_async_read_connection(user_id) as conn:
+                scope = f"user:{user_id}" if user_id else 'guest'
+                row = await conn.fetchone('todo_counters.get', (scope,))
+
+                return self._counts(row)
+
+        except Exception as e:
+            return self._counts(None)
+
+    async def get_global_todo_counts(self) -> Dict[str, int]:
+        """Get total/completed/active counts across every owner"""
+        try:
+            async with get_async_read_connection() as conn:
+                row = await conn.fetchone('todo_counters.get_global')
+
+                return self._counts(row)
+
+        except Exception as e:
+            return self._counts(None)
+
+    async def get_version(self, user_id: Optional[str] = None) -> Tuple[int, Optional[datetime.datetime]]:
+        """Get the change version and last-modified time of a user's (or guest) todos, once per request"""
+        versions = self._request_versions()
+        owner = user_id or ''
+        if owner not in versions:
+            async with get_async_read_connection(user_id) as conn:
+                row = await conn.fetchone('todo_versions.get', (owner,))
+            versions[owner] = self._version_row(row)
+        return versions[owner]
+
+    async def _bump_version(self, conn, user_id: Optional[str]):
+        """Advance the owner's change version inside the caller's transaction"""
+        await conn.execute('todo_versions.bump', (user_id or '', self._get_current_timestamp()))
+        replicas.note_write(user_id or '')
+        self._forget_version(user_id)
+
+
+async_todo_service = AsyncTodoService()
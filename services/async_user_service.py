@@ -0,0 +1,113 @@
+from typing import Dict, Optional, Tuple
+from async_database import get_async_connection, release_async_request_connection
+from services.auth import token_service
+from services.passwords import PasswordHashingBusy, password_hasher
+from services.user_service import UserService
+
+
+class AsyncUserService(UserService):
+    """asyncio variant of UserService for the ASGI app"""
+
+    async def register_user(self, email: str, password: str, name: str) -> Tuple[bool, str, Optional[Dict]]:
+        """Register a new user"""
+        try:
+            async with get_async_connection() as conn:
+                # Check if user already exists
+                if await conn.fetchone('users.find_id_by_email', (email,)):
+                    return False, "User with this email already exists", None
+
+            # The KDF is deliberately slow; no pooled connection waits on it
+            await release_async_request_connection()
+
+            # Create new user
+            user_id = self._generate_id()
+            hashed_password = await password_hasher.hash_async(password)
+            created_at = self._get_current_timestamp()
+
+            async with get_async_connection() as conn:
+                await conn.execute('users.insert',
+                                   (user_id, email, hashed_password, name, created_at, created_at))
+
+                await conn.commit()
+
+                # Return user data without password
+                user_data = {
+                    'id': user_id,
+                    'email': email,
+                    'name': name,
+                    'created_at': created_at
+                }
+
+                return True, "User registered successfully", user_data
+
+        except PasswordHashingBusy:
+            raise
+        except Exception as e:
+            return False, f"Registration failed: {str(e)}", None
+
+    async def login_user(self, email: str, password: str) -> Tuple[bool, str, Optional[Dict]]:
+        """Authenticate user login"""
+        try:
+            async with get_async_connection() as conn:
+                user = await conn.fetchone('users.get_by_email', (email,))
+
+            # The KDF is deliberately slow; no pooled connection waits on it
+            await release_async_request_connection()
+            matches, needs_rehash = await password_hasher.verify_async(
+                password, user[2] if user else password_hasher.dummy_hash
+            )
+
+            if user and matches:
+                if needs_rehash:
+                    # Upgrade legacy SHA-256 (or outdated KDF settings) now that we know the password
+                    hashed_password = await password_hasher.hash_async(password)
+                    async with get_async_connection() as conn:
+                        await conn.execute('users.update_password', (hashed_password, user[0]))
+                        await conn.commit()
+
+                user_data = {
+                    'id': user[0],
+                    'email': user[1],
+                    'name': user[3],
+                    'created_at': user[4],
+                    'updated_at': user[5]
+                }
+                user_data.update(token_service.issue(user[0]))
+                return True, "Login successful", user_data
+            else:
+                return False, "Invalid email or password", None
+
+        except PasswordHashingBusy:
+            raise
+        except Exception as e:
+            return False, f"Login failed: {str(e)}", None
+
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict]:
+        """Get user by ID"""
+        try:
+            async with get_async_connection() as conn:
+                user = await conn.fetchone('users.get_by_id', (user_id,))
+
+                if user:
+                    return {
+                        'id': user[0],
+                        'email': user[1],
+                        'name': user[2],
+                        'created_at': user[3],
+                        'updated_at': user[4]
+                    }
+                return None
+
+        except Exception as e:
+            return None
+
+    async def get_guest_todo_count(self) -> int:
+        """Get count of todos without user_id (guest todos)"""
+        try:
+            async with get_async_connection() as conn:
+                row = await conn.fetchone('todo_counters.get', ('guest',))
+
+                return int(row[0]) if row else 0
+
+        except Exception as e:
+            return 0
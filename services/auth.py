@@ -0,0 +1,205 @@
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import get_db_connection
+from queries import execute
+
+AUTH_TOKEN_TTL = int(os.getenv('AUTH_TOKEN_TTL', 24 * 60 * 60))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+# Seconds between reloads of the revocation list from the database; tokens
+# revoked by another worker are accepted here for at most this long
+AUTH_REVOCATION_REFRESH = float(os.getenv('AUTH_REVOCATION_REFRESH', 30))
+# Accept the unauthenticated X-User-ID header from clients that predate
+# tokens. Anyone can claim any user this way, so only turn it on while such
+# clients are being migrated.
+AUTH_ALLOW_USER_ID_HEADER = os.getenv('AUTH_ALLOW_USER_ID_HEADER', 'false').lower() in ('1', 'true', 'yes')
+
+
+def _configured_secrets() -> List[str]:
+    return [key.strip() for key in os.getenv('AUTH_TOKEN_SECRET', '').split(',') if key.strip()]
+
+
+def _load_secrets() -> Tuple[bytes, ...]:
+    """Signing keys from AUTH_TOKEN_SECRET, newest first
+
+    Several comma-separated keys may be given while rotating: tokens are
+    signed with the first and verified against all of them.
+    """
+    configured = _configured_secrets()
+    if configured:
+        return tuple(key.encode() for key in configured)
+    print("⚠️ AUTH_TOKEN_SECRET is not set; using a random key, tokens will not survive a restart")
+    return (secrets.token_bytes(32),)
+
+
+def require_shared_secret(workers: int):
+    """Refuse to serve from several processes when each would sign with its own random key
+
+    A token issued by one worker would be rejected by every other one, so a
+    logged-in user would get 401s depending on which worker answered.
+    """
+    if workers > 1 and not _configured_secrets():
+        raise SystemExit(f"❌ AUTH_TOKEN_SECRET must be set to run {workers} workers; "
+                         "without it every worker signs tokens with its own random key")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class TokenService:
+    """Issues and verifies HMAC-signed session tokens
+
+    A token is ``<payload>.<signature>`` where the payload carries the user
+    id, expiry and a random token id. Verification needs no database access:
+    verified tokens are kept in a bounded LRU cache, and revoked token ids are
+    mirrored in memory from the revoked_tokens table by a background refresh.
+    """
+
+    def __init__(self, keys: Optional[Tuple[bytes, ...]] = None, ttl: int = AUTH_TOKEN_TTL,
+                 cache_size: int = AUTH_TOKEN_CACHE_SIZE, refresh_interval: float = AUTH_REVOCATION_REFRESH):
+        self._keys = keys or _load_secrets()
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.refresh_interval = refresh_interval
+        self._verified = OrderedDict()  # token -> (user_id, expires_at, jti)
+        self._revoked: Dict[str, int] = {}  # jti -> expires_at
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._refresher_pid = None
+        self.hits = 0
+        self.misses = 0
+        self.rejections = 0
+
+    def issue(self, user_id: str) -> Dict[str, Any]:
+        """Sign a new token for user_id"""
+        expires_at = int(time.time()) + self.ttl
+        payload = json.dumps({'sub': user_id, 'exp': expires_at, 'jti': secrets.token_hex(16)},
+                             separators=(',', ':')).encode()
+        body = _b64encode(payload)
+        token = f"{body}.{self._sign(self._keys[0], body)}"
+        return {
+            'token': token,
+            'expires_at': datetime.datetime.fromtimestamp(expires_at).isoformat()
+        }
+
+    def verify(self, token: str) -> Optional[str]:
+        """Return the user id of a valid, unexpired, unrevoked token, else None"""
+        self.ensure_revocations()
+        now = time.time()
+        with self._lock:
+            entry = self._verified.get(token)
+            if entry is not None:
+                self._verified.move_to_end(token)
+                self.hits += 1
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            entry = self._decode(token)
+            if entry is not None:
+                with self._lock:
+                    self._verified[token] = entry
+                    while len(self._verified) > self.cache_size:
+                        self._verified.popitem(last=False)
+
+        if entry is None or entry[1] <= now or entry[2] in self._revoked:
+            with self._lock:
+                self.rejections += 1
+                if entry is not None:
+                    self._verified.pop(token, None)
+            return None
+        return entry[0]
+
+    def revoke(self, token: str) -> bool:
+        """Revoke a token everywhere; False if it was not a valid token"""
+        entry = self._decode(token)
+        if entry is None:
+            return False
+        user_id, expires_at, jti = entry
+        with get_db_connection() as conn:
+            execute(conn, 'revoked_tokens.insert', (jti, user_id, expires_at, datetime.datetime.now().isoformat()))
+            execute(conn, 'revoked_tokens.prune', (int(time.time()),))
+            conn.commit()
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._verified.pop(token, None)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._verified),
+                'maxEntries': self.cache_size,
+                'revoked': len(self._revoked),
+                'hits': self.hits,
+                'misses': self.misses,
+                'rejections': self.rejections
+            }
+
+    @staticmethod
+    def _sign(key: bytes, body: str) -> str:
+        return _b64encode(hmac.new(key, body.encode('ascii'), hashlib.sha256).digest())
+
+    def _decode(self, token: str) -> Optional[Tuple[str, int, str]]:
+        """Check the signature and return (user_id, expires_at, jti)"""
+        body, _, signature = token.partition('.')
+        if not body or not signature:
+            return None
+        try:
+            if not any(hmac.compare_digest(self._sign(key, body), signature) for key in self._keys):
+                return None
+            payload = json.loads(_b64decode(body))
+            return str(payload['sub']), int(payload['exp']), str(payload['jti'])
+        except (ValueError, KeyError, TypeError, UnicodeError):
+            return None
+
+    def ensure_revocations(self):
+        """Load the revocation list once per process and keep it fresh in the background
+
+        verify() calls this on first use; an event loop should call it from a
+        thread at startup, since the first load queries the database.
+        """
+        if self._refresher_pid == os.getpid():
+            return
+        with self._start_lock:
+            # A forked worker does not inherit the thread, so it starts its own
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresh_revocations()
+            threading.Thread(target=self._refresh_loop, name='token-revocations', daemon=True).start()
+            self._refresher_pid = os.getpid()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            self._refresh_revocations()
+
+    def _refresh_revocations(self):
+        try:
+            with get_db_connection() as conn:
+                rows = execute(conn, 'revoked_tokens.list_active', (int(time.time()),)).fetchall()
+        except Exception as e:
+            print(f"⚠️ Could not refresh revoked tokens: {e}")
+            return
+        revoked = {row[0]: int(row[1]) for row in rows}
+        with self._lock:
+            # Keep tokens revoked in this process while the reload was running
+            now = time.time()
+            revoked.update((jti, expires_at) for jti, expires_at in self._revoked.items() if expires_at > now)
+            self._revoked = revoked
+
+
+token_service = TokenService()
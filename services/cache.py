@@ -0,0 +1,175 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+TODO_CACHE_MAX_BYTES = int(os.getenv('TODO_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+TODO_CACHE_TTL = float(os.getenv('TODO_CACHE_TTL', 30))
+
+
+def _estimate_size(value: Any) -> int:
+    """Rough in-memory footprint of a cached todo, list of todos, or scalar"""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class TodoCache:
+    """Per-user read-through LRU cache with a memory budget and TTL
+
+    Entries are grouped by owner so a write can drop exactly the lists of
+    that user plus the individual todos it touched. The cache lives in the
+    process and only the writing worker invalidates, so every entry is also
+    stored with the owner's todo_versions counter read by the request: once
+    another worker has bumped it, the next lookup misses instead of serving
+    the old copy.
+    """
+
+    def __init__(self, max_bytes: int = TODO_CACHE_MAX_BYTES, ttl: float = TODO_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (owner, key) -> (expires_at, size, value, version)
+        self._owners: Dict[str, set] = {}
+        # Bumped on every invalidation so a load that raced a write is not stored
+        self._generations: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.outdated = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl > 0
+
+    @staticmethod
+    def _owner(user_id: Optional[str]) -> str:
+        return user_id or ''
+
+    def get_or_load(self, user_id: Optional[str], key: Hashable, loader: Callable[[], Any],
+                    version: Hashable = None) -> Any:
+        """Return the cached value for (user, key), loading and storing it on a miss
+
+        version is the owner's change version, read before the loader runs;
+        an entry stored under another version is reloaded. Cached values are
+        shared between callers and must not be mutated.
+        """
+        if not self.enabled:
+            return loader()
+
+        entry_key = (self._owner(user_id), key)
+        hit, value, generation = self._lookup(entry_key, version)
+        if hit:
+            return value
+
+        value = loader()
+        self._store(entry_key, value, generation, version)
+        return value
+
+    async def get_or_load_async(self, user_id: Optional[str], key: Hashable,
+                                loader: Callable[[], Awaitable[Any]], version: Hashable = None) -> Any:
+        """Async counterpart of get_or_load for coroutine loaders"""
+        if not self.enabled:
+            return await loader()
+
+        entry_key = (self._owner(user_id), key)
+        hit, value, generation = self._lookup(entry_key, version)
+        if hit:
+            return value
+
+        value = await loader()
+        self._store(entry_key, value, generation, version)
+        return value
+
+    def invalidate(self, user_id: Optional[str], todo_ids: Optional[Iterable[str]] = None):
+        """Drop a user's cached lists and the given todos, or everything if todo_ids is None"""
+        owner = self._owner(user_id)
+        item_keys = None if todo_ids is None else {('item', todo_id) for todo_id in todo_ids}
+        with self._lock:
+            self._generations[owner] = self._generations.get(owner, 0) + 1
+            for entry_key in list(self._owners.get(owner, ())):
+                key = entry_key[1]
+                if item_keys is None or key[0] != 'item' or key in item_keys:
+                    self._remove(entry_key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+            self._generations.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxBytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'outdated': self.outdated,
+                'invalidations': self.invalidations
+            }
+
+    def _lookup(self, entry_key: tuple, version: Hashable) -> Tuple[bool, Any, int]:
+        """Return (hit, value, generation), dropping the entry if it has expired or is outdated"""
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generations.get(entry_key[0], 0)
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                if entry[0] > now and entry[3] == version:
+                    self._entries.move_to_end(entry_key)
+                    self.hits += 1
+                    return True, entry[2], generation
+                self._remove(entry_key)
+                if entry[0] > now:
+                    self.outdated += 1
+                else:
+                    self.expirations += 1
+            self.misses += 1
+            return False, None, generation
+
+    def _store(self, entry_key: tuple, value: Any, generation: int, version: Hashable):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._generations.get(entry_key[0], 0) != generation:
+                return
+            if entry_key in self._entries:
+                self._remove(entry_key)
+            self._entries[entry_key] = (time.monotonic() + self.ttl, size, value, version)
+            self._owners.setdefault(entry_key[0], set()).add(entry_key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, entry_key: tuple):
+        size = self._entries.pop(entry_key)[1]
+        self._bytes -= size
+        keys = self._owners.get(entry_key[0])
+        if keys is not None:
+            keys.discard(entry_key)
+            if not keys:
+                del self._owners[entry_key[0]]
+
+
+todo_cache = TodoCache()
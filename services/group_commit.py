@@ -0,0 +1,115 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+from metrics import record_group_commit
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Background writer that commits concurrently submitted rows together
+
+    Callers hand a row to submit() and wait on the returned future. A single
+    thread per process takes the first queued row, gathers whatever else
+    arrives within max_wait (up to max_batch rows) and passes the batch to
+    write(), which must store it in one transaction. One commit, and one
+    fsync, then covers the whole batch. If the batch fails each row is
+    retried on its own, so a bad row only fails its own caller.
+    """
+
+    def __init__(self, write: Callable[[List[Any]], None], name: str, max_batch: int, max_wait: float):
+        self._write = write
+        self.name = name
+        self.max_batch = max(max_batch, 1)
+        self.max_wait = max_wait
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, row: Any) -> Future:
+        """Queue a row for the next group commit; the future resolves to the row once committed"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def stop(self, timeout: float = 5):
+        """Commit what is already queued and stop the writer thread"""
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        """Start the writer on first use in each process
+
+        Threads do not survive fork, so a gunicorn worker starts its own
+        instead of relying on one created in the master.
+        """
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None:
+                if self._pid != os.getpid():
+                    # Rows queued before fork belong to the parent
+                    self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name=f'group-commit-{self.name}', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stopping = False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stopping:
+                return
+
+    def _commit(self, batch: List[tuple]):
+        pending = [(row, future) for row, future in batch if future.set_running_or_notify_cancel()]
+        if not pending:
+            return
+        started = time.perf_counter()
+        try:
+            self._write([row for row, _ in pending])
+        except Exception as error:
+            if len(pending) == 1:
+                pending[0][1].set_exception(error)
+            else:
+                # Retry each row on its own so a bad row only fails its own caller
+                for row, future in pending:
+                    self._commit_one(row, future)
+        else:
+            for row, future in pending:
+                future.set_result(row)
+        finally:
+            record_group_commit(self.name, len(pending), time.perf_counter() - started)
+
+    def _commit_one(self, row: Any, future: Future):
+        try:
+            self._write([row])
+        except Exception as error:
+            future.set_exception(error)
+        else:
+            future.set_result(row)
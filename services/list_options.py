@@ -0,0 +1,84 @@
+import datetime
+from typing import Any, List, Mapping, NamedTuple, Optional, Tuple
+
+# Query arguments accepted as list filters, in the order their values are bound
+LIST_FILTERS = ('completed', 'color', 'created_after', 'created_before', 'updated_after', 'updated_before')
+LIST_SORTS = ('created', 'updated')
+LIST_ORDERS = ('desc', 'asc')
+MAX_COLOR_LENGTH = 50
+
+_TRUE = ('1', 'true', 'yes')
+_FALSE = ('0', 'false', 'no')
+
+
+class ListOptions(NamedTuple):
+    """Filters and order of a todo list request; hashable, so it can key the todo cache"""
+
+    completed: Optional[bool] = None
+    color: Optional[str] = None
+    created_after: Optional[str] = None
+    created_before: Optional[str] = None
+    updated_after: Optional[str] = None
+    updated_before: Optional[str] = None
+    sort: str = 'created'
+    descending: bool = True
+
+    def filters(self) -> List[Tuple[str, Any]]:
+        """The (name, value) of every filter that is set, in LIST_FILTERS order"""
+        return [(name, getattr(self, name)) for name in LIST_FILTERS if getattr(self, name) is not None]
+
+
+DEFAULT_LIST_OPTIONS = ListOptions()
+
+
+def has_list_options(args: Mapping[str, str]) -> bool:
+    """Whether the request asks for anything but the default list"""
+    return any(name in args for name in LIST_FILTERS + ('sort', 'order'))
+
+
+def _parse_timestamp(name: str, value: str) -> str:
+    try:
+        stamp = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 timestamp")
+    if stamp.tzinfo is not None:
+        # Todo timestamps are stored as naive server-local time
+        stamp = stamp.astimezone().replace(tzinfo=None)
+    return stamp.isoformat()
+
+
+def parse_list_options(args: Mapping[str, str], **overrides: Any) -> ListOptions:
+    """Parse the filter and sort query arguments, raising ValueError on anything outside the whitelist"""
+    values = {}
+
+    completed = args.get('completed')
+    if completed:
+        if completed.lower() in _TRUE:
+            values['completed'] = True
+        elif completed.lower() in _FALSE:
+            values['completed'] = False
+        else:
+            raise ValueError("completed must be true or false")
+
+    color = args.get('color')
+    if color:
+        if len(color) > MAX_COLOR_LENGTH:
+            raise ValueError(f"color must be at most {MAX_COLOR_LENGTH} characters")
+        values['color'] = color
+
+    for name in ('created_after', 'created_before', 'updated_after', 'updated_before'):
+        if args.get(name):
+            values[name] = _parse_timestamp(name, args[name])
+
+    sort = args.get('sort') or 'created'
+    if sort not in LIST_SORTS:
+        raise ValueError(f"sort must be one of {', '.join(LIST_SORTS)}")
+    values['sort'] = sort
+
+    order = args.get('order') or 'desc'
+    if order not in LIST_ORDERS:
+        raise ValueError(f"order must be one of {', '.join(LIST_ORDERS)}")
+    values['descending'] = order == 'desc'
+
+    values.update(overrides)
+    return ListOptions(**values)
@@ -0,0 +1,64 @@
+import base64
+import json
+from typing import Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at, todo_id: str) -> str:
+    """Encode the (created_at, id) keyset position of a row as an opaque token"""
+    if hasattr(created_at, 'isoformat'):
+        created_at = created_at.isoformat()
+    payload = json.dumps([created_at, todo_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        # Unpacking alone would also accept a two-key object or a two-character string
+        if type(payload) is not list:
+            raise ValueError
+        created_at, todo_id = payload
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(todo_id, str):
+        raise ValueError("Invalid cursor")
+    return created_at, todo_id
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """Encode a result offset as an opaque token, for orders with no stable keyset such as search rank"""
+    payload = json.dumps(['offset', offset], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    """Decode a cursor produced by encode_offset_cursor, raising ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if type(payload) is not list:
+            raise ValueError
+        kind, offset = payload
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if kind != 'offset' or type(offset) is not int or offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
+
+
+def parse_limit(value: Optional[str]) -> int:
+    """Parse the limit query parameter, raising ValueError if out of range"""
+    if value is None or value == '':
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
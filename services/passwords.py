@@ -0,0 +1,193 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from metrics import record_password_hash, record_password_hash_rejected
+
+# 'scrypt' or 'pbkdf2_sha256'; existing hashes keep verifying when this changes
+# and are rehashed with the new settings on the next login
+PASSWORD_KDF = os.getenv('PASSWORD_KDF', 'scrypt')
+PASSWORD_SCRYPT_N = int(os.getenv('PASSWORD_SCRYPT_N', 2 ** 14))
+PASSWORD_SCRYPT_R = int(os.getenv('PASSWORD_SCRYPT_R', 8))
+PASSWORD_SCRYPT_P = int(os.getenv('PASSWORD_SCRYPT_P', 1))
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', 600000))
+# Processes deriving keys per worker; 0 derives inline on the request thread.
+# Every gunicorn or uvicorn worker starts its own, so a host runs
+# WEB_CONCURRENCY times this many: with the default 2 x CPU + 1 workers, set it
+# to 1 (or CPUs / WEB_CONCURRENCY) to keep them from outnumbering the cores.
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+# Hashes queued or running per worker before new ones are turned away
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', 32))
+
+_SALT_BYTES = 16
+_KEY_BYTES = 32
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full; the request should be retried later"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _derive(kdf: str, params: Tuple[int, ...], password: str, salt: bytes) -> bytes:
+    """Run the KDF; executed in the hashing processes, so it must stay picklable"""
+    if kdf == 'scrypt':
+        n, r, p = params
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=128 * n * r * p + 1024 * 1024, dklen=_KEY_BYTES)
+    if kdf == 'pbkdf2_sha256':
+        iterations, = params
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, dklen=_KEY_BYTES)
+    raise ValueError(f"Unknown password KDF: {kdf}")
+
+
+def _current_params(kdf: str) -> Tuple[int, ...]:
+    if kdf == 'scrypt':
+        return PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P
+    if kdf == 'pbkdf2_sha256':
+        return PASSWORD_PBKDF2_ITERATIONS,
+    raise ValueError(f"Unknown password KDF: {kdf}")
+
+
+def _is_legacy(stored: str) -> bool:
+    """Unsalted SHA-256 hex digest written before passwords used a KDF"""
+    return len(stored) == 64 and '$' not in stored
+
+
+class PasswordHasher:
+    """Salted KDF hashing run in a process pool with a bounded queue
+
+    Hashes are stored as ``kdf$param,...$salt$key``. Key derivation is
+    deliberately slow, so it runs in separate processes: request threads
+    (and the event loop on the ASGI path) only wait on a future and do not
+    hold the GIL meanwhile. When PASSWORD_HASH_QUEUE_SIZE hashes are already
+    pending, new ones fail fast with PasswordHashingBusy instead of piling up.
+    """
+
+    def __init__(self, kdf: str = PASSWORD_KDF, workers: int = PASSWORD_HASH_WORKERS,
+                 queue_size: int = PASSWORD_HASH_QUEUE_SIZE):
+        self.kdf = kdf
+        self.params = _current_params(kdf)
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max(queue_size, 1))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        # Verified in place of a missing user's hash, so an unknown email costs
+        # the same key derivation as a wrong password; no password derives
+        # its all-zero key
+        self.dummy_hash = self._encode(kdf, self.params, bytes(_SALT_BYTES), bytes(_KEY_BYTES))
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the configured KDF and a fresh salt"""
+        salt = secrets.token_bytes(_SALT_BYTES)
+        key = self._submit(self.kdf, self.params, password, salt).result()
+        return self._encode(self.kdf, self.params, salt, key)
+
+    def verify(self, password: str, stored: str) -> Tuple[bool, bool]:
+        """Return (matches, needs_rehash) for a stored hash"""
+        if _is_legacy(stored):
+            return self._check_legacy(password, stored), True
+        kdf, params, salt, expected = self._decode(stored)
+        key = self._submit(kdf, params, password, salt).result()
+        return hmac.compare_digest(key, expected), (kdf, params) != (self.kdf, self.params)
+
+    async def hash_async(self, password: str) -> str:
+        """hash() for the event loop"""
+        salt = secrets.token_bytes(_SALT_BYTES)
+        key = await asyncio.wrap_future(self._submit(self.kdf, self.params, password, salt))
+        return self._encode(self.kdf, self.params, salt, key)
+
+    async def verify_async(self, password: str, stored: str) -> Tuple[bool, bool]:
+        """verify() for the event loop"""
+        if _is_legacy(stored):
+            return self._check_legacy(password, stored), True
+        kdf, params, salt, expected = self._decode(stored)
+        key = await asyncio.wrap_future(self._submit(kdf, params, password, salt))
+        return hmac.compare_digest(key, expected), (kdf, params) != (self.kdf, self.params)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._executor_pid == os.getpid():
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _check_legacy(password: str, stored: str) -> bool:
+        started = time.perf_counter()
+        matches = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+        record_password_hash('sha256', time.perf_counter() - started)
+        return matches
+
+    @staticmethod
+    def _encode(kdf: str, params: Tuple[int, ...], salt: bytes, key: bytes) -> str:
+        return '$'.join([kdf, ','.join(str(value) for value in params), _b64encode(salt), _b64encode(key)])
+
+    @staticmethod
+    def _decode(stored: str) -> Tuple[str, Tuple[int, ...], bytes, bytes]:
+        kdf, params, salt, key = stored.split('$')
+        return kdf, tuple(int(value) for value in params.split(',')), _b64decode(salt), _b64decode(key)
+
+    def _submit(self, kdf: str, params: Tuple[int, ...], password: str, salt: bytes) -> Future:
+        """Queue one derivation; the future resolves to the derived key"""
+        if not self._slots.acquire(blocking=False):
+            record_password_hash_rejected()
+            raise PasswordHashingBusy("Too many password hashes in progress")
+        started = time.perf_counter()
+
+        def finished(_):
+            self._slots.release()
+            record_password_hash(kdf, time.perf_counter() - started)
+
+        if self.workers > 0:
+            try:
+                future = self._get_executor().submit(_derive, kdf, params, password, salt)
+            except BaseException:
+                self._slots.release()
+                raise
+        else:
+            future = Future()
+            try:
+                future.set_result(_derive(kdf, params, password, salt))
+            except Exception as e:
+                future.set_exception(e)
+        future.add_done_callback(finished)
+        return future
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start the pool on first use in each process
+
+        Gunicorn forks workers from a master that has loaded the app, so the
+        pool is created lazily and never inherited. The hashing processes are
+        spawned rather than forked so they do not copy a threaded worker.
+        """
+        if self._usable(self._executor):
+            return self._executor
+        with self._lock:
+            if not self._usable(self._executor):
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _usable(self, executor: Optional[ProcessPoolExecutor]) -> bool:
+        # A pool whose process died stays broken; replace it rather than failing every hash
+        return (executor is not None and self._executor_pid == os.getpid()
+                and not getattr(executor, '_broken', False))
+
+
+password_hasher = PasswordHasher()
@@ -1,22 +1,38 @@
+import os
+import re
 import sqlite3
 import uuid
 import datetime
-from typing import List, Dict, Optional
-from database import get_db_connection, DATABASE_URL
+from typing import Iterator, List, Dict, Optional, Tuple
+from flask import g, has_request_context
+from database import get_db_connection, get_read_connection, release_request_connection, replicas
+from queries import execute, execute_many, id_list, list_statement, search_match, stream
+from serialization import Todo, todo_rows
 from services.user_service import UserService
+from services.pagination import (DEFAULT_PAGE_SIZE, decode_cursor, decode_offset_cursor, encode_cursor,
+                                 encode_offset_cursor)
+from services.cache import todo_cache
+from services.list_options import DEFAULT_LIST_OPTIONS, ListOptions
+from services.group_commit import GroupCommitWriter
+
+STREAM_CHUNK_SIZE = int(os.getenv('TODO_STREAM_CHUNK_SIZE', 500))
+
+# Coalesce concurrent create_todo inserts into shared transactions. Off by
+# default: the end-to-end benchmark (benchmarks/group_commit.py) has not yet
+# shown a gain over one transaction per request.
+TODO_GROUP_COMMIT = os.getenv('TODO_GROUP_COMMIT', 'false').lower() in ('1', 'true', 'yes')
+TODO_GROUP_COMMIT_MAX_BATCH = int(os.getenv('TODO_GROUP_COMMIT_MAX_BATCH', 128))
+# How long the writer waits for more inserts after the first one of a batch
+TODO_GROUP_COMMIT_MAX_WAIT_MS = float(os.getenv('TODO_GROUP_COMMIT_MAX_WAIT_MS', 2))
+
+# Words of a search query past this many are ignored
+TODO_SEARCH_MAX_TERMS = int(os.getenv('TODO_SEARCH_MAX_TERMS', 8))
 
 class TodoService:
     def __init__(self):
         self.db_path = 'todo_app.db'
         self.user_service = UserService()
         
-    def _get_param_placeholder(self, index: int) -> str:
-        """Get the correct parameter placeholder based on database type"""
-        if DATABASE_URL.startswith('postgresql://'):
-            return f'%s'  # PostgreSQL uses %s
-        else:
-            return '?'    # SQLite uses ?
-
     def _generate_id(self) -> str:
         """Generate unique todo ID"""
         return str(uuid.uuid4())
@@ -25,59 +41,121 @@ class TodoService:
         """Get current timestamp in ISO format"""
         return datetime.datetime.now().isoformat()
 
-    def get_all_todos(self, user_id: Optional[str] = None) -> List[Dict]:
-        """Get all todos for a user or guest todos if no user_id"""
+    def get_all_todos(self, user_id: Optional[str] = None,
+                      options: ListOptions = DEFAULT_LIST_OPTIONS) -> List[Todo]:
+        """Get all todos for a user or guest todos if no user_id, filtered and ordered by options"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            if user_id:
-                cursor.execute("""
-                    SELECT id, user_id, text, color, completed, created_at, updated_at
-                    FROM todos WHERE user_id = %s
-                    ORDER BY created_at DESC
-                """, (user_id,))
-            else:
-                cursor.execute("""
-                    SELECT id, user_id, text, color, completed, created_at, updated_at
-                    FROM todos WHERE user_id IS NULL
-                    ORDER BY created_at DESC
-                """)
-
-            todos = cursor.fetchall()
-            conn.close()
-
-            return [self._to_dict(todo) for todo in todos]
-
+            return todo_cache.get_or_load(user_id, ('list', options),
+                                          lambda: self._list_todos(user_id, options),
+                                          self.get_version(user_id)[0])
         except Exception as e:
             return []
 
-    def get_todo_by_id(self, todo_id: str, user_id: Optional[str] = None) -> Optional[Dict]:
+    def _list_todos(self, user_id: Optional[str], options: ListOptions) -> List[Todo]:
+        """Query the full list of a user's (or guest) todos"""
+        name = self._list_statement(user_id, options)
+        with get_read_connection(user_id) as conn:
+            cursor = execute(conn, name, self._list_params(user_id, options))
+
+            return todo_rows(cursor.fetchall())
+
+    def iter_todos(self, user_id: Optional[str] = None, options: ListOptions = DEFAULT_LIST_OPTIONS,
+                   chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Todo]:
+        """Yield todos in the order of options, reading from the database in fixed-size chunks"""
+        name = self._list_statement(user_id, options)
+        params = self._list_params(user_id, options)
+
+        with get_read_connection(user_id) as conn:
+            yield from map(Todo, stream(conn, name, params, chunk_size))
+
+    def get_todos_page(self, user_id: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                       cursor: Optional[str] = None,
+                       options: ListOptions = DEFAULT_LIST_OPTIONS) -> Tuple[List[Todo], Optional[str]]:
+        """Get one keyset page of todos in the order of options, and the cursor for the next page"""
+        after = decode_cursor(cursor) if cursor else ()
+        return todo_cache.get_or_load(user_id, ('page', options, limit, cursor),
+                                      lambda: self._query_page(user_id, limit, after, options),
+                                      self.get_version(user_id)[0])
+
+    def _query_page(self, user_id: Optional[str], limit: int, after: tuple,
+                    options: ListOptions) -> Tuple[List[Todo], Optional[str]]:
+        """Run the keyset query for one page"""
+        name = self._list_statement(user_id, options, after=bool(after), paged=True)
+        params = self._list_params(user_id, options)
+        params.extend(after)
+        # Fetch one extra row to learn whether another page follows
+        params.append(limit + 1)
+
+        with get_read_connection(user_id) as conn:
+            rows = execute(conn, name, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last[6] if options.sort == 'updated' else last[5], last[0])
+
+        return todo_rows(rows), next_cursor
+
+    def _list_statement(self, user_id: Optional[str], options: ListOptions,
+                        after: bool = False, paged: bool = False) -> str:
+        """Pick the registered list statement for the shape of options"""
+        filters = [name for name, _ in options.filters()]
+        return list_statement(bool(user_id), filters, options.sort, options.descending, after, paged)
+
+    def _list_params(self, user_id: Optional[str], options: ListOptions) -> List:
+        """The owner and filter parameters of a list statement"""
+        params = [user_id] if user_id else []
+        params.extend(value for _, value in options.filters())
+        return params
+
+    def search_todos(self, query: str, user_id: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                     cursor: Optional[str] = None) -> Tuple[List[Todo], Optional[str]]:
+        """Full-text search of a user's (or guest) todos, best match first, and the cursor for the next page"""
+        # Letters and digits only: both indexes split words on everything else,
+        # and nothing the client sends reaches the FTS5 or tsquery syntax
+        terms = re.findall(r'[^\W_]+', query.lower())[:TODO_SEARCH_MAX_TERMS]
+        if not terms:
+            raise ValueError("q must contain a word to search for")
+        offset = decode_offset_cursor(cursor) if cursor else 0
+        return todo_cache.get_or_load(user_id, ('search', tuple(terms), limit, offset),
+                                      lambda: self._query_search(terms, user_id, limit, offset),
+                                      self.get_version(user_id)[0])
+
+    def _query_search(self, terms: List[str], user_id: Optional[str], limit: int,
+                      offset: int) -> Tuple[List[Todo], Optional[str]]:
+        """Run the indexed search for one page"""
+        params = self._owner_params([search_match(terms, user_id)], user_id)
+        # Fetch one extra row to learn whether another page follows
+        params.extend([limit + 1, offset])
+
+        with get_read_connection(user_id) as conn:
+            rows = execute(conn, self._owned('todos.search', user_id), params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_offset_cursor(offset + limit)
+
+        return todo_rows(rows), next_cursor
+
+    def get_todo_by_id(self, todo_id: str, user_id: Optional[str] = None) -> Optional[Todo]:
         """Get todo by ID, ensuring user can only access their own todos"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            if user_id:
-                cursor.execute("""
-                    SELECT id, user_id, text, color, completed, created_at, updated_at
-                    FROM todos WHERE id = %s AND user_id = %s
-                """, (todo_id, user_id))
-            else:
-                cursor.execute("""
-                    SELECT id, user_id, text, color, completed, created_at, updated_at
-                    FROM todos WHERE id = %s AND user_id IS NULL
-                """, (todo_id,))
-
-            todo = cursor.fetchone()
-            conn.close()
-
-            return self._to_dict(todo) if todo else None
-
+            return todo_cache.get_or_load(user_id, ('item', todo_id),
+                                          lambda: self._load_todo(todo_id, user_id),
+                                          self.get_version(user_id)[0])
         except Exception as e:
             return None
 
-    def create_todo(self, text: str, user_id: Optional[str] = None, color: Optional[str] = None) -> Optional[Dict]:
+    def _load_todo(self, todo_id: str, user_id: Optional[str]) -> Optional[Todo]:
+        """Query a single todo scoped to its owner"""
+        with get_read_connection(user_id) as conn:
+            todo = self._fetch_todo(conn, todo_id, user_id)
+
+            return Todo(todo) if todo else None
+
+    def create_todo(self, text: str, user_id: Optional[str] = None, color: Optional[str] = None) -> Optional[Todo]:
         """Create a new todo"""
         try:
             if not text or not text.strip():
@@ -89,232 +167,279 @@ class TodoService:
                 if guest_count >= 3:
                     raise ValueError("Guest users can only create 3 todos. Please register to create unlimited todos.")
 
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            todo = self._new_todo(text, user_id, color)
+            if todo_writer is not None:
+                # The writer commits on a pooled connection of its own. Waiting
+                # while holding the request's could leave it none to take once
+                # every slot belongs to a waiting request.
+                release_request_connection()
+                self._forget_version(user_id)
+                return todo_writer.submit(todo).result()
 
-            todo_id = self._generate_id()
-            created_at = self._get_current_timestamp()
+            with get_db_connection() as conn:
+                execute(conn, 'todos.insert', todo)
+                self._bump_version(conn, user_id)
 
-            cursor.execute("""
-                INSERT INTO todos (id, user_id, text, color, completed, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (todo_id, user_id, text.strip(), color, False, created_at, created_at))
+                conn.commit()
+                todo_cache.invalidate(user_id, ())
 
-            conn.commit()
-            conn.close()
-
-            return {
-                'id': todo_id,
-                'user_id': user_id,
-                'text': text.strip(),
-                'color': color,
-                'completed': False,
-                'createdAt': created_at,
-                'updatedAt': created_at
-            }
+                return todo
 
         except Exception as e:
             raise e
 
-    def update_todo(self, todo_id: str, text: Optional[str] = None, completed: Optional[bool] = None, 
-                   color: Optional[str] = None, user_id: Optional[str] = None) -> Optional[Dict]:
-        """Update a todo"""
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            # Check if todo exists and user has permission
-            if user_id:
-                cursor.execute("SELECT id FROM todos WHERE id = %s AND user_id = %s", (todo_id, user_id))
-            else:
-                cursor.execute("SELECT id FROM todos WHERE id = %s AND user_id IS NULL", (todo_id,))
-
-            if not cursor.fetchone():
-                conn.close()
-                return None
-
-            # Build update query
-            updates = []
-            params = []
-            
-            if text is not None:
-                updates.append("text = %s")
-                params.append(text.strip())
-            if completed is not None:
-                updates.append("completed = %s")
-                params.append(completed)
-            if color is not None:
-                updates.append("color = %s")
-                params.append(color)
-            
-            updates.append("updated_at = %s")
-            params.append(self._get_current_timestamp())
-            params.append(todo_id)
-
-            cursor.execute(f"""
-                UPDATE todos SET {', '.join(updates)}
-                WHERE id = %s
-            """, params)
+    def create_todos(self, items: List[Dict], user_id: Optional[str] = None) -> List[Todo]:
+        """Create many todos in one transaction, enforcing the guest limit once"""
+        if not items:
+            raise ValueError("At least one todo is required")
+        for item in items:
+            text = item.get('text')
+            if not isinstance(text, str) or not text.strip():
+                raise ValueError("Text is required")
 
+        # Check guest todo limit for the whole batch
+        if not user_id:
+            guest_count = self.user_service.get_guest_todo_count()
+            if guest_count + len(items) > 3:
+                raise ValueError("Guest users can only create 3 todos. Please register to create unlimited todos.")
+
+        created = [self._new_todo(item['text'], user_id, item.get('color')) for item in items]
+        self._insert_todos(created)
+        return created
+
+    def _new_todo(self, text: str, user_id: Optional[str], color: Optional[str]) -> Todo:
+        """Build a todo about to be inserted; it doubles as the todos.insert parameters"""
+        created_at = self._get_current_timestamp()
+        return Todo((self._generate_id(), user_id, text.strip(), color, False, created_at, created_at))
+
+    def _insert_todos(self, todos: List[Todo]):
+        """Insert new todos of any owners in one transaction and bump each owner's version once"""
+        owners = list(dict.fromkeys(todo.user_id for todo in todos))
+        with get_db_connection() as conn:
+            execute_many(conn, 'todos.insert', todos)
+            for owner in owners:
+                self._bump_version(conn, owner)
             conn.commit()
-            conn.close()
+        for owner in owners:
+            todo_cache.invalidate(owner, ())
 
-            return self.get_todo_by_id(todo_id, user_id)
+    def update_todo(self, todo_id: str, text: Optional[str] = None, completed: Optional[bool] = None, 
+                   color: Optional[str] = None, user_id: Optional[str] = None) -> Optional[Todo]:
+        """Update a todo"""
+        try:
+            with get_db_connection() as conn:
+                # NULL parameters leave the column unchanged; the owner check,
+                # update and re-read happen in one statement
+                todo = execute(conn, self._owned('todos.update', user_id), self._owner_params([
+                    text.strip() if text is not None else None,
+                    completed,
+                    color,
+                    self._get_current_timestamp(),
+                    todo_id
+                ], user_id)).fetchone()
+                if todo:
+                    self._bump_version(conn, user_id)
+                conn.commit()
+                todo_cache.invalidate(user_id, (todo_id,))
+
+                return Todo(todo) if todo else None
 
         except Exception as e:
             return None
 
-    def toggle_todo(self, todo_id: str, user_id: Optional[str] = None) -> Optional[Dict]:
+    def toggle_todo(self, todo_id: str, user_id: Optional[str] = None) -> Optional[Todo]:
         """Toggle todo completion status"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            # Get current todo
-            if user_id:
-                cursor.execute("""
-                    SELECT completed FROM todos WHERE id = %s AND user_id = %s
-                """, (todo_id, user_id))
-            else:
-                cursor.execute("""
-                    SELECT completed FROM todos WHERE id = %s AND user_id IS NULL
-                """, (todo_id,))
-
-            todo = cursor.fetchone()
-            if not todo:
-                conn.close()
-                return None
-
-            # Toggle completion
-            new_completed = not todo[0]
-            updated_at = self._get_current_timestamp()
-
-            cursor.execute("""
-                UPDATE todos SET completed = %s, updated_at = %s
-                WHERE id = %s
-            """, (new_completed, updated_at, todo_id))
-
-            conn.commit()
-            conn.close()
-
-            return self.get_todo_by_id(todo_id, user_id)
+            with get_db_connection() as conn:
+                # Flip in place so concurrent toggles cannot lose an update
+                todo = execute(conn, self._owned('todos.toggle', user_id), self._owner_params(
+                    [self._get_current_timestamp(), todo_id], user_id
+                )).fetchone()
+                if todo:
+                    self._bump_version(conn, user_id)
+                conn.commit()
+                todo_cache.invalidate(user_id, (todo_id,))
+
+                return Todo(todo) if todo else None
 
         except Exception as e:
             return None
 
-    def delete_todo(self, todo_id: str, user_id: Optional[str] = None) -> Optional[Dict]:
+    def delete_todo(self, todo_id: str, user_id: Optional[str] = None) -> Optional[Todo]:
         """Delete a todo"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            # Get todo before deletion
-            if user_id:
-                cursor.execute("""
-                    SELECT id, user_id, text, color, completed, created_at, updated_at
-                    FROM todos WHERE id = %s AND user_id = %s
-                """, (todo_id, user_id))
-            else:
-                cursor.execute("""
-                    SELECT id, user_id, text, color, completed, created_at, updated_at
-                    FROM todos WHERE id = %s AND user_id IS NULL
-                """, (todo_id,))
-
-            todo = cursor.fetchone()
-            if not todo:
-                conn.close()
-                return None
-
-            # Delete todo
-            cursor.execute("DELETE FROM todos WHERE id = %s", (todo_id,))
-            conn.commit()
-            conn.close()
+            with get_db_connection() as conn:
+                todo = execute(conn, self._owned('todos.delete', user_id),
+                               self._owner_params([todo_id], user_id)).fetchone()
+                if todo:
+                    self._bump_version(conn, user_id)
+                conn.commit()
+                todo_cache.invalidate(user_id, (todo_id,))
 
-            return self._to_dict(todo)
+                return Todo(todo) if todo else None
 
         except Exception as e:
             return None
 
+    def bulk_mutate_todos(self, todo_ids: List[str], operation: str, user_id: Optional[str] = None,
+                          text: Optional[str] = None, completed: Optional[bool] = None,
+                          color: Optional[str] = None) -> Dict[str, Todo]:
+        """Toggle, complete, reopen or update many todos with one statement
+
+        Returns the updated todos keyed by id; ids that do not exist or belong
+        to someone else are absent from the result.
+        """
+        updated_at = self._get_current_timestamp()
+        if operation == 'toggle':
+            name, params = 'todos.bulk_toggle', [updated_at]
+        elif operation in ('complete', 'uncomplete'):
+            name, params = 'todos.bulk_update', [None, operation == 'complete', None, updated_at]
+        elif operation == 'update':
+            name = 'todos.bulk_update'
+            params = [text.strip() if text is not None else None, completed, color, updated_at]
+        else:
+            raise ValueError(f"Unknown operation: {operation}")
+
+        return self._bulk(name, params, todo_ids, user_id)
+
+    def bulk_delete_todos(self, todo_ids: List[str], user_id: Optional[str] = None) -> Dict[str, Todo]:
+        """Delete many todos with one statement, returning the deleted todos keyed by id"""
+        return self._bulk('todos.bulk_delete', [], todo_ids, user_id)
+
+    def _bulk(self, name: str, params: List, todo_ids: List[str], user_id: Optional[str]) -> Dict[str, Todo]:
+        """Run a bulk statement scoped to the owner and collect the RETURNING rows"""
+        params = self._owner_params(params, user_id) + [id_list(todo_ids)]
+
+        with get_db_connection() as conn:
+            rows = execute(conn, self._owned(name, user_id), params).fetchall()
+            if rows:
+                self._bump_version(conn, user_id)
+            conn.commit()
+        todo_cache.invalidate(user_id, todo_ids)
+
+        return {row[0]: Todo(row) for row in rows}
+
     def get_guest_todo_count(self) -> int:
         """Get count of guest todos"""
         return self.user_service.get_guest_todo_count()
 
-    def get_completed_todos(self, user_id: Optional[str] = None) -> List[Dict]:
+    def get_completed_todos(self, user_id: Optional[str] = None) -> List[Todo]:
         """Get completed todos for a user or guest"""
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            if user_id:
-                cursor.execute("""
-                    SELECT id, user_id, text, color, completed, created_at, updated_at
-                    FROM todos WHERE user_id = %s AND completed = 1
-                    ORDER BY created_at DESC
-                """, (user_id,))
-            else:
-                cursor.execute("""
-                    SELECT id, user_id, text, color, completed, created_at, updated_at
-                    FROM todos WHERE user_id IS NULL AND completed = 1
-                    ORDER BY created_at DESC
-                """)
-
-            todos = cursor.fetchall()
-            conn.close()
-
-            return [self._to_dict(todo) for todo in todos]
-
-        except Exception as e:
-            return []
+        return self.get_all_todos(user_id, ListOptions(completed=True))
 
     def delete_all_todos(self, user_id: Optional[str] = None) -> int:
         """Delete all todos for a user or guest"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            if user_id:
-                cursor.execute("DELETE FROM todos WHERE user_id = %s", (user_id,))
-            else:
-                cursor.execute("DELETE FROM todos WHERE user_id IS NULL")
+            with get_db_connection() as conn:
+                if user_id:
+                    cursor = execute(conn, 'todos.delete_all_by_user', (user_id,))
+                else:
+                    cursor = execute(conn, 'todos.delete_all_guest')
 
-            deleted_count = cursor.rowcount
-            conn.commit()
-            conn.close()
+                deleted_count = cursor.rowcount
+                if deleted_count:
+                    self._bump_version(conn, user_id)
+                conn.commit()
+                todo_cache.invalidate(user_id)
 
-            return deleted_count
+                return deleted_count
 
         except Exception as e:
             return 0
 
     def get_todo_count(self, user_id: Optional[str] = None) -> int:
         """Get todo count for a user or guest"""
+        return self.get_todo_counts(user_id)['total']
+
+    def get_todo_counts(self, user_id: Optional[str] = None) -> Dict[str, int]:
+        """Get total/completed/active counts for a user or guest from the counters table"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            with get_read_connection(user_id) as conn:
+                scope = f"user:{user_id}" if user_id else 'guest'
+                row = execute(conn, 'todo_counters.get', (scope,)).fetchone()
 
-            if user_id:
-                cursor.execute("SELECT COUNT(*) FROM todos WHERE user_id = %s", (user_id,))
-            else:
-                cursor.execute("SELECT COUNT(*) FROM todos WHERE user_id IS NULL")
+                return self._counts(row)
 
-            count = cursor.fetchone()[0]
-            conn.close()
+        except Exception as e:
+            return self._counts(None)
 
-            return count
+    def get_global_todo_counts(self) -> Dict[str, int]:
+        """Get total/completed/active counts across every owner"""
+        try:
+            with get_read_connection() as conn:
+                row = execute(conn, 'todo_counters.get_global').fetchone()
+
+                return self._counts(row)
 
         except Exception as e:
-            return 0
+            return self._counts(None)
+
+    def _counts(self, row: Optional[tuple]) -> Dict[str, int]:
+        total, completed = (int(row[0]), int(row[1])) if row else (0, 0)
+        return {'total': total, 'completed': completed, 'active': total - completed}
+
+    def get_version(self, user_id: Optional[str] = None) -> Tuple[int, Optional[datetime.datetime]]:
+        """Get the change version and last-modified time of a user's (or guest) todos
+
+        Read once per request: the conditional check and the cache lookups of
+        a request share it.
+        """
+        versions = self._request_versions()
+        owner = user_id or ''
+        if owner not in versions:
+            with get_read_connection(user_id) as conn:
+                row = execute(conn, 'todo_versions.get', (owner,)).fetchone()
+            versions[owner] = self._version_row(row)
+        return versions[owner]
+
+    @staticmethod
+    def _version_row(row: Optional[tuple]) -> Tuple[int, Optional[datetime.datetime]]:
+        if not row:
+            return 0, None
+        version, updated_at = row
+        if isinstance(updated_at, str):
+            updated_at = datetime.datetime.fromisoformat(updated_at)
+        return version, updated_at
+
+    @staticmethod
+    def _request_versions() -> Dict[str, tuple]:
+        """Versions read during the current request; a throwaway dict outside of one"""
+        if not has_request_context():
+            return {}
+        if 'todo_versions' not in g:
+            g.todo_versions = {}
+        return g.todo_versions
+
+    def _forget_version(self, user_id: Optional[str]):
+        """Drop the owner's version read by this request before it writes"""
+        self._request_versions().pop(user_id or '', None)
+
+    def _bump_version(self, conn, user_id: Optional[str]):
+        """Advance the owner's change version inside the caller's transaction"""
+        execute(conn, 'todo_versions.bump', (user_id or '', self._get_current_timestamp()))
+        replicas.note_write(user_id or '')
+        self._forget_version(user_id)
+
+    def _owned(self, name: str, user_id: Optional[str]) -> str:
+        """Pick the per-user or guest variant of an owner-scoped statement"""
+        return f"{name}_by_user" if user_id else f"{name}_guest"
+
+    def _owner_params(self, params: List, user_id: Optional[str]) -> List:
+        """Append the owner parameter, which guest statements do not take"""
+        return params + [user_id] if user_id else list(params)
+
+    def _fetch_todo(self, conn, todo_id: str, user_id: Optional[str] = None) -> Optional[tuple]:
+        """Fetch a raw todo row scoped to its owner"""
+        if user_id:
+            cursor = execute(conn, 'todos.get_by_user', (todo_id, user_id))
+        else:
+            cursor = execute(conn, 'todos.get_guest', (todo_id,))
+        return cursor.fetchone()
+
+todo_service = TodoService()
 
-    def _to_dict(self, todo: tuple) -> Dict:
-        """Convert database tuple to dictionary"""
-        return {
-            'id': todo[0],
-            'user_id': todo[1],
-            'text': todo[2],
-            'color': todo[3],
-            'completed': bool(todo[4]),
-            'createdAt': todo[5],
-            'updatedAt': todo[6]
-        }
-
-todo_service = TodoService()
\ No newline at end of file
+# Background writer for create_todo when group commit is on. Its transactions
+# use their own pooled connections, never a request's.
+todo_writer = GroupCommitWriter(todo_service._insert_todos, 'todos',
+                                TODO_GROUP_COMMIT_MAX_BATCH,
+                                TODO_GROUP_COMMIT_MAX_WAIT_MS / 1000) if TODO_GROUP_COMMIT else None
\ No newline at end of file
@@ -1,18 +1,20 @@
 import sqlite3
 import uuid
-import hashlib
 import datetime
 from typing import Dict, Optional, Tuple
-from database import get_db_connection
+from database import get_db_connection, release_request_connection
+from queries import execute
 from schema import USERS_COLUMNS
+from services.auth import token_service
+from services.passwords import PasswordHashingBusy, password_hasher
 
 class UserService:
     def __init__(self):
         self.db_path = 'todo_app.db'
 
     def _hash_password(self, password: str) -> str:
-        """Hash password using SHA-256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash password with the configured salted KDF (off the request thread)"""
+        return password_hasher.hash(password)
 
     def _generate_id(self) -> str:
         """Generate unique user ID"""
@@ -25,58 +27,61 @@ class UserService:
     def register_user(self, email: str, password: str, name: str) -> Tuple[bool, str, Optional[Dict]]:
         """Register a new user"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            with get_db_connection() as conn:
+                # Check if user already exists
+                cursor = execute(conn, 'users.find_id_by_email', (email,))
+                if cursor.fetchone():
+                    return False, "User with this email already exists", None
 
-            # Check if user already exists
-            cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-            if cursor.fetchone():
-                conn.close()
-                return False, "User with this email already exists", None
+            # The KDF is deliberately slow; no pooled connection waits on it
+            release_request_connection()
 
             # Create new user
             user_id = self._generate_id()
             hashed_password = self._hash_password(password)
             created_at = self._get_current_timestamp()
 
-            cursor.execute("""
-                INSERT INTO users (id, email, password, name, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (user_id, email, hashed_password, name, created_at, created_at))
+            with get_db_connection() as conn:
+                execute(conn, 'users.insert',
+                        (user_id, email, hashed_password, name, created_at, created_at))
 
-            conn.commit()
-            conn.close()
+                conn.commit()
 
-            # Return user data without password
-            user_data = {
-                'id': user_id,
-                'email': email,
-                'name': name,
-                'created_at': created_at
-            }
+                # Return user data without password
+                user_data = {
+                    'id': user_id,
+                    'email': email,
+                    'name': name,
+                    'created_at': created_at
+                }
 
-            return True, "User registered successfully", user_data
+                return True, "User registered successfully", user_data
 
+        except PasswordHashingBusy:
+            raise
         except Exception as e:
             return False, f"Registration failed: {str(e)}", None
 
     def login_user(self, email: str, password: str) -> Tuple[bool, str, Optional[Dict]]:
         """Authenticate user login"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            with get_db_connection() as conn:
+                cursor = execute(conn, 'users.get_by_email', (email,))
 
-            hashed_password = self._hash_password(password)
+                user = cursor.fetchone()
 
-            cursor.execute("""
-                SELECT id, email, password, name, created_at, updated_at
-                FROM users WHERE email = %s AND password = %s
-            """, (email, hashed_password))
+            # The KDF is deliberately slow; no pooled connection waits on it
+            release_request_connection()
+            matches, needs_rehash = password_hasher.verify(password, user[2] if user else password_hasher.dummy_hash)
 
-            user = cursor.fetchone()
-            conn.close()
+            if user and matches:
+                if needs_rehash:
+                    # Upgrade legacy SHA-256 (or outdated KDF settings) now that we know the password
+                    hashed_password = self._hash_password(password)
+                    with get_db_connection() as conn:
+                        execute(conn, 'users.update_password', (hashed_password, user[0]))
+                        conn.commit()
 
-            if user:
                 user_data = {
                     'id': user[0],
                     'email': user[1],
@@ -84,36 +89,43 @@ class UserService:
                     'created_at': user[4],
                     'updated_at': user[5]
                 }
+                user_data.update(token_service.issue(user[0]))
                 return True, "Login successful", user_data
             else:
                 return False, "Invalid email or password", None
 
+        except PasswordHashingBusy:
+            raise
         except Exception as e:
             return False, f"Login failed: {str(e)}", None
 
+    def logout_user(self, token: str) -> Tuple[bool, str]:
+        """Revoke a session token"""
+        try:
+            if token_service.revoke(token):
+                return True, "Logout successful"
+            return False, "Invalid token"
+
+        except Exception as e:
+            return False, f"Logout failed: {str(e)}"
+
     def get_user_by_id(self, user_id: str) -> Optional[Dict]:
         """Get user by ID"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            with get_db_connection() as conn:
+                cursor = execute(conn, 'users.get_by_id', (user_id,))
 
-            cursor.execute("""
-                SELECT id, email, name, created_at, updated_at
-                FROM users WHERE id = %s
-            """, (user_id,))
+                user = cursor.fetchone()
 
-            user = cursor.fetchone()
-            conn.close()
-
-            if user:
-                return {
-                    'id': user[0],
-                    'email': user[1],
-                    'name': user[2],
-                    'created_at': user[3],
-                    'updated_at': user[4]
-                }
-            return None
+                if user:
+                    return {
+                        'id': user[0],
+                        'email': user[1],
+                        'name': user[2],
+                        'created_at': user[3],
+                        'updated_at': user[4]
+                    }
+                return None
 
         except Exception as e:
             return None
@@ -121,14 +133,10 @@ class UserService:
     def get_guest_todo_count(self) -> int:
         """Get count of todos without user_id (guest todos)"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            cursor.execute("SELECT COUNT(*) FROM todos WHERE user_id IS NULL")
-            count = cursor.fetchone()[0]
-            conn.close()
+            with get_db_connection() as conn:
+                row = execute(conn, 'todo_counters.get', ('guest',)).fetchone()
 
-            return count
+                return int(row[0]) if row else 0
 
         except Exception as e:
             return 0
@@ -23,6 +23,23 @@ def check_dependencies():
         print("Please run: pip install -r requirements.txt")
         return False
 
+def wants_production():
+    """Production mode is selected with --production or APP_ENV=production"""
+    return '--production' in sys.argv[1:] or os.environ.get('APP_ENV') == 'production'
+
+def start_production_server():
+    """Replace this process with gunicorn serving the same app object"""
+    try:
+        import gunicorn
+    except ImportError as e:
+        print(f"Missing dependency: {e}")
+        print("Please run: pip install -r requirements.txt")
+        sys.exit(1)
+
+    config = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+    print(f" Starting production server (gunicorn, config: {config})")
+    os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', config, 'app:app'])
+
 def main():
     """Main function to start the Flask server"""
     
@@ -32,6 +49,11 @@ def main():
     if not check_dependencies():
         sys.exit(1)
 
+    if wants_production():
+        start_production_server()
+
+    # The development server also serves the diagnostic endpoints
+    os.environ.setdefault('APP_ENV', 'development')
     port = os.environ.get('PORT', 5000)
     
     print(f" Todo backend started on port {port}")
@@ -0,0 +1,169 @@
+import contextlib
+
+import pytest
+from flask import Flask
+from werkzeug.exceptions import Unauthorized
+
+from routes import todo_routes
+from services import auth
+from services.auth import TokenService, require_shared_secret
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(auth.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def statements(monkeypatch):
+    """Record the statements revoke() runs instead of sending them to a database"""
+    executed = []
+
+    @contextlib.contextmanager
+    def connection():
+        yield type('Connection', (), {'commit': lambda self: executed.append('commit')})()
+
+    monkeypatch.setattr(auth, 'get_db_connection', connection)
+    monkeypatch.setattr(auth, 'execute', lambda conn, name, params=(): executed.append(name))
+    return executed
+
+
+def make_service(keys=(b'current',), ttl=60):
+    service = TokenService(keys=keys, ttl=ttl)
+    # Verification reads the revocation list from the database on first use
+    service.ensure_revocations = lambda: None
+    return service
+
+
+def test_issued_token_verifies_to_its_user(clock):
+    service = make_service()
+    issued = service.issue('u1')
+    assert service.verify(issued['token']) == 'u1'
+    # The second check is served from the verified-token cache
+    assert service.verify(issued['token']) == 'u1'
+    assert service.stats()['hits'] == 1
+
+
+def test_tokens_are_unique_per_issue(clock):
+    service = make_service()
+    assert service.issue('u1')['token'] != service.issue('u1')['token']
+
+
+def test_token_expires_after_ttl(clock):
+    service = make_service(ttl=60)
+    token = service.issue('u1')['token']
+    clock.now += 59
+    assert service.verify(token) == 'u1'
+    clock.now += 1
+    assert service.verify(token) is None
+    assert service.stats()['rejections'] == 1
+
+
+@pytest.mark.parametrize('mangle', [
+    lambda token: token + 'x',
+    lambda token: token.replace('.', '.x', 1),
+    lambda token: token.split('.')[0],
+    lambda token: '.' + token.split('.')[1],
+    lambda token: 'not-a-token',
+    lambda token: '',
+])
+def test_tampered_token_is_rejected(clock, mangle):
+    service = make_service()
+    assert service.verify(mangle(service.issue('u1')['token'])) is None
+
+
+def test_token_signed_with_another_key_is_rejected(clock):
+    token = make_service(keys=(b'other',)).issue('u1')['token']
+    assert make_service(keys=(b'current',)).verify(token) is None
+
+
+def test_rotation_verifies_old_tokens_and_signs_with_the_new_key(clock):
+    old_token = make_service(keys=(b'old',)).issue('u1')['token']
+    rotated = make_service(keys=(b'new', b'old'))
+    assert rotated.verify(old_token) == 'u1'
+
+    new_token = rotated.issue('u2')['token']
+    assert make_service(keys=(b'new',)).verify(new_token) == 'u2'
+    assert make_service(keys=(b'old',)).verify(new_token) is None
+
+
+def test_revoked_token_is_rejected_even_when_cached(clock, statements):
+    service = make_service()
+    token = service.issue('u1')['token']
+    assert service.verify(token) == 'u1'
+
+    assert service.revoke(token) is True
+    assert statements == ['revoked_tokens.insert', 'revoked_tokens.prune', 'commit']
+    assert service.verify(token) is None
+
+
+def test_revoking_an_invalid_token_writes_nothing(clock, statements):
+    service = make_service()
+    assert service.revoke('not-a-token') is False
+    assert statements == []
+
+
+def test_revocations_from_other_workers_apply(clock):
+    service = make_service()
+    token = service.issue('u1')['token']
+    assert service.verify(token) == 'u1'
+    jti = service._decode(token)[2]
+    service._revoked = {jti: int(clock.now) + 60}
+    assert service.verify(token) is None
+
+
+def test_several_workers_need_a_configured_secret(monkeypatch):
+    monkeypatch.delenv('AUTH_TOKEN_SECRET', raising=False)
+    require_shared_secret(1)
+    with pytest.raises(SystemExit):
+        require_shared_secret(4)
+    monkeypatch.setenv('AUTH_TOKEN_SECRET', 'shared')
+    require_shared_secret(4)
+
+
+@pytest.fixture
+def request_user(monkeypatch, clock):
+    service = make_service()
+    monkeypatch.setattr(todo_routes, 'token_service', service)
+    monkeypatch.setattr(todo_routes, 'AUTH_ALLOW_USER_ID_HEADER', False)
+    app = Flask(__name__)
+
+    def user_for(headers):
+        with app.test_request_context(headers=headers):
+            return todo_routes.get_user_id_from_request()
+    user_for.service = service
+    return user_for
+
+
+def test_request_without_credentials_is_a_guest(request_user):
+    assert request_user({}) is None
+    # The legacy header is ignored unless AUTH_ALLOW_USER_ID_HEADER is on
+    assert request_user({'X-User-ID': 'u1'}) is None
+
+
+def test_request_with_a_valid_token_is_its_user(request_user):
+    token = request_user.service.issue('u1')['token']
+    assert request_user({'Authorization': f'Bearer {token}'}) == 'u1'
+
+
+@pytest.mark.parametrize('authorization', ['Bearer not-a-token', 'Bearer ', 'Basic dTE6cHc='])
+def test_request_with_bad_credentials_is_refused(request_user, authorization):
+    with pytest.raises(Unauthorized):
+        request_user({'Authorization': authorization})
+
+
+def test_request_with_a_revoked_token_is_refused_not_a_guest(request_user, statements):
+    token = request_user.service.issue('u1')['token']
+    request_user.service.revoke(token)
+    with pytest.raises(Unauthorized):
+        request_user({'Authorization': f'Bearer {token}'})
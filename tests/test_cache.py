@@ -0,0 +1,192 @@
+import asyncio
+
+import pytest
+
+from services import cache
+from services.cache import TodoCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    return clock
+
+
+def loader(value, calls):
+    def load():
+        calls.append(value)
+        return value
+    return load
+
+
+def test_hit_skips_the_loader(clock):
+    todo_cache = TodoCache(max_bytes=1 << 20, ttl=30)
+    calls = []
+    assert todo_cache.get_or_load('u1', ('list', 'all'), loader(['a'], calls)) == ['a']
+    assert todo_cache.get_or_load('u1', ('list', 'all'), loader(['b'], calls)) == ['a']
+    assert calls == [['a']]
+    assert todo_cache.stats()['hits'] == 1
+    assert todo_cache.stats()['misses'] == 1
+
+
+def test_owners_are_kept_apart(clock):
+    todo_cache = TodoCache(max_bytes=1 << 20, ttl=30)
+    todo_cache.get_or_load('u1', ('list', 'all'), lambda: ['mine'])
+    assert todo_cache.get_or_load(None, ('list', 'all'), lambda: ['guest']) == ['guest']
+    assert todo_cache.get_or_load('u2', ('list', 'all'), lambda: ['theirs']) == ['theirs']
+
+
+def test_entry_expires_after_ttl(clock):
+    todo_cache = TodoCache(max_bytes=1 << 20, ttl=30)
+    todo_cache.get_or_load('u1', ('list', 'all'), lambda: ['old'])
+    clock.now += 29.9
+    assert todo_cache.get_or_load('u1', ('list', 'all'), lambda: ['new']) == ['old']
+    clock.now += 0.2
+    assert todo_cache.get_or_load('u1', ('list', 'all'), lambda: ['new']) == ['new']
+    assert todo_cache.stats()['expirations'] == 1
+
+
+def test_least_recently_used_entry_is_evicted_first(clock):
+    size = cache._estimate_size('x' * 100)
+    todo_cache = TodoCache(max_bytes=size * 2, ttl=30)
+    todo_cache.get_or_load('u1', 'a', lambda: 'a' * 100)
+    todo_cache.get_or_load('u1', 'b', lambda: 'b' * 100)
+    # Touch 'a' so 'b' is now the oldest
+    todo_cache.get_or_load('u1', 'a', lambda: 'unused')
+    todo_cache.get_or_load('u1', 'c', lambda: 'c' * 100)
+
+    stats = todo_cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['bytes'] <= stats['maxBytes']
+    assert todo_cache.get_or_load('u1', 'a', lambda: 'reloaded') == 'a' * 100
+    assert todo_cache.get_or_load('u1', 'b', lambda: 'reloaded') == 'reloaded'
+
+
+def test_value_larger_than_budget_is_not_stored(clock):
+    todo_cache = TodoCache(max_bytes=10, ttl=30)
+    calls = []
+    todo_cache.get_or_load('u1', 'big', loader('x' * 100, calls))
+    todo_cache.get_or_load('u1', 'big', loader('x' * 100, calls))
+    assert len(calls) == 2
+    assert todo_cache.stats()['entries'] == 0
+
+
+def test_disabled_cache_always_loads(clock):
+    todo_cache = TodoCache(max_bytes=1 << 20, ttl=0)
+    calls = []
+    todo_cache.get_or_load('u1', 'k', loader(1, calls))
+    todo_cache.get_or_load('u1', 'k', loader(1, calls))
+    assert calls == [1, 1]
+
+
+def test_invalidate_drops_lists_and_named_items_only(clock):
+    todo_cache = TodoCache(max_bytes=1 << 20, ttl=30)
+    for key in (('list', 'all'), ('page', False, 50, None), ('item', 't1'), ('item', 't2')):
+        todo_cache.get_or_load('u1', key, lambda: 'cached')
+    todo_cache.get_or_load('u2', ('list', 'all'), lambda: 'cached')
+
+    todo_cache.invalidate('u1', ['t1'])
+
+    assert todo_cache.get_or_load('u1', ('list', 'all'), lambda: 'fresh') == 'fresh'
+    assert todo_cache.get_or_load('u1', ('page', False, 50, None), lambda: 'fresh') == 'fresh'
+    assert todo_cache.get_or_load('u1', ('item', 't1'), lambda: 'fresh') == 'fresh'
+    assert todo_cache.get_or_load('u1', ('item', 't2'), lambda: 'fresh') == 'cached'
+    assert todo_cache.get_or_load('u2', ('list', 'all'), lambda: 'fresh') == 'cached'
+
+
+def test_invalidate_without_ids_drops_every_item(clock):
+    todo_cache = TodoCache(max_bytes=1 << 20, ttl=30)
+    todo_cache.get_or_load('u1', ('item', 't1'), lambda: 'cached')
+    todo_cache.invalidate('u1')
+    assert todo_cache.get_or_load('u1', ('item', 't1'), lambda: 'fresh') == 'fresh'
+
+
+def test_load_that_raced_a_write_is_not_stored(clock):
+    todo_cache = TodoCache(max_bytes=1 << 20, ttl=30)
+
+    def stale_load():
+        # A write lands while the read is still querying
+        todo_cache.invalidate('u1', ())
+        return 'stale'
+
+    assert todo_cache.get_or_load('u1', ('list', 'all'), stale_load) == 'stale'
+    assert todo_cache.get_or_load('u1', ('list', 'all'), lambda: 'fresh') == 'fresh'
+
+
+def test_write_by_another_owner_does_not_discard_a_load(clock):
+    todo_cache = TodoCache(max_bytes=1 << 20, ttl=30)
+
+    def load():
+        todo_cache.invalidate('u2', ())
+        return 'kept'
+
+    todo_cache.get_or_load('u1', ('list', 'all'), load)
+    assert todo_cache.get_or_load('u1', ('list', 'all'), lambda: 'fresh') == 'kept'
+
+
+def test_async_load_that_raced_a_write_is_not_stored(clock):
+    todo_cache = TodoCache(max_bytes=1 << 20, ttl=30)
+
+    async def stale_load():
+        todo_cache.invalidate('u1', ())
+        return 'stale'
+
+    async def fresh_load():
+        return 'fresh'
+
+    async def run():
+        assert await todo_cache.get_or_load_async('u1', ('list', 'all'), stale_load) == 'stale'
+        assert await todo_cache.get_or_load_async('u1', ('list', 'all'), fresh_load) == 'fresh'
+        assert await todo_cache.get_or_load_async('u1', ('list', 'all'), stale_load) == 'fresh'
+
+    asyncio.run(run())
+
+
+def test_entry_stored_under_an_older_version_is_reloaded(clock):
+    todo_cache = TodoCache(max_bytes=1 << 20, ttl=30)
+    todo_cache.get_or_load('u1', ('list', 'all'), lambda: ['old'], version=1)
+    assert todo_cache.get_or_load('u1', ('list', 'all'), lambda: ['new'], version=1) == ['old']
+    assert todo_cache.get_or_load('u1', ('list', 'all'), lambda: ['new'], version=2) == ['new']
+    assert todo_cache.get_or_load('u1', ('list', 'all'), lambda: ['newer'], version=2) == ['new']
+    assert todo_cache.stats()['outdated'] == 1
+
+
+def test_write_in_another_worker_is_seen_through_the_version(clock):
+    # Each worker has its own cache and only the writer invalidates it
+    versions = {'u1': 1}
+    rows = ['a']
+    writer, reader = TodoCache(max_bytes=1 << 20, ttl=30), TodoCache(max_bytes=1 << 20, ttl=30)
+
+    def read(worker):
+        return worker.get_or_load('u1', ('list', 'all'), lambda: list(rows), versions['u1'])
+
+    assert read(reader) == ['a']
+    rows.append('b')
+    versions['u1'] += 1
+    writer.invalidate('u1', ())
+    assert read(reader) == ['a', 'b']
+
+
+def test_async_entry_stored_under_an_older_version_is_reloaded(clock):
+    todo_cache = TodoCache(max_bytes=1 << 20, ttl=30)
+
+    def load(value):
+        async def run():
+            return value
+        return run
+
+    async def run():
+        assert await todo_cache.get_or_load_async('u1', ('item', 't1'), load('old'), 3) == 'old'
+        assert await todo_cache.get_or_load_async('u1', ('item', 't1'), load('new'), 3) == 'old'
+        assert await todo_cache.get_or_load_async('u1', ('item', 't1'), load('new'), 4) == 'new'
+
+    asyncio.run(run())
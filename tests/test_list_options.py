@@ -0,0 +1,94 @@
+import datetime
+
+import pytest
+
+from services.list_options import (
+    DEFAULT_LIST_OPTIONS, LIST_FILTERS, MAX_COLOR_LENGTH, ListOptions, has_list_options, parse_list_options
+)
+
+
+def test_no_arguments_give_the_default_list():
+    assert parse_list_options({}) == DEFAULT_LIST_OPTIONS
+    assert DEFAULT_LIST_OPTIONS.filters() == []
+    assert not has_list_options({'limit': '50', 'cursor': 'abc'})
+
+
+@pytest.mark.parametrize('name', LIST_FILTERS + ('sort', 'order'))
+def test_every_whitelisted_argument_counts_as_an_option(name):
+    assert has_list_options({name: ''})
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('true', True), ('1', True), ('YES', True), ('false', False), ('0', False), ('No', False),
+])
+def test_completed_accepts_boolean_words(value, expected):
+    assert parse_list_options({'completed': value}).completed is expected
+
+
+def test_completed_rejects_anything_else():
+    with pytest.raises(ValueError, match='completed must be true or false'):
+        parse_list_options({'completed': 'maybe'})
+
+
+def test_empty_values_are_ignored():
+    assert parse_list_options({'completed': '', 'color': '', 'sort': '', 'order': ''}) == DEFAULT_LIST_OPTIONS
+
+
+def test_color_is_bounded_by_the_column():
+    assert parse_list_options({'color': '#ff6b6b'}).color == '#ff6b6b'
+    assert parse_list_options({'color': 'x' * MAX_COLOR_LENGTH}).color == 'x' * MAX_COLOR_LENGTH
+    with pytest.raises(ValueError, match='color must be at most'):
+        parse_list_options({'color': 'x' * (MAX_COLOR_LENGTH + 1)})
+
+
+@pytest.mark.parametrize('sort', ['created', 'updated'])
+@pytest.mark.parametrize('order, descending', [('desc', True), ('asc', False)])
+def test_sort_and_order(sort, order, descending):
+    options = parse_list_options({'sort': sort, 'order': order})
+    assert options.sort == sort
+    assert options.descending is descending
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'sort': 'text'}, 'sort must be one of created, updated'),
+    ({'sort': 'created_at; DROP TABLE todos'}, 'sort must be one of'),
+    ({'order': 'random'}, 'order must be one of desc, asc'),
+    ({'order': 'DESC'}, 'order must be one of'),
+])
+def test_sort_and_order_outside_the_whitelist_are_rejected(args, message):
+    with pytest.raises(ValueError, match=message):
+        parse_list_options(args)
+
+
+def test_naive_timestamps_are_normalized():
+    options = parse_list_options({'created_after': '2024-01-02', 'updated_before': '2024-01-02T03:04:05'})
+    assert options.created_after == '2024-01-02T00:00:00'
+    assert options.updated_before == '2024-01-02T03:04:05'
+
+
+def test_aware_timestamps_become_naive_local_time():
+    stamp = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    expected = stamp.astimezone().replace(tzinfo=None).isoformat()
+    assert parse_list_options({'created_before': '2024-01-02T03:04:05+00:00'}).created_before == expected
+
+
+def test_malformed_timestamp_names_the_argument():
+    with pytest.raises(ValueError, match='updated_after must be an ISO 8601 timestamp'):
+        parse_list_options({'updated_after': 'yesterday'})
+
+
+def test_filters_are_listed_in_binding_order():
+    options = parse_list_options({
+        'updated_before': '2024-02-01', 'color': 'red', 'completed': 'false', 'created_after': '2024-01-01',
+    })
+    assert [name for name, _ in options.filters()] == ['completed', 'color', 'created_after', 'updated_before']
+    assert options.filters()[0] == ('completed', False)
+
+
+def test_overrides_win_over_arguments():
+    options = parse_list_options({'completed': 'false', 'sort': 'updated'}, completed=True)
+    assert options == ListOptions(completed=True, sort='updated')
+
+
+def test_options_are_hashable_cache_keys():
+    assert hash(parse_list_options({'color': 'red'})) == hash(ListOptions(color='red'))
@@ -0,0 +1,83 @@
+import base64
+import datetime
+import json
+
+import pytest
+
+from services.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, decode_offset_cursor, encode_cursor, encode_offset_cursor,
+    parse_limit
+)
+
+
+def _token(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def test_cursor_round_trips():
+    cursor = encode_cursor('2024-01-02T03:04:05.123456', 'todo-1')
+    assert decode_cursor(cursor) == ('2024-01-02T03:04:05.123456', 'todo-1')
+
+
+def test_cursor_accepts_datetimes():
+    created_at = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    assert decode_cursor(encode_cursor(created_at, 'todo-1')) == ('2024-01-02T03:04:05', 'todo-1')
+
+
+def test_cursor_is_url_safe_and_unpadded():
+    # Lengths that would need padding, and ids that would encode to '+' or '/'
+    for todo_id in ('a', 'ab', 'abc', '>>>???'):
+        cursor = encode_cursor('2024-01-02T03:04:05', todo_id)
+        assert not set(cursor) & set('+/=')
+        assert decode_cursor(cursor)[1] == todo_id
+
+
+@pytest.mark.parametrize('cursor', [
+    '',
+    'not a cursor',
+    '!!!!',
+    _token({'created_at': 'x', 'id': 'y'}),
+    _token(['2024-01-02', 'todo-1', 'extra']),
+    _token(['2024-01-02', 7]),
+    _token([None, 'todo-1']),
+    _token(['offset', 10]),
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('offset', [0, 1, 50, 10 ** 6])
+def test_offset_cursor_round_trips(offset):
+    assert decode_offset_cursor(encode_offset_cursor(offset)) == offset
+
+
+@pytest.mark.parametrize('cursor', [
+    'garbage',
+    _token(['offset', -1]),
+    _token(['offset', 1.5]),
+    _token(['offset', True]),
+    _token(['offset', '10']),
+    _token(['page', 10]),
+    encode_cursor('2024-01-02T03:04:05', 'todo-1'),
+])
+def test_malformed_offset_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_offset_cursor(cursor)
+
+
+def test_limit_defaults_and_bounds():
+    assert parse_limit(None) == DEFAULT_PAGE_SIZE
+    assert parse_limit('') == DEFAULT_PAGE_SIZE
+    assert parse_limit('1') == 1
+    assert parse_limit(str(MAX_PAGE_SIZE)) == MAX_PAGE_SIZE
+
+
+@pytest.mark.parametrize('value, message', [
+    ('0', 'limit must be between'),
+    (str(MAX_PAGE_SIZE + 1), 'limit must be between'),
+    ('ten', 'limit must be an integer'),
+])
+def test_limit_out_of_range_is_rejected(value, message):
+    with pytest.raises(ValueError, match=message):
+        parse_limit(value)
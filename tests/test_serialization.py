@@ -0,0 +1,74 @@
+import datetime
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from serialization import FastJSONProvider, Todo, _plain, orjson, todo_rows
+
+COMPACT = (',', ':')
+
+SQLITE_TODO = Todo(('t1', 'u1', 'Buy milk', '#ff6b6b', 0, '2024-01-02T03:04:05.123456', None))
+POSTGRES_TODO = Todo(('t2', None, 'Pay rent', None, True,
+                      datetime.datetime(2024, 1, 2, 3, 4, 5), datetime.datetime(2024, 1, 3, 4, 5, 6, 789)))
+TRICKY_TODO = Todo(('t3', 'u1', 'Café "quoted" \\ back\nslash\t\x00\x7f ☃ \U0001f600', 'bleu é', 1,
+                    '2024-01-02', '2024-01-02'))
+
+
+@pytest.fixture
+def app():
+    # Providers only hold a weak reference to their app, so the fixture keeps it alive
+    return Flask(__name__)
+
+
+@pytest.fixture(params=[False, True] if orjson is not None else [False], ids=lambda on: 'orjson' if on else 'stdlib')
+def providers(request, monkeypatch, app):
+    monkeypatch.setattr(FastJSONProvider, 'use_orjson', request.param)
+    return FastJSONProvider(app), DefaultJSONProvider(app)
+
+
+PAYLOADS = {
+    'sqlite row': SQLITE_TODO,
+    'postgres row': POSTGRES_TODO,
+    'escapes and non-ascii': TRICKY_TODO,
+    'list': [SQLITE_TODO, POSTGRES_TODO, TRICKY_TODO],
+    'ascii-only list': [SQLITE_TODO, POSTGRES_TODO],
+    'empty list': [],
+    'page': {'todos': [SQLITE_TODO, POSTGRES_TODO], 'next_cursor': 'abc'},
+    'last page': {'todos': [TRICKY_TODO], 'next_cursor': None},
+    'mixed list': [SQLITE_TODO, {'id': 'x'}, 1, None],
+    'envelope': {'success': True, 'data': {'count': 3, 'remaining': 0.5, 'ids': ['a', 'b']}},
+    'non-string keys': {1: SQLITE_TODO},
+    'plain string': 'snow ☃',
+}
+
+
+@pytest.mark.parametrize('payload', PAYLOADS.values(), ids=PAYLOADS.keys())
+def test_output_matches_default_provider(providers, payload):
+    fast, default = providers
+    assert fast.dumps(payload, separators=COMPACT) == default.dumps(_plain(payload), separators=COMPACT)
+
+
+@pytest.mark.parametrize('payload', PAYLOADS.values(), ids=PAYLOADS.keys())
+def test_response_bytes_match_default_provider(app, providers, payload):
+    fast, default = providers
+    with app.app_context():
+        assert fast.response(payload).get_data() == default.response(_plain(payload)).get_data()
+
+
+def test_indented_output_goes_through_the_standard_encoder(providers):
+    fast, default = providers
+    payload = [SQLITE_TODO, POSTGRES_TODO]
+    assert fast.dumps(payload, indent=2) == default.dumps(_plain(payload), indent=2)
+
+
+def test_todo_fields_and_dict():
+    assert SQLITE_TODO.id == 't1'
+    assert SQLITE_TODO.completed is False
+    assert TRICKY_TODO.completed is True
+    assert SQLITE_TODO.to_dict() == {
+        'id': 't1', 'user_id': 'u1', 'text': 'Buy milk', 'color': '#ff6b6b', 'completed': False,
+        'createdAt': '2024-01-02T03:04:05.123456', 'updatedAt': None,
+    }
+    assert todo_rows([tuple(SQLITE_TODO)]) == [SQLITE_TODO]
+    assert type(todo_rows([tuple(SQLITE_TODO)])[0]) is Todo